@@ -22,6 +22,8 @@ import os
 from datetime import datetime
 from typing import Optional, List, Dict, Any
 
+from persistence import FsyncPolicy, write_json
+
 # ===== 自定义异常类 =====
 
 class CalculatorError(Exception):
@@ -49,10 +51,11 @@ class AdvancedCalculator:
     提供基础和高级数学运算功能，包含历史记录和内存功能
     """
 
-    def __init__(self):
+    def __init__(self, fsync: str = "interval"):
         self.memory: float = 0.0  # 内存存储的值
         self.history: List[Dict[str, Any]] = []  # 计算历史
         self.history_file = "calculator_history.json"  # 历史记录文件
+        self.fsync = FsyncPolicy.coerce(fsync)  # 落盘策略: always / interval / never
 
         # 加载历史记录
         self._load_history()
@@ -78,8 +81,8 @@ class AdvancedCalculator:
                 'memory': self.memory,
                 'last_saved': datetime.now().isoformat()
             }
-            with open(self.history_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+            # 原子写入，保存过程中崩溃不会留下半个文件
+            write_json(self.history_file, data, self.fsync, indent=2)
         except IOError as e:
             print(f"保存历史记录失败: {e}")
 
@@ -0,0 +1,252 @@
+# Python学习项目 - 实际项目：持久化工具
+# 供 task_manager.py 和 simple_web_app.py 共用的数据文件读写函数
+# 本模块展示如何用生成器逐条读取大文件，避免一次性解析整个JSON
+
+"""
+持久化工具:
+1. JSON Lines 格式：每行一个JSON对象，可以逐行读取、逐行写入
+2. 兼容旧的JSON数组格式：流式解析，并可显式迁移为JSON Lines（保留 .bak 备份）
+3. 原子写入：先写临时文件再重命名，写到一半崩溃也不会损坏原文件
+4. 可配置的fsync策略，在持久性和写入延迟之间取舍
+5. 跨进程的建议性文件锁
+"""
+
+import json
+import os
+import re
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, Optional, Union
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# JSON数组中两条记录之间的分隔符（空白和逗号）
+_SEPARATORS = re.compile(r'[\s,]*')
+
+# ===== fsync策略 =====
+
+class FsyncPolicy:
+    """
+    fsync策略
+
+    always:   每次写入都fsync，断电也不丢数据，延迟最高
+    interval: 距上次fsync超过interval秒才fsync
+    never:    只写入操作系统缓存，由系统决定何时落盘
+
+    原子重命名保证进程崩溃时文件要么是旧内容要么是新内容（操作系统缓存仍在）。
+    断电或系统崩溃时只有 always 有同样的保证：interval 和 never 跳过fsync时，
+    重命名可能先于临时文件的内容落盘，重启后文件可能是空的或不完整的。
+    """
+
+    MODES = ('always', 'interval', 'never')
+
+    def __init__(self, mode: str = 'interval', interval: float = 1.0):
+        if mode not in self.MODES:
+            raise ValueError(f"无效的fsync策略: {mode}，可用: {', '.join(self.MODES)}")
+        self.mode = mode
+        self.interval = interval
+        self._last_sync = 0.0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def coerce(cls, policy: Union[str, 'FsyncPolicy', None]) -> 'FsyncPolicy':
+        """接受策略名称或策略对象"""
+        if isinstance(policy, FsyncPolicy):
+            return policy
+        return cls(policy or 'interval')
+
+    def should_sync(self) -> bool:
+        """本次写入是否需要fsync"""
+        if self.mode == 'always':
+            return True
+        if self.mode == 'never':
+            return False
+        with self._lock:
+            now = time.monotonic()
+            if now - self._last_sync >= self.interval:
+                self._last_sync = now
+                return True
+            return False
+
+    def sync(self, f) -> bool:
+        """按策略对已打开的文件执行flush和fsync，返回是否执行了fsync"""
+        f.flush()
+        if self.should_sync():
+            os.fsync(f.fileno())
+            return True
+        return False
+
+def _fsync_directory(path: str) -> None:
+    """fsync文件所在目录，使重命名本身持久化（仅POSIX系统支持）"""
+    if not hasattr(os, 'O_DIRECTORY'):
+        return
+    fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+@contextmanager
+def atomic_open(path: str, policy: Union[str, FsyncPolicy, None] = None,
+                encoding: str = 'utf-8', binary: bool = False,
+                newline: Optional[str] = None):
+    """
+    原子写入文件的上下文管理器
+
+    写入同目录下的临时文件，正常退出时按策略fsync后重命名为目标文件；
+    发生异常则删除临时文件，原文件保持不变。策略跳过fsync时只能防进程崩溃，
+    不能防断电（见 FsyncPolicy）。binary为True时以二进制模式打开，
+    newline 同内置 open（写CSV时传入''）。
+    """
+    policy = FsyncPolicy.coerce(policy)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with (open(tmp_path, 'wb') if binary
+              else open(tmp_path, 'w', encoding=encoding, newline=newline)) as f:
+            yield f
+            synced = policy.sync(f)
+        os.replace(tmp_path, path)
+        if synced:
+            _fsync_directory(path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def write_json(path: str, data: Any, policy: Union[str, FsyncPolicy, None] = None,
+               **dump_kwargs) -> None:
+    """原子地把一个JSON文档写入文件"""
+    dump_kwargs.setdefault('ensure_ascii', False)
+    with atomic_open(path, policy) as f:
+        json.dump(data, f, **dump_kwargs)
+
+# ===== 文件锁 =====
+
+class FileLock:
+    """
+    跨进程的建议性文件锁（POSIX用flock，Windows用msvcrt.locking）
+
+    可重入：同一进程内嵌套获取只在最外层真正加锁，depth 为当前嵌套层数。
+    只对同样使用该锁的进程有效，不阻止其他程序直接修改文件。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.depth = 0
+        self._fh = None
+        self._thread_lock = threading.RLock()
+
+    def acquire(self) -> None:
+        self._thread_lock.acquire()
+        if self.depth == 0:
+            fh = open(self.path, 'a+b')
+            try:
+                if fcntl:
+                    fcntl.flock(fh.fileno(), fcntl.LOCK_EX)
+                else:
+                    fh.seek(0)
+                    msvcrt.locking(fh.fileno(), msvcrt.LK_LOCK, 1)
+            except BaseException:
+                fh.close()
+                self._thread_lock.release()
+                raise
+            self._fh = fh
+        self.depth += 1
+
+    def release(self) -> None:
+        self.depth -= 1
+        if self.depth == 0:
+            if fcntl:
+                fcntl.flock(self._fh.fileno(), fcntl.LOCK_UN)
+            else:
+                self._fh.seek(0)
+                msvcrt.locking(self._fh.fileno(), msvcrt.LK_UNLCK, 1)
+            self._fh.close()
+            self._fh = None
+        self._thread_lock.release()
+
+    def __enter__(self) -> 'FileLock':
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.release()
+
+# ===== JSON Lines =====
+
+def is_json_array_file(path: str) -> bool:
+    """文件是否为旧的JSON数组格式（第一个非空白字符是'['）"""
+    with open(path, 'r', encoding='utf-8') as f:
+        while True:
+            char = f.read(1)
+            if not char:
+                return False
+            if not char.isspace():
+                return char == '['
+
+def _iter_json_array(f, chunk_size: int) -> Iterator[Dict[str, Any]]:
+    """分块读取JSON数组，每解析出一个元素就立即产出"""
+    decoder = json.JSONDecoder()
+    buffer = f.read(chunk_size).lstrip()
+    pos = 1  # 跳过开头的'['
+
+    while True:
+        pos = _SEPARATORS.match(buffer, pos).end()
+        if pos < len(buffer) and buffer[pos] == ']':
+            return
+        try:
+            record, pos = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            # 缓冲区里只有半条记录，读入下一块再试
+            chunk = f.read(chunk_size)
+            if not chunk:
+                raise
+            buffer = buffer[pos:] + chunk
+            pos = 0
+            continue
+        yield record
+
+def iter_json_records(path: str, chunk_size: int = 1 << 16) -> Iterator[Dict[str, Any]]:
+    """逐条读取 JSON Lines 文件或旧的JSON数组文件中的记录"""
+    if not os.path.exists(path):
+        return
+
+    legacy = is_json_array_file(path)
+    with open(path, 'r', encoding='utf-8') as f:
+        if legacy:
+            yield from _iter_json_array(f, chunk_size)
+            return
+        loads = json.loads
+        for line in f:
+            if not line.isspace():
+                yield loads(line)
+
+def write_json_lines(path: str, records: Iterable[Dict[str, Any]],
+                     policy: Union[str, FsyncPolicy, None] = None) -> None:
+    """把记录逐条写成 JSON Lines（原子写入）"""
+    # json.dumps 带参数时每次都会新建编码器，这里只建一个
+    encode = json.JSONEncoder(ensure_ascii=False, separators=(',', ':')).encode
+    with atomic_open(path, policy) as f:
+        write = f.write
+        for record in records:
+            write(encode(record) + '\n')
+
+def migrate_to_json_lines(path: str) -> bool:
+    """
+    把旧的JSON数组文件就地转换为 JSON Lines
+
+    原文件先复制为 path + '.bak' 再原子写入，转换过程中崩溃不会损坏数据。
+    只在用户显式要求时调用，读取数据时不要顺手迁移。返回是否进行了转换。
+    """
+    if not os.path.exists(path) or not is_json_array_file(path):
+        return False
+
+    shutil.copy2(path, path + '.bak')
+    write_json_lines(path, iter_json_records(path), 'always')
+    return True
@@ -18,12 +18,13 @@
 """
 
 from flask import Flask, render_template, request, redirect, url_for, session, jsonify, flash
-import json
 import os
 from datetime import datetime
 from typing import List, Dict, Any
 import secrets
 
+from persistence import FsyncPolicy, iter_json_records, write_json_lines
+
 # ===== 数据模型 =====
 
 class Message:
@@ -60,28 +61,32 @@ class Message:
 class MessageBoard:
     """留言板类"""
 
-    def __init__(self, data_file: str = "messages.json"):
+    def __init__(self, data_file: str = "messages.json", fsync: str = "interval"):
         self.data_file = data_file
+        self.fsync = FsyncPolicy.coerce(fsync)  # 落盘策略: always / interval / never
         self.messages: List[Message] = []
+        self._unreadable = False  # 加载失败的文件不能被覆盖，见 save_messages
         self.load_messages()
 
     def load_messages(self) -> None:
-        """加载留言"""
+        """加载留言（JSON Lines 格式，逐条构造；旧的JSON数组文件也能直接读取）"""
         try:
-            if os.path.exists(self.data_file):
-                with open(self.data_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    self.messages = [Message.from_dict(msg_data) for msg_data in data]
-        except (json.JSONDecodeError, IOError) as e:
+            self.messages = [Message.from_dict(msg_data)
+                             for msg_data in iter_json_records(self.data_file)]
+            self._unreadable = False
+        except (ValueError, KeyError, TypeError, AttributeError, IOError) as e:
             print(f"加载留言失败: {e}")
             self.messages = []
+            self._unreadable = os.path.exists(self.data_file)
 
     def save_messages(self) -> None:
-        """保存留言"""
+        """保存留言（加载失败的文件拒绝覆盖，以免冲掉原有留言）"""
+        if self._unreadable:
+            print(f"保存留言失败: {self.data_file} 加载失败，为保护原数据拒绝覆盖")
+            return
         try:
-            data = [msg.to_dict() for msg in self.messages]
-            with open(self.data_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+            write_json_lines(self.data_file, (msg.to_dict() for msg in self.messages),
+                             self.fsync)
         except IOError as e:
             print(f"保存留言失败: {e}")
 
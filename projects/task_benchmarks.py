@@ -0,0 +1,857 @@
+# Python学习项目 - 实际项目：任务管理器的性能基准
+# 配合 task_manager.py 使用，测量各项优化（索引、批量写入、快照格式等）的效果
+# 正确性由 tests/ 下的 pytest 测试检查，这里只负责计时和对比
+
+"""
+用法:
+    python task_benchmarks.py             运行全部基准
+    python task_benchmarks.py stats deps  只运行指定的基准
+
+基准大多构造几十万到上百万个任务，运行一次需要几秒到几分钟。
+"""
+
+import contextlib
+import gc
+import io
+import os
+import random
+import shlex
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from functools import partial
+from typing import Any, Callable, Dict, List, Tuple
+
+import task_manager
+from persistence import FsyncPolicy
+from task_manager import (BinaryTaskStorage, ColumnarTaskStore, JSONTaskStorage,
+                          MemoryTaskStorage, ReminderScheduler, SQLiteTaskManager,
+                          Task, TaskHistory, TaskManager, TaskManagerUI, TaskPriority,
+                          TaskStatus, ThreadSafeTaskManager, parse_recurrence,
+                          write_task_export, _datetime_to_micros, _encode_cursor)
+
+BENCHMARK_WORDS = ["报告", "会议", "代码", "review", "deploy", "测试", "文档",
+                   "python", "数据库", "优化", "bug", "客户", "设计", "学习"]
+
+def _build_benchmark_manager(count: int, manager_class: type = TaskManager,
+                             **kwargs) -> TaskManager:
+    """构造包含count个任务的内存管理器（不读写任务文件）"""
+    manager = manager_class(storage=MemoryTaskStorage(), **kwargs)
+    priorities = list(TaskPriority)
+    words = BENCHMARK_WORDS
+    for i in range(count):
+        title = f"{words[i % 14]}{words[i * 7 % 13]} {i}"
+        description = f"基准测试任务：{words[i * 3 % 11]} {words[i * 5 % 14]}"
+        task = Task(title, description, priorities[i % len(priorities)],
+                    f"分类{i % 20}")
+        task.id = f"{i:08x}"
+        manager._insert_task(task)
+    return manager
+
+def benchmark_lookup(sizes=(1_000, 10_000, 100_000, 1_000_000),
+                     lookups: int = 10_000) -> None:
+    """比较哈希索引与线性扫描的get_task延迟"""
+    print(f"{'任务数':>10} {'哈希查找(µs)':>14} {'线性扫描(µs)':>14}")
+    for size in sizes:
+        manager = _build_benchmark_manager(size)
+        ids = list(manager._tasks)
+        probe = [ids[(i * 7919 + size // 2) % size] for i in range(lookups)]
+
+        start = time.perf_counter()
+        for task_id in probe:
+            manager.get_task(task_id)
+        hashed = (time.perf_counter() - start) / lookups * 1e6
+
+        # 线性扫描代价随规模增长，减少采样次数
+        tasks = manager.tasks
+        scan_probe = probe[:max(1, 1_000_000 // size)]
+        start = time.perf_counter()
+        for task_id in scan_probe:
+            next((t for t in tasks if t.id == task_id), None)
+        scanned = (time.perf_counter() - start) / len(scan_probe) * 1e6
+
+        print(f"{size:>10} {hashed:>14.3f} {scanned:>14.1f}")
+
+def _recompute_statistics(manager: TaskManager) -> Dict[str, Any]:
+    """遍历全部任务重新计算统计信息，作为增量统计的对照"""
+    now = datetime.now()
+    status_counts: Dict[str, int] = {}
+    priority_counts: Dict[str, int] = {}
+    category_counts: Dict[str, int] = {}
+    for task in manager.tasks:
+        status_counts[task.status.value] = status_counts.get(task.status.value, 0) + 1
+        priority_counts[task.priority.value] = priority_counts.get(task.priority.value, 0) + 1
+        category_counts[task.category] = category_counts.get(task.category, 0) + 1
+    return {
+        'total_tasks': len(manager.tasks),
+        'status_distribution': status_counts,
+        'priority_distribution': priority_counts,
+        'category_distribution': category_counts,
+        'overdue_tasks': sum(task.is_overdue(now) for task in manager.tasks),
+    }
+
+def _apply_random_mutations(manager: TaskManager, count: int, rng) -> None:
+    """对管理器执行count次随机的增、改、删操作（不输出）"""
+    statuses = [status.value for status in TaskStatus]
+    priorities = [priority.value for priority in TaskPriority]
+    now = datetime.now()
+
+    def random_due() -> str:
+        return (now + timedelta(days=rng.randint(-30, 30), hours=rng.randint(0, 23))).isoformat()
+
+    ids = list(manager._tasks)
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(count):
+            action = rng.random()
+            if action < 0.3 or not ids:
+                task = manager.add_task(f"新任务{rng.randint(0, 999)}", "",
+                                        rng.choice(priorities),
+                                        f"分类{rng.randint(0, 25)}", random_due())
+                ids.append(task.id)
+            elif action < 0.8:
+                field, value = rng.choice([
+                    ('status', rng.choice(statuses)),
+                    ('priority', rng.choice(priorities)),
+                    ('category', f"分类{rng.randint(0, 25)}"),
+                    ('due_date', random_due()),
+                ])
+                manager.update_task(rng.choice(ids), **{field: value})
+            else:
+                manager.delete_task(ids.pop(rng.randrange(len(ids))))
+
+def benchmark_statistics(size: int = 100_000, mutations: int = 20_000,
+                         seed: int = 42) -> None:
+    """随机增删改后比较增量统计与全量重算的耗时（两者一致由 tests/test_statistics.py 检查）"""
+    manager = _build_benchmark_manager(size)
+    _apply_random_mutations(manager, mutations, random.Random(seed))
+
+    start = time.perf_counter()
+    manager.get_statistics()
+    incremental_time = time.perf_counter() - start
+    start = time.perf_counter()
+    _recompute_statistics(manager)
+    full_time = time.perf_counter() - start
+
+    print(f"{size} 个任务，{mutations} 次随机修改后")
+    print(f"增量统计: {incremental_time * 1000:.3f} ms, 全量重算: {full_time * 1000:.1f} ms")
+
+def benchmark_search(size: int = 200_000, repeat: int = 20) -> None:
+    """比较倒排索引搜索与线性扫描的搜索延迟"""
+    start = time.perf_counter()
+    manager = _build_benchmark_manager(size, search_index=True)
+    print(f"建立 {size} 个任务的索引耗时 {time.perf_counter() - start:.2f} s")
+
+    print(f"{'关键词':>10} {'结果数':>8} {'索引(ms)':>10} {'线性扫描(ms)':>14}")
+    for keyword in ["数据库", "deploy", "review优化", "12345", "分类7"]:
+        start = time.perf_counter()
+        for _ in range(repeat):
+            found = manager.search_tasks(keyword)
+        indexed = (time.perf_counter() - start) / repeat * 1000
+
+        # 关闭索引即为原来的线性扫描
+        search_index, manager._search_index = manager._search_index, None
+        start = time.perf_counter()
+        for _ in range(max(1, repeat // 5)):
+            manager.search_tasks(keyword)
+        scanned = (time.perf_counter() - start) / max(1, repeat // 5) * 1000
+        manager._search_index = search_index
+
+        print(f"{keyword:>10} {len(found):>8} {indexed:>10.2f} {scanned:>14.2f}")
+
+def benchmark_load(size: int = 200_000) -> None:
+    """测量从JSON加载任务的耗时与每个任务占用的内存"""
+    import tracemalloc
+
+    path = os.path.join(tempfile.mkdtemp(), "bench_tasks.json")
+    source = _build_benchmark_manager(size)
+    now = datetime.now()
+    for i, task in enumerate(source.tasks):
+        if i % 3 == 0:
+            # 截止时间各不相同，摘要块只能精确记录其中一部分
+            task.due_date = now + timedelta(days=i % 60 - 30, microseconds=i)
+    JSONTaskStorage(path).save(source.tasks)
+    del source
+    gc.collect()
+
+    storage = JSONTaskStorage(path)
+    start = time.perf_counter()
+    tasks = storage.load()
+    elapsed = time.perf_counter() - start
+    del tasks
+    gc.collect()
+
+    tracemalloc.start()
+    tasks = storage.load()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f"加载 {size} 个任务: {elapsed:.2f} s ({elapsed / size * 1e6:.1f} µs/任务)")
+    print(f"内存: {current / size:.0f} 字节/任务 (加载峰值 {peak / size:.0f} 字节/任务)")
+    os.remove(path)
+
+def benchmark_startup(size: int = 1_000_000) -> None:
+    """比较整体加载与惰性加载下，从启动到出现提示符、stats、list 单个状态的耗时"""
+    import subprocess
+
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, "tasks.json")
+    source = _build_benchmark_manager(size)
+    now = datetime.now()
+    statuses = list(TaskStatus)
+    for i, task in enumerate(source.tasks):
+        task.status = statuses[i % len(statuses)]
+        if i % 3 == 0:
+            # 截止时间各不相同，摘要块只能精确记录其中一部分
+            task.due_date = now + timedelta(days=i % 60 - 30, microseconds=i)
+    JSONTaskStorage(path).save(source.tasks)
+    del source
+    gc.collect()
+
+    def elapsed_ms(action: Callable[[], Any]) -> float:
+        start = time.perf_counter()
+        action()
+        return (time.perf_counter() - start) * 1000
+
+    print(f"{size} 个任务，文件 {os.path.getsize(path) / 1e6:.0f} MB")
+    print(f"{'模式':>6} {'构造(ms)':>10} {'stats(ms)':>10} {'list 待办首页(ms)':>18}")
+    for lazy in (False, True):
+        holder = []
+        construct = elapsed_ms(lambda: holder.append(TaskManager(path, lazy=lazy)))
+        manager = holder.pop()
+        stats = elapsed_ms(manager.get_statistics)
+        listing = elapsed_ms(lambda: manager.list_tasks("待办", limit=TaskManagerUI.PAGE_SIZE))
+        print(f"{'惰性' if lazy else '整体':>6} {construct:>10.1f} {stats:>10.1f} {listing:>18.1f}")
+        del manager
+        gc.collect()
+
+    # 真实进程：解释器启动、导入模块、构造界面、显示提示符后立即退出
+    start = time.perf_counter()
+    subprocess.run([sys.executable, os.path.abspath(task_manager.__file__)], input="quit\n",
+                   cwd=directory, stdout=subprocess.DEVNULL, text=True,
+                   encoding='utf-8', check=True)
+    print(f"进程启动到提示符并退出: {(time.perf_counter() - start) * 1000:.0f} ms")
+
+def benchmark_batch(single_count: int = 500, bulk_count: int = 50_000) -> None:
+    """比较逐条 add_task（每条都重写文件）与 add_tasks（只写一次）的导入耗时"""
+    directory = tempfile.mkdtemp()
+    items = [{'title': f"导入任务{i}", 'priority': "高", 'category': f"分类{i % 20}"}
+             for i in range(bulk_count)]
+
+    manager = TaskManager(os.path.join(directory, "single.json"))
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for item in items[:single_count]:
+            manager.add_task(**item)
+    single = time.perf_counter() - start
+
+    manager = TaskManager(os.path.join(directory, "bulk.json"))
+    start = time.perf_counter()
+    manager.add_tasks(items)
+    bulk = time.perf_counter() - start
+
+    print(f"逐条添加 {single_count} 个任务: {single:.2f} s ({single / single_count * 1e6:.0f} µs/任务)")
+    print(f"批量添加 {bulk_count} 个任务: {bulk:.2f} s ({bulk / bulk_count * 1e6:.0f} µs/任务)")
+
+def benchmark_script(single_count: int = 500, batch_count: int = 50_000) -> None:
+    """比较交互式逐条执行命令（每条都保存）与 --batch 批处理的吞吐量"""
+    directory = tempfile.mkdtemp()
+    seeds = [{'title': f"已有任务{i}", 'category': f"分类{i % 20}"} for i in range(1000)]
+    statuses = [status.value for status in TaskStatus]
+
+    def script(manager: TaskManager, count: int) -> List[str]:
+        """添加、更新已有任务各半，每1000条穿插一次查询"""
+        ids = [task.id for task in manager.add_tasks(seeds)]
+        lines = []
+        for i in range(count):
+            if i % 1000 == 999:
+                lines.append("stats")
+            elif i % 2:
+                lines.append(f"update {ids[i % len(ids)]} status {statuses[i % 4]}")
+            else:
+                lines.append(f'add "脚本任务 {i}" 批处理 高 分类{i % 20} 2030-01-01')
+        return lines
+
+    manager = TaskManager(os.path.join(directory, "single.json"))
+    ui = TaskManagerUI(manager)
+    lines = script(manager, single_count)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for line in lines:
+            parts = shlex.split(line)
+            ui.commands[parts[0]](parts[1:])
+    single = single_count / (time.perf_counter() - start)
+
+    manager = TaskManager(os.path.join(directory, "batch.json"))
+    ui = TaskManagerUI(manager)
+    lines = script(manager, batch_count)
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = ui.run_batch(lines)
+    batch = batch_count / result['elapsed']
+
+    print(f"逐条执行 {single_count} 条命令: {single:,.0f} 条/秒")
+    print(f"批处理执行 {batch_count} 条命令: {batch:,.0f} 条/秒"
+          f"（{batch_count // 1000} 次查询分隔出 {batch_count // 1000 + 1} 次保存）")
+
+def benchmark_fsync(size: int = 1000, mutations: int = 200) -> None:
+    """比较不同fsync策略下单次修改（update_task）的延迟"""
+    directory = tempfile.mkdtemp()
+    items = [{'title': f"任务{i}", 'category': f"分类{i % 20}"} for i in range(size)]
+
+    print(f"{size} 个任务，每种配置 {mutations} 次修改")
+    print(f"{'存储':>8} {'策略':>10} {'平均(µs)':>10} {'最大(µs)':>10}")
+    for storage_name in ('json', 'journal', 'sqlite'):
+        for policy in FsyncPolicy.MODES:
+            path = os.path.join(directory, f"{storage_name}_{policy}")
+            if storage_name == 'sqlite':
+                manager = SQLiteTaskManager(path + ".db", fsync=policy)
+            else:
+                manager = TaskManager(path + ".json", journal=storage_name == 'journal',
+                                      compact_every=mutations * 2, fsync=policy)
+            tasks = manager.add_tasks(items)
+
+            latencies = []
+            with contextlib.redirect_stdout(io.StringIO()):
+                for i in range(mutations):
+                    start = time.perf_counter()
+                    manager.update_task(tasks[i % size].id, title=f"修改{i}")
+                    latencies.append(time.perf_counter() - start)
+            manager.close()
+            print(f"{storage_name:>8} {policy:>10} "
+                  f"{sum(latencies) / mutations * 1e6:>10.0f} {max(latencies) * 1e6:>10.0f}")
+
+def benchmark_write_behind(size: int = 10_000, mutations: int = 50) -> None:
+    """比较同步保存与延迟写入下单次修改的延迟"""
+    directory = tempfile.mkdtemp()
+    items = [{'title': f"任务{i}", 'category': f"分类{i % 20}"} for i in range(size)]
+
+    for write_behind in (None, 0.2):
+        path = os.path.join(directory, f"write_behind_{write_behind}.json")
+        manager = TaskManager(path, write_behind=write_behind)
+        tasks = manager.add_tasks(items)
+        manager.flush()
+
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            for i in range(mutations):
+                manager.update_task(tasks[i % size].id, title=f"修改{i}")
+        elapsed = time.perf_counter() - start
+        start = time.perf_counter()
+        manager.close()
+        closing = time.perf_counter() - start
+
+        mode = "同步保存" if write_behind is None else f"延迟写入({write_behind}s)"
+        print(f"{mode}: {mutations} 次修改 {elapsed:.2f} s "
+              f"({elapsed / mutations * 1e6:.0f} µs/次)，关闭时写入 {closing * 1000:.0f} ms")
+
+def benchmark_snapshot(sizes: Tuple[int, ...] = (100_000, 1_000_000)) -> None:
+    """比较JSON Lines与二进制快照的保存、加载耗时和文件大小"""
+    directory = tempfile.mkdtemp()
+    print(f"{'任务数':>10} {'格式':>8} {'保存(s)':>9} {'加载(s)':>9} {'字节/任务':>10}")
+    for size in sizes:
+        tasks = _build_benchmark_manager(size).tasks
+        now = datetime.now()
+        for i, task in enumerate(tasks):
+            if i % 3 == 0:
+                task.due_date = now + timedelta(days=i % 60 - 30)
+
+        for name, storage_class in (('json', JSONTaskStorage), ('binary', BinaryTaskStorage)):
+            storage = storage_class(os.path.join(directory, f"snapshot_{size}.{name}"), 'never')
+            start = time.perf_counter()
+            storage.save(tasks)
+            saved = time.perf_counter() - start
+            gc.collect()
+            start = time.perf_counter()
+            loaded = storage.load()
+            elapsed = time.perf_counter() - start
+            del loaded
+            file_size = os.path.getsize(storage.data_file)
+            print(f"{size:>10} {name:>8} {saved:>9.2f} {elapsed:>9.2f} {file_size / size:>10.0f}")
+            os.remove(storage.data_file)
+        del tasks
+        gc.collect()
+
+def benchmark_columnar(size: int = 1_000_000) -> None:
+    """比较只读列式快照与完整加载TaskManager回答报表查询的耗时"""
+    directory = tempfile.mkdtemp()
+    tasks = _build_benchmark_manager(size).tasks
+    now = datetime.now()
+    for i, task in enumerate(tasks):
+        if i % 3 == 0:
+            # 截止时间各不相同，摘要块只能精确记录其中一部分
+            task.due_date = now + timedelta(days=i % 60 - 30, microseconds=i)
+    binary_file = os.path.join(directory, "tasks.bin")
+    columnar_file = os.path.join(directory, "tasks.col")
+    BinaryTaskStorage(binary_file, 'never').save(tasks)
+    start = time.perf_counter()
+    ColumnarTaskStore.write(columnar_file, tasks, 'never')
+    print(f"写入 {size} 个任务的列式快照: {time.perf_counter() - start:.2f} s "
+          f"({os.path.getsize(columnar_file) / size:.0f} 字节/任务)")
+    del tasks
+    gc.collect()
+
+    def run_queries(target) -> List[float]:
+        timings = []
+        for query in (target.get_statistics,
+                      partial(target.list_tasks, "待办", "分类3", "高"),
+                      partial(target.list_tasks, show_overdue=True),
+                      partial(target.search_tasks, "数据库")):
+            start = time.perf_counter()
+            query()
+            timings.append(time.perf_counter() - start)
+        return timings
+
+    start = time.perf_counter()
+    store = ColumnarTaskStore(columnar_file)
+    opened = time.perf_counter() - start
+    columnar = run_queries(store)
+    store.close()
+
+    start = time.perf_counter()
+    manager = TaskManager(binary_file, snapshot_format="binary")
+    loaded = time.perf_counter() - start
+    full = run_queries(manager)
+
+    print(f"{'':>14} {'打开(s)':>8} {'统计(ms)':>9} {'过滤(ms)':>9} {'过期(ms)':>9} {'搜索(ms)':>9}")
+    for name, startup, timings in (("列式快照", opened, columnar),
+                                   ("完整加载", loaded, full)):
+        print(f"{name:>14} {startup:>8.3f} " + " ".join(f"{t * 1000:>9.1f}" for t in timings))
+
+def _shared_worker(path: str, worker: int, count: int, shared: bool) -> None:
+    """并发基准的子进程：添加count个任务，并反复更新属于自己的种子任务"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        manager = TaskManager(path, fsync="never", shared=shared)
+        seed = next(task for task in manager.tasks if task.title == f"种子{worker}")
+        for i in range(count):
+            manager.add_task(f"进程{worker}-{i}")
+            manager.update_task(seed.id, description=str(i))
+
+def benchmark_shared(processes: int = 4, count: int = 100) -> None:
+    """多个进程同时修改同一个任务文件：比较共享模式与普通模式是否丢失修改"""
+    import multiprocessing
+
+    directory = tempfile.mkdtemp()
+    for shared in (False, True):
+        path = os.path.join(directory, f"shared_{shared}.json")
+        seeds = TaskManager(path)
+        seeds.add_tasks([{'title': f"种子{worker}"} for worker in range(processes)])
+
+        start = time.perf_counter()
+        workers = [multiprocessing.Process(target=_shared_worker,
+                                           args=(path, worker, count, shared))
+                   for worker in range(processes)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - start
+
+        result = TaskManager(path)
+        added = len(result.tasks) - processes
+        seeds_ok = sum(task.description == str(count - 1)
+                       for task in result.tasks if task.title.startswith("种子"))
+        mode = "共享模式" if shared else "普通模式"
+        print(f"{mode}: {processes} 个进程各添加 {count} 个任务，"
+              f"保留 {added}/{processes * count} 个，种子任务最终更新保留 {seeds_ok}/{processes}，"
+              f"{elapsed:.2f} s ({processes * count * 2 / elapsed:.0f} 次修改/s)")
+
+def benchmark_threads(size: int = 10_000, operations: int = 40_000,
+                      thread_counts: Tuple[int, ...] = (1, 2, 4, 8, 16)) -> None:
+    """多线程压力测试：90%查询、10%修改，测量不同线程数下的吞吐量"""
+    print(f"{'线程数':>6} {'操作/s':>10} {'读(µs)':>8} {'写(µs)':>8}")
+    for threads in thread_counts:
+        manager = _build_benchmark_manager(size, ThreadSafeTaskManager)
+        ids = list(manager._tasks)
+        statuses = [status.value for status in TaskStatus]
+        per_thread = operations // threads
+        timings: Dict[str, List[float]] = {'read': [], 'write': []}
+
+        def worker(seed: int) -> None:
+            rng = random.Random(seed)
+            added: List[str] = []  # 只删除本线程添加的任务
+            read_time = write_time = 0.0
+            for i in range(per_thread):
+                start = time.perf_counter()
+                if rng.random() < 0.1:
+                    choice = rng.random()
+                    if choice < 0.4:
+                        added.extend(task.id for task in manager.add_tasks(
+                            [{'title': f"线程{seed}-{i}", 'category': "压力测试"}]))
+                    elif choice < 0.6:
+                        if added:
+                            manager.delete_tasks([added.pop()])
+                    else:
+                        manager.update_tasks({rng.choice(ids): {'status': rng.choice(statuses)}})
+                    write_time += time.perf_counter() - start
+                else:
+                    choice = rng.random()
+                    if choice < 0.4:
+                        manager.get_task(rng.choice(ids))
+                    elif choice < 0.7:
+                        manager.list_tasks(category_filter=f"分类{i % 20}", priority_filter="高")
+                    elif choice < 0.9:
+                        manager.get_statistics()
+                    else:
+                        manager.get_upcoming_tasks(30)
+                    read_time += time.perf_counter() - start
+            timings['read'].append(read_time)
+            timings['write'].append(write_time)
+
+        workers = [threading.Thread(target=worker, args=(seed,)) for seed in range(threads)]
+        start = time.perf_counter()
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        done = per_thread * threads
+        print(f"{threads:>6} {done / elapsed:>10.0f} "
+              f"{sum(timings['read']) / (done * 0.9) * 1e6:>8.1f} "
+              f"{sum(timings['write']) / (done * 0.1) * 1e6:>8.1f}")
+
+def benchmark_pagination(size: int = 1_000_000, page_size: int = 20) -> None:
+    """比较分页（首页、深处的一页）与一次取出全部结果的耗时"""
+    manager = _build_benchmark_manager(size)
+    now = datetime.now()
+    for i, task in enumerate(manager.tasks):
+        if i % 3 == 0:
+            # 截止时间各不相同，摘要块只能精确记录其中一部分
+            task.due_date = now + timedelta(days=i % 60 - 30, microseconds=i)
+    manager.tasks = manager.tasks  # 重建索引
+
+    print(f"{'查询':>24} {'全部(ms)':>10} {'首页(ms)':>10} {'第1000页(ms)':>13}")
+    for name, kwargs in (("全部 按添加顺序", {}),
+                         ("分类过滤 按添加顺序", {'category_filter': "分类3"}),
+                         ("全部 按截止日期", {'order_by': 'due_date'}),
+                         ("优先级过滤 按优先级", {'priority_filter': "高", 'order_by': 'priority'})):
+        start = time.perf_counter()
+        manager.list_tasks(**kwargs)
+        full = time.perf_counter() - start
+
+        start = time.perf_counter()
+        manager.list_tasks(limit=page_size, **kwargs)
+        first = time.perf_counter() - start
+
+        # 先取得第1000页的游标，只计最后一次翻页的耗时
+        cursor = _encode_cursor(kwargs.get('order_by', 'created'),
+                                manager._order_key(kwargs.get('order_by', 'created'))(
+                                    manager.list_tasks(**kwargs)[page_size * 999 - 1]))
+        start = time.perf_counter()
+        manager.list_tasks(limit=page_size, cursor=cursor, **kwargs)
+        deep = time.perf_counter() - start
+        print(f"{name:>24} {full * 1000:>10.1f} {first * 1000:>10.2f} {deep * 1000:>13.2f}")
+
+def benchmark_recurring(size: int = 200_000, days: Tuple[int, ...] = (1, 7, 30)) -> None:
+    """比较重复任务堆与逐个规则展开回答 get_upcoming_tasks 的耗时"""
+    manager = _build_benchmark_manager(size)
+    now = datetime.now()
+    # 1%每天、9%每周、其余每月一次，起点分散在未来一个月内
+    rules = ('daily',) + tuple(f"0 9 * * {day}" for day in range(7)) + \
+            tuple(f"30 8 {day} * *" for day in range(1, 29))
+    for i, task in enumerate(manager.tasks):
+        rule = (rules[0] if i % 100 == 0 else rules[1 + i % 7] if i % 10 == 0
+                else rules[8 + i % 28])
+        task.due_date = now + timedelta(minutes=i % (30 * 1440))
+        task.set_recurrence(rule)
+    manager.tasks = manager.tasks  # 重建索引
+
+    def naive(horizon: int) -> int:
+        """对每个规则逐次推算到期末，再整体排序"""
+        start, end = _datetime_to_micros(now), _datetime_to_micros(now + timedelta(days=horizon))
+        found = []
+        for task in manager.tasks:
+            rule = parse_recurrence(task.recurrence)
+            stamp = rule.next_at_or_after(task.due_stamp, start)
+            while stamp <= end:
+                found.append((stamp, task.id))
+                stamp = rule.next_at_or_after(task.due_stamp, stamp + 1)
+        found.sort()
+        return len(found)
+
+    print(f"{'天数':>6} {'发生次数':>10} {'堆展开(ms)':>12} {'逐个规则(ms)':>14}")
+    manager.get_upcoming_tasks(0)  # 先把堆推进到现在
+    for horizon in days:
+        start = time.perf_counter()
+        upcoming = manager.get_upcoming_tasks(horizon)
+        heap_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        naive(horizon)
+        naive_time = time.perf_counter() - start
+        print(f"{horizon:>6} {len(upcoming):>10} {heap_time * 1000:>12.1f} "
+              f"{naive_time * 1000:>14.1f}")
+
+def benchmark_reminders(size: int = 100_000, updates: int = 20_000,
+                        burst: int = 1000) -> None:
+    """测量提醒服务的建堆耗时、每次修改重新排期的开销和提醒送达的延迟"""
+    manager = _build_benchmark_manager(size)
+    now = datetime.now()
+    for i, task in enumerate(manager.tasks):
+        task.due_date = now + timedelta(minutes=10 + i % (30 * 1440))
+    manager.tasks = manager.tasks  # 重建索引
+    ids = list(manager._tasks)
+    rng = random.Random(42)
+
+    def update_cost() -> float:
+        start = time.perf_counter()
+        for _ in range(updates):
+            due = now + timedelta(minutes=rng.randrange(10, 30 * 1440))
+            manager.update_tasks({rng.choice(ids): {'due_date': due.isoformat()}})
+        return (time.perf_counter() - start) / updates * 1e6
+
+    bare = update_cost()
+    delivered = []
+    scheduler = ReminderScheduler(
+        manager, lambda reminder: delivered.append((datetime.now(), reminder.due)))
+    start = time.perf_counter()
+    scheduler.start()
+    build = time.perf_counter() - start
+    with_scheduler = update_cost()
+
+    # burst 个任务在接下来的 0.5~1.5 秒内陆续到期
+    now = datetime.now()
+    manager.update_tasks({task_id: {'due_date': (now + timedelta(
+        seconds=0.5 + i / burst)).isoformat()} for i, task_id in enumerate(ids[:burst])})
+    time.sleep(2.0)
+    scheduler.stop()
+    lateness = sorted((at - due).total_seconds() * 1000 for at, due in delivered)
+
+    print(f"建堆: {size} 个任务 {build * 1000:.1f} ms，排期 {len(scheduler)} 条")
+    print(f"每次修改: 无提醒服务 {bare:.1f} µs，有提醒服务 {with_scheduler:.1f} µs")
+    print(f"送达延迟: 中位数 {lateness[len(lateness) // 2]:.2f} ms，"
+          f"p99 {lateness[len(lateness) * 99 // 100]:.2f} ms，最大 {lateness[-1]:.2f} ms")
+
+def benchmark_import_export(size: int = 1_000_000) -> None:
+    """
+    测量CSV和JSON Lines导入导出的吞吐量
+
+    导入分两列：只进内存（校验+建索引），以及另外整体保存到JSON任务文件。
+    """
+    directory = tempfile.mkdtemp()
+    tasks = _build_benchmark_manager(size).tasks
+    now = datetime.now()
+    for i, task in enumerate(tasks):
+        if i % 3 == 0:
+            # 截止时间各不相同，摘要块只能精确记录其中一部分
+            task.due_date = now + timedelta(days=i % 60 - 30, microseconds=i)
+    print(f"{'格式':>6} {'导出(个/s)':>12} {'导入内存(个/s)':>14} "
+          f"{'导入并保存(个/s)':>16} {'文件(MB)':>9}")
+    for fmt in ('csv', 'jsonl'):
+        path = os.path.join(directory, f"tasks.{fmt}")
+        start = time.perf_counter()
+        write_task_export(tasks, path)
+        exported = size / (time.perf_counter() - start)
+
+        rates = []
+        for storage in (MemoryTaskStorage(), None):
+            manager = TaskManager(os.path.join(directory, f"imported-{fmt}.json"),
+                                  storage=storage)
+            start = time.perf_counter()
+            manager.import_tasks(path)
+            rates.append(size / (time.perf_counter() - start))
+            del manager
+        print(f"{fmt:>6} {exported:>12,.0f} {rates[0]:>14,.0f} {rates[1]:>16,.0f} "
+              f"{os.path.getsize(path) / 1e6:>9.1f}")
+
+def benchmark_dependencies(size: int = 200_000, completions: int = 5000) -> None:
+    """比较增量就绪集合与逐个检查依赖的就绪查询，并测量完成任务、关键路径和循环检查的开销"""
+    manager = _build_benchmark_manager(size)
+    tasks = manager.tasks
+    rng = random.Random(42)
+    # 5%的任务没有依赖，其余依赖前面不远处的1~3个任务，形成较深的有向无环图
+    for i, task in enumerate(tasks):
+        task.status = TaskStatus.TODO
+        if i and rng.random() >= 0.05:
+            task.depends_on = tuple({tasks[rng.randrange(max(0, i - 50), i)].id
+                                     for _ in range(rng.randint(1, 3))})
+    start = time.perf_counter()
+    manager.tasks = tasks  # 重建索引（含依赖计数）
+    print(f"任务数: {size}，建立索引: {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    def naive() -> List[Task]:
+        """逐个任务检查依赖是否全部完成"""
+        get = manager._tasks.get
+        return [task for task in manager.tasks if task.status is TaskStatus.TODO
+                and all(get(d) is None or get(d).status is TaskStatus.DONE
+                        for d in task.depends_on)]
+
+    def compare() -> None:
+        start = time.perf_counter()
+        ready = manager.ready_tasks()
+        incremental = time.perf_counter() - start
+        start = time.perf_counter()
+        manager.ready_tasks(20)
+        first_page = time.perf_counter() - start
+        start = time.perf_counter()
+        naive()
+        scan = time.perf_counter() - start
+        print(f"{len(ready):>8} {incremental * 1000:>14.1f} {first_page * 1000:>12.2f} "
+              f"{scan * 1000:>12.1f}")
+
+    print(f"{'就绪数':>8} {'就绪集合(ms)':>14} {'前20个(ms)':>12} {'逐个检查(ms)':>12}")
+    compare()
+    # 按依赖顺序完成前面的任务，就绪集合随之推进
+    start = time.perf_counter()
+    for task in tasks[:completions]:
+        manager.update_tasks({task.id: {'status': TaskStatus.DONE.value}})
+    per_completion = (time.perf_counter() - start) / completions * 1e6
+    compare()
+    print(f"完成一个任务（含更新下游计数）: {per_completion:.1f} µs")
+
+    start = time.perf_counter()
+    path = manager.critical_path(tasks[-1].id)
+    print(f"最后一个任务的关键路径: {len(path)} 个任务，"
+          f"{(time.perf_counter() - start) * 1000:.1f} ms")
+
+    # 给新任务加依赖没有下游可搜，给靠前的任务加依赖要搜遍其下游
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        fresh = manager.add_task("新任务", depends_on=[task.id for task in tasks[-3:]])
+    print(f"新任务的循环检查: {(time.perf_counter() - start) * 1e6:.0f} µs")
+    start = time.perf_counter()
+    try:
+        manager.update_tasks({tasks[completions].id: {'depends_on': fresh.id}})
+    except ValueError:
+        pass
+    print(f"拒绝形成循环的依赖（搜索下游）: "
+          f"{(time.perf_counter() - start) * 1000:.1f} ms")
+
+def benchmark_queue(size: int = 100_000, claims: int = 20_000,
+                    worker_counts: Tuple[int, ...] = (1, 4, 16), polls: int = 50) -> None:
+    """工作队列：不同工作线程数下领取+完成的吞吐量，对比轮询待办列表再排序的做法"""
+    ranks = TaskManager._PRIORITY_RANKS
+    now = datetime.now()
+
+    def build() -> ThreadSafeTaskManager:
+        manager = _build_benchmark_manager(size, ThreadSafeTaskManager)
+        for i, task in enumerate(manager.tasks):
+            if i % 3:
+                task.due_date = now + timedelta(minutes=i * 7 % 50_000)
+        manager.tasks = manager.tasks  # 重建索引
+        return manager
+
+    manager = build()
+    start = time.perf_counter()
+    for i in range(polls):
+        # 调用方自己取出全部待办任务、按优先级和截止日期挑一个再改状态
+        best = min(manager.list_tasks(TaskStatus.TODO.value),
+                   key=lambda task: (-ranks[task.priority], task.due_stamp is None,
+                                     task.due_stamp or 0, task.created_at))
+        manager.update_tasks({best.id: {'status': TaskStatus.IN_PROGRESS.value}})
+    poll_rate = polls / (time.perf_counter() - start)
+    print(f"任务数: {size}，轮询待办列表: {poll_rate:.0f} 个/s")
+
+    print(f"{'工作线程':>8} {'领取+完成/s':>12} {'首次领取(ms)':>14}")
+    for workers in worker_counts:
+        manager = build()
+        start = time.perf_counter()
+        first = manager.claim_next("预热")  # 第一次领取时建堆
+        first_time = time.perf_counter() - start
+        manager.release_task(first.id, "预热")
+        per_worker = claims // workers
+        claimed: List[str] = []
+
+        def worker(name: str) -> None:
+            done = []
+            for _ in range(per_worker):
+                task = manager.claim_next(name)
+                done.append(task.id)
+                manager.release_task(task.id, name)
+            claimed.extend(done)
+
+        threads = [threading.Thread(target=worker, args=(f"工作者{i}",))
+                   for i in range(workers)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        print(f"{workers:>8} {len(claimed) / elapsed:>12.0f} {first_time * 1000:>14.1f}")
+
+    # 一批工作者失联：租约到期后由下一次领取收回
+    for _ in range(1000):
+        manager.claim_next("失联", lease=1.0)
+    time.sleep(1.0)
+    start = time.perf_counter()
+    requeued = manager.requeue_expired()
+    elapsed = time.perf_counter() - start
+    print(f"收回{requeued}个过期租约: {elapsed * 1000:.1f} ms")
+
+def benchmark_history(size: int = 100_000, edit_counts: Tuple[int, ...] = (1, 2, 5),
+                      lookups: int = 1000) -> None:
+    """修改历史：每个任务修改不同次数时历史占用的内存（相对任务本身），以及回溯查询的耗时"""
+    import tracemalloc
+
+    edits = [{'status': TaskStatus.IN_PROGRESS.value}, {'priority': TaskPriority.HIGH.value},
+             {'status': TaskStatus.DONE.value}, {'category': "已归档"},
+             {'status': TaskStatus.TODO.value}]
+    print(f"{'每任务修改':>10} {'任务(字节/个)':>14} {'历史(字节/个)':>14} {'历史/任务':>10}")
+    for count in edit_counts:
+        gc.collect()
+        tracemalloc.start()
+        manager = _build_benchmark_manager(size, history=TaskHistory())
+        live = tracemalloc.get_traced_memory()[0]
+        for task in manager.tasks:
+            manager._log_change(task, TaskHistory.CREATE)
+        for i in range(count):
+            if i == count // 2:
+                middle = datetime.now()
+            with manager.batch():
+                for task in manager.tasks:
+                    manager._update(task, edits[i % len(edits)])
+        gc.collect()
+        history = tracemalloc.get_traced_memory()[0] - live
+        tracemalloc.stop()
+        print(f"{count:>10} {live / size:>14.0f} {history / size:>14.0f} "
+              f"{history / live:>10.2f}")
+
+    ids = [task.id for task in manager.tasks]
+    start = time.perf_counter()
+    for i in range(lookups):
+        manager.get_task_at(ids[i * 7919 % size], middle)
+    elapsed = (time.perf_counter() - start) / lookups
+    print(f"get_task_at（回退{count - count // 2}次修改）: {elapsed * 1e6:.1f} µs")
+
+    start = time.perf_counter()
+    found = manager.tasks_at(middle, TaskStatus.IN_PROGRESS.value)
+    elapsed = time.perf_counter() - start
+    print(f"tasks_at 当时进行中的任务（{len(found)} 个）: {elapsed * 1000:.0f} ms")
+
+BENCHMARKS = {
+    'lookup': benchmark_lookup,
+    'stats': benchmark_statistics,
+    'search': benchmark_search,
+    'load': benchmark_load,
+    'startup': benchmark_startup,
+    'batch': benchmark_batch,
+    'script': benchmark_script,
+    'fsync': benchmark_fsync,
+    'writebehind': benchmark_write_behind,
+    'snapshot': benchmark_snapshot,
+    'columnar': benchmark_columnar,
+    'shared': benchmark_shared,
+    'threads': benchmark_threads,
+    'page': benchmark_pagination,
+    'recurring': benchmark_recurring,
+    'remind': benchmark_reminders,
+    'import': benchmark_import_export,
+    'deps': benchmark_dependencies,
+    'queue': benchmark_queue,
+    'history': benchmark_history,
+}
+
+def main():
+    """运行命令行指定的基准（未指定时运行全部）"""
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        if name not in BENCHMARKS:
+            print(f"未知基准: {name}，可用: {', '.join(BENCHMARKS)}")
+            continue
+        print(f"\n=== 基准: {name} ===")
+        BENCHMARKS[name]()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,320 @@
+# Python学习项目 - 实际项目：任务管理器的只读列式快照
+# 由 task_manager.py columnar 生成，供报表按列读取
+# 本模块展示如何用 mmap 和 struct 按需读取列式文件，不把整个文件载入内存
+
+"""
+只读列式快照:
+1. 每个字段单独成列，统计和过滤只读取用到的列
+2. TaskRow 按需读取单行的字段，不创建 Task 对象
+"""
+
+import bisect
+import mmap
+import struct
+import sys
+from array import array
+from collections import Counter
+from datetime import datetime
+from typing import List, Dict, Optional, Any, Iterable, Tuple
+
+from persistence import atomic_open
+from task_models import Task, TaskPriority, TaskStatus, _datetime_to_micros
+
+# ===== 只读列式快照 =====
+
+def _column_property(column: str, doc: str) -> property:
+    return property(lambda row: row._store._value(column, row._row), doc=doc)
+
+class TaskRow:
+    """
+    列式快照中的一行
+
+    只记录所属快照和行号，访问属性时才从映射的缓冲区读取，
+    接口与 Task 的只读部分一致（属性、to_dict、is_overdue、str）。
+    """
+
+    __slots__ = ('_store', '_row')
+
+    def __init__(self, store: 'ColumnarTaskStore', row: int):
+        self._store = store
+        self._row = row
+
+    id = _column_property('id', "任务ID")
+    title = _column_property('title', "标题")
+    description = _column_property('description', "描述")
+    priority = _column_property('priority', "优先级")
+    category = _column_property('category', "分类")
+    status = _column_property('status', "状态")
+    # 原始微秒值，供与 Task 共用的时间戳描述符读取
+    _due_date = _column_property('due', "截止日期（微秒）")
+    _created_at = _column_property('created', "创建时间（微秒）")
+    _updated_at = _column_property('updated', "更新时间（微秒）")
+    _completed_at = _column_property('completed', "完成时间（微秒）")
+    recurrence = None  # 列式快照不保存重复规则、依赖和领取信息
+    depends_on = ()
+    claimed_by = None
+    _lease_until = None
+
+    due_date = Task.due_date
+    created_at = Task.created_at
+    updated_at = Task.updated_at
+    completed_at = Task.completed_at
+    to_dict = Task.to_dict
+    is_overdue = Task.is_overdue
+    days_until_due = Task.days_until_due
+    __str__ = Task.__str__
+
+class ColumnarTaskStore:
+    """
+    只读的内存映射列式快照
+
+    文件按列保存：优先级、状态、分类下标各占一列定长整数，四个时间戳各为
+    一列int64微秒，ID/标题/描述为偏移数组加UTF-8数据块，另有一列小写的
+    搜索文本和按截止日期排序的未完成任务行号。打开时只做 mmap，
+    查询直接读取映射的缓冲区，不构造 Task 对象；多个报表进程打开同一个
+    文件时共享操作系统的页缓存。
+
+    带时区的时间戳写入时换算为本地时间；重复规则不写入快照。
+    """
+
+    MAGIC = b'TASKCOL1'
+    # 各数据段依次排列，段目录记录每段的 (偏移, 长度)
+    SECTIONS = (('priority', 'B'), ('status', 'B'), ('category', 'I'),
+                ('due', 'q'), ('created', 'q'), ('updated', 'q'), ('completed', 'q'),
+                ('id_offsets', 'Q'), ('id_data', None),
+                ('title_offsets', 'Q'), ('title_data', None),
+                ('description_offsets', 'Q'), ('description_data', None),
+                ('search_offsets', 'Q'), ('search_data', None),
+                ('category_offsets', 'Q'), ('category_data', None),
+                ('due_order', 'I'))
+    STRINGS = ('id', 'title', 'description')
+    _HEADER = struct.Struct('<8scQ')  # 魔数、字节序、任务数
+    _SECTION = struct.Struct('<QQ')
+    _NONE = -(1 << 63)
+    _BYTEORDER = b'<' if sys.byteorder == 'little' else b'>'
+    _PRIORITY_CODES = {priority: code for code, priority in enumerate(TaskPriority)}
+    _STATUS_CODES = {status: code for code, status in enumerate(TaskStatus)}
+
+    @classmethod
+    def write(cls, path: str, tasks: Iterable[Task], policy=None) -> int:
+        """把任务写成列式快照，返回任务数"""
+        tasks = list(tasks)
+        categories: Dict[str, int] = {}
+        # 定长列（字符串的偏移数组在下面单独生成）
+        columns: Dict[str, Any] = {name: array(code) for name, code in cls.SECTIONS
+                                   if code and not name.endswith('_offsets')}
+        strings = {field: [] for field in cls.STRINGS + ('search',)}
+        for task in tasks:
+            columns['priority'].append(cls._PRIORITY_CODES[task.priority])
+            columns['status'].append(cls._STATUS_CODES[task.status])
+            columns['category'].append(categories.setdefault(task.category, len(categories)))
+            due = task.due_stamp
+            columns['due'].append(cls._NONE if due is None else due)
+            for column, slot in (('created', '_created_at'), ('updated', '_updated_at'),
+                                 ('completed', '_completed_at')):
+                value = getattr(task, slot)
+                if isinstance(value, datetime):
+                    value = _datetime_to_micros(value.astimezone().replace(tzinfo=None))
+                columns[column].append(cls._NONE if value is None else value)
+            strings['id'].append(task.id)
+            strings['title'].append(task.title)
+            strings['description'].append(task.description)
+            # 每行以\0结尾，关键词不会跨行或跨字段匹配
+            strings['search'].append(f"{task.title.lower()}\0{task.description.lower()}"
+                                     f"\0{task.category.lower()}\0")
+        strings['category'] = list(categories)
+
+        data: Dict[str, bytes] = {}
+        for field, values in strings.items():
+            encoded = [value.encode('utf-8') for value in values]
+            offsets = array('Q', [0])
+            for value in encoded:
+                offsets.append(offsets[-1] + len(value))
+            data[field + '_offsets'] = offsets.tobytes()
+            data[field + '_data'] = b''.join(encoded)
+        due, none = columns['due'], cls._NONE
+        due_order = sorted((row for row, task in enumerate(tasks)
+                            if task.status != TaskStatus.DONE and due[row] != none),
+                           key=due.__getitem__)
+        columns['due_order'].extend(due_order)
+        for name, column in columns.items():
+            data[name] = column.tobytes()
+
+        # 段目录之后按8字节对齐依次写入各段
+        position = cls._HEADER.size + cls._SECTION.size * len(cls.SECTIONS)
+        directory = []
+        for name, _ in cls.SECTIONS:
+            position += -position % 8
+            directory.append((position, len(data[name])))
+            position += len(data[name])
+        with atomic_open(path, policy, binary=True) as f:
+            f.write(cls._HEADER.pack(cls.MAGIC, cls._BYTEORDER, len(tasks)))
+            for entry in directory:
+                f.write(cls._SECTION.pack(*entry))
+            for (name, _), (offset, _) in zip(cls.SECTIONS, directory):
+                f.write(b'\0' * (offset - f.tell()))
+                f.write(data[name])
+        return len(tasks)
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, byteorder, self._count = self._HEADER.unpack_from(self._mm, 0)
+        if magic != self.MAGIC:
+            self._mm.close()
+            raise ValueError(f"不是列式任务快照: {path}")
+        if byteorder != self._BYTEORDER:
+            self._mm.close()
+            raise ValueError(f"列式快照的字节序与本机不同: {path}")
+
+        self._bounds: Dict[str, Tuple[int, int]] = {}
+        self._columns: Dict[str, memoryview] = {}
+        view = memoryview(self._mm)
+        for i, (name, code) in enumerate(self.SECTIONS):
+            offset, length = self._SECTION.unpack_from(
+                self._mm, self._HEADER.size + i * self._SECTION.size)
+            self._bounds[name] = (offset, offset + length)
+            if code:
+                self._columns[name] = view[offset:offset + length].cast(code)
+        view.release()
+        self._categories = [self._string('category', i)
+                            for i in range(len(self._columns['category_offsets']) - 1)]
+        self._category_codes = {category: i for i, category in enumerate(self._categories)}
+        self._priorities, self._statuses = list(TaskPriority), list(TaskStatus)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __enter__(self) -> 'ColumnarTaskStore':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """解除映射（需先释放指向映射的所有视图）"""
+        for column in self._columns.values():
+            column.release()
+        self._columns = {}
+        self._mm.close()
+
+    def _string(self, field: str, row: int) -> str:
+        offsets = self._columns[field + '_offsets']
+        base = self._bounds[field + '_data'][0]
+        return self._mm[base + offsets[row]:base + offsets[row + 1]].decode('utf-8')
+
+    def _value(self, column: str, row: int):
+        """读取一个单元格，转换为与 Task 相同的类型"""
+        if column in self.STRINGS:
+            return self._string(column, row)
+        value = self._columns[column][row]
+        if column == 'priority':
+            return self._priorities[value]
+        if column == 'status':
+            return self._statuses[value]
+        if column == 'category':
+            return self._categories[value]
+        return None if value == self._NONE else value
+
+    def _rows(self, rows: Iterable[int]) -> List[TaskRow]:
+        return [TaskRow(self, row) for row in rows]
+
+    def _overdue_rows(self, now: datetime) -> List[int]:
+        """截止日期早于now的未完成任务行号（按截止日期排序）"""
+        due, order = self._columns['due'], self._columns['due_order']
+        stamp = _datetime_to_micros(now)
+        low, high = 0, len(order)
+        while low < high:
+            middle = (low + high) // 2
+            if due[order[middle]] < stamp:
+                low = middle + 1
+            else:
+                high = middle
+        return order[:low].tolist()
+
+    def _count_column(self, column: str) -> Dict[int, int]:
+        """统计一列中各编码出现的次数"""
+        codes = self._columns[column]
+        if codes.itemsize == 1:
+            # 单字节列直接在字节串上计数，在C层完成
+            raw = codes.tobytes()
+            return {code: raw.count(code) for code in set(raw)}
+        return dict(Counter(codes))
+
+    def list_tasks(self, status_filter: Optional[str] = None,
+                   category_filter: Optional[str] = None,
+                   priority_filter: Optional[str] = None,
+                   show_overdue: bool = False) -> List[TaskRow]:
+        """列出任务（过滤条件与 TaskManager.list_tasks 相同）"""
+        conditions = []
+        if status_filter:
+            try:
+                status_code = self._statuses.index(TaskStatus(status_filter))
+                conditions.append((self._columns['status'], status_code))
+            except ValueError:
+                print(f"无效的状态过滤: {status_filter}")
+
+        if category_filter:
+            if category_filter not in self._category_codes:
+                return []
+            conditions.append((self._columns['category'],
+                               self._category_codes[category_filter]))
+
+        if priority_filter:
+            try:
+                priority_code = self._priorities.index(TaskPriority(priority_filter))
+                conditions.append((self._columns['priority'], priority_code))
+            except ValueError:
+                print(f"无效的优先级过滤: {priority_filter}")
+
+        rows = sorted(self._overdue_rows(datetime.now())) if show_overdue else range(self._count)
+        for column, code in conditions:
+            rows = [row for row in rows if column[row] == code]
+        return self._rows(rows)
+
+    def search_tasks(self, keyword: str) -> List[TaskRow]:
+        """在标题、描述、分类中搜索（大小写不敏感），结果按添加顺序"""
+        keyword_lower = keyword.lower()
+        if not keyword_lower or '\0' in keyword_lower:
+            return [row for row in self._rows(range(self._count))
+                    if keyword_lower in row.title.lower()
+                    or keyword_lower in row.description.lower()
+                    or keyword_lower in row.category.lower()]
+
+        # 在小写搜索文本上用 mmap.find 查找，再由命中位置找出所在行
+        needle = keyword_lower.encode('utf-8')
+        offsets = self._columns['search_offsets']
+        last = len(offsets) - 1
+        start, end = self._bounds['search_data']
+        rows = []
+        row = 0
+        position = self._mm.find(needle, start, end)
+        while position != -1:
+            position -= start
+            # 命中位置递增，从上一行开始倍增步长查找上界再二分，
+            # 命中密集时只需几步，稀疏时也不超过一次完整二分
+            low, high, step = row, row + 1, 1
+            while high < last and offsets[high] <= position:
+                low, high, step = high, min(high + step, last), step * 2
+            row = bisect.bisect_right(offsets, position, low, high) - 1
+            rows.append(row)
+            row += 1
+            position = self._mm.find(needle, start + offsets[row], end)
+        return self._rows(rows)
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """统计信息（字段与 TaskManager.get_statistics 相同）"""
+        total = self._count
+        status_counts = {self._statuses[code].value: count
+                         for code, count in self._count_column('status').items()}
+        return {
+            'total_tasks': total,
+            'status_distribution': status_counts,
+            'priority_distribution': {self._priorities[code].value: count
+                                      for code, count in self._count_column('priority').items()},
+            'category_distribution': {self._categories[code]: count
+                                      for code, count in self._count_column('category').items()},
+            'overdue_tasks': len(self._overdue_rows(datetime.now())),
+            'completion_rate': (status_counts.get(TaskStatus.DONE.value, 0) / total * 100) if total > 0 else 0
+        }
@@ -11,212 +11,1048 @@
 2. 任务分类和优先级管理
 3. 任务状态跟踪 (待办/进行中/完成)
 4. 截止日期和提醒功能
-5. 数据持久化 (JSON文件存储)
+5. 数据持久化：JSON Lines 或二进制快照、追加式日志、延迟写入、SQLite 数据库
 6. 统计和报告功能
-7. 命令行用户界面
-8. 任务搜索和过滤
+7. 命令行用户界面，以及非交互的批处理脚本 (--batch)
+8. 任务搜索和过滤，可选全文搜索索引，分页列表
+9. 重复任务（每天/每周/cron规则）
+10. 任务依赖：就绪任务和关键路径
+11. 工作队列：按优先级领取任务，租约到期自动收回
+12. 修改历史：查询任务在任意时刻的状态
+13. 并发：线程安全的读写锁，多个进程通过文件锁共享同一个任务文件 (--shared)
+14. 后台到期提醒服务 (--remind)
+15. CSV / JSON Lines 导入导出，供报表使用的只读列式快照
+
+任务和重复规则在 task_models.py，存储后端在 task_storage.py，列式快照在 task_columnar.py；
+文件读写的通用工具（原子写入、fsync策略、文件锁）在 persistence.py，
+性能基准在 task_benchmarks.py。
 """
 
+import asyncio
+import base64
+import bisect
+import contextlib
+import csv
+import heapq
+import inspect
 import json
 import os
+import re
+import shlex
+import sqlite3
+import struct
+import sys
+import threading
+import time
+from collections import Counter
 from datetime import datetime, timedelta
-from typing import List, Dict, Optional, Any
+from typing import List, Dict, Optional, Any, Iterable, Iterator, Set, Tuple, Callable, Union
 from enum import Enum
+from functools import partial, wraps
+from itertools import count, groupby, islice
 import uuid
 
-# ===== 数据模型 =====
-
-class TaskStatus(Enum):
-    """任务状态枚举"""
-    TODO = "待办"
-    IN_PROGRESS = "进行中"
-    DONE = "完成"
-    CANCELLED = "已取消"
-
-class TaskPriority(Enum):
-    """任务优先级枚举"""
-    LOW = "低"
-    MEDIUM = "中"
-    HIGH = "高"
-    URGENT = "紧急"
-
-class Task:
-    """任务类"""
-
-    def __init__(self, title: str, description: str = "",
-                 priority: TaskPriority = TaskPriority.MEDIUM,
-                 category: str = "默认",
-                 due_date: Optional[datetime] = None):
-        self.id = str(uuid.uuid4())[:8]  # 简短的UUID
-        self.title = title
-        self.description = description
-        self.priority = priority
-        self.category = category
-        self.status = TaskStatus.TODO
-        self.due_date = due_date
-        self.created_at = datetime.now()
-        self.updated_at = datetime.now()
-        self.completed_at: Optional[datetime] = None
-
-    def to_dict(self) -> Dict[str, Any]:
-        """转换为字典格式（用于JSON序列化）"""
-        return {
-            'id': self.id,
-            'title': self.title,
-            'description': self.description,
-            'priority': self.priority.value,
-            'category': self.category,
-            'status': self.status.value,
-            'due_date': self.due_date.isoformat() if self.due_date else None,
-            'created_at': self.created_at.isoformat(),
-            'updated_at': self.updated_at.isoformat(),
-            'completed_at': self.completed_at.isoformat() if self.completed_at else None,
-        }
-
-    @classmethod
-    def from_dict(cls, data: Dict[str, Any]) -> 'Task':
-        """从字典创建任务实例"""
-        task = cls(
-            title=data['title'],
-            description=data.get('description', ''),
-            priority=TaskPriority(data.get('priority', '中')),
-            category=data.get('category', '默认'),
-        )
-        task.id = data['id']
-        task.status = TaskStatus(data.get('status', '待办'))
-
-        if data.get('due_date'):
-            task.due_date = datetime.fromisoformat(data['due_date'])
-        if data.get('created_at'):
-            task.created_at = datetime.fromisoformat(data['created_at'])
-        if data.get('updated_at'):
-            task.updated_at = datetime.fromisoformat(data['updated_at'])
-        if data.get('completed_at'):
-            task.completed_at = datetime.fromisoformat(data['completed_at'])
+from persistence import FileLock, FsyncPolicy, atomic_open, migrate_to_json_lines
+# 数据模型、存储后端和列式快照各自成为模块，这里一并导入，
+# 原有的 from task_manager import ... 仍然可用
+from task_models import (Recurrence, Task, TaskOccurrence, TaskPriority, TaskStatus,
+                         parse_dependencies, parse_recurrence, _datetime_to_micros,
+                         _expand_occurrences, _local_micros, _micros_to_datetime, _parse_stamp,
+                         _stamp_isoformat)
+from task_storage import (SNAPSHOT_FORMATS, SUMMARY_KEY, SUMMARY_MAX_DUE, BinaryJournalTaskStorage,
+                          BinaryTaskStorage, JournalTaskStorage, JSONTaskStorage,
+                          MemoryTaskStorage, SQLiteTaskStorage, TaskStorage,
+                          WriteBehindTaskStorage, convert_snapshot, load_snapshot, store_summary,
+                          summary_overdue, _gc_paused, _iter_task_records)
+from task_columnar import ColumnarTaskStore, TaskRow
+
+# ===== 全文搜索索引 =====
+
+class TaskSearchIndex:
+    """
+    任务全文搜索的倒排索引
+
+    以字符二元组(bigram)为词项建立倒排表：中文没有空格分词，
+    按字符切分可以同时支持"默认"这样的中文和英文单词。查询时
+    先对关键词的所有二元组求交集得到候选，再做子串校验，
+    因此结果与线性扫描的子串匹配完全一致，只是额外按相关度排序。
+    """
+
+    FIELDS = ('title', 'category', 'description')
 
-        return task
+    def __init__(self):
+        self._postings: Dict[str, Set[str]] = {}
+
+    @staticmethod
+    def _bigrams(text: str) -> Set[str]:
+        return {text[i:i + 2] for i in range(len(text) - 1)}
+
+    def _task_grams(self, task: Task) -> Set[str]:
+        grams: Set[str] = set()
+        # 逐字段切分，避免产生跨字段的二元组
+        for field in self.FIELDS:
+            grams |= self._bigrams(getattr(task, field).lower())
+        return grams
+
+    def add(self, task: Task) -> None:
+        postings = self._postings
+        for gram in self._task_grams(task):
+            ids = postings.get(gram)
+            if ids is None:
+                postings[gram] = {task.id}
+            else:
+                ids.add(task.id)
+
+    def remove(self, task: Task) -> None:
+        """移除任务（必须在修改字段之前调用，以便算出原来的词项）"""
+        for gram in self._task_grams(task):
+            ids = self._postings.get(gram)
+            if ids is not None:
+                ids.discard(task.id)
+                if not ids:
+                    del self._postings[gram]
+
+    def candidates(self, keyword: str) -> Optional[Set[str]]:
+        """
+        可能包含关键词的任务ID集合
 
-    def update(self, **kwargs) -> None:
-        """更新任务属性"""
-        for key, value in kwargs.items():
-            if hasattr(self, key):
-                if key == 'priority':
-                    value = TaskPriority(value)
-                elif key == 'status':
-                    value = TaskStatus(value)
-                elif key == 'due_date' and value:
-                    value = datetime.fromisoformat(value)
-                setattr(self, key, value)
-
-        self.updated_at = datetime.now()
-
-        # 如果状态变为完成，设置完成时间
-        if kwargs.get('status') == TaskStatus.DONE and not self.completed_at:
-            self.completed_at = datetime.now()
-
-    def is_overdue(self) -> bool:
-        """检查任务是否过期"""
-        if self.due_date and self.status != TaskStatus.DONE:
-            return datetime.now() > self.due_date
-        return False
-
-    def days_until_due(self) -> Optional[int]:
-        """计算距离截止日期的天数"""
-        if not self.due_date:
+        关键词不足两个字符时无法使用二元组，返回None表示需要全量扫描。
+        """
+        grams = self._bigrams(keyword.lower())
+        if not grams:
             return None
-        delta = self.due_date - datetime.now()
-        return delta.days
-
-    def __str__(self) -> str:
-        """字符串表示"""
-        status_icon = {
-            TaskStatus.TODO: "⏳",
-            TaskStatus.IN_PROGRESS: "🔄",
-            TaskStatus.DONE: "✅",
-            TaskStatus.CANCELLED: "❌"
-        }
-
-        priority_color = {
-            TaskPriority.LOW: "🟢",
-            TaskPriority.MEDIUM: "🟡",
-            TaskPriority.HIGH: "🟠",
-            TaskPriority.URGENT: "🔴"
-        }
-
-        due_info = ""
-        if self.due_date:
-            days = self.days_until_due()
-            if days is not None:
-                if days < 0:
-                    due_info = f" 过期{-days}天"
-                elif days == 0:
-                    due_info = " 今天截止"
-                else:
-                    due_info = f" {days}天后截止"
-
-        return (f"{status_icon[self.status]} {priority_color[self.priority]} "
-                f"[{self.id}] {self.title} ({self.category}){due_info}")
+        postings = sorted((self._postings.get(gram, set()) for gram in grams), key=len)
+        ids = postings[0]
+        for other in postings[1:]:
+            if not ids:
+                break
+            ids = ids & other
+        return ids
+
+    @staticmethod
+    def score(task: Task, keyword_lower: str) -> int:
+        """相关度评分：标题3分（以关键词开头再加1分）、分类2分、描述1分，0表示不匹配"""
+        score = 0
+        title = task.title.lower()
+        if keyword_lower in title:
+            score += 4 if title.startswith(keyword_lower) else 3
+        if keyword_lower in task.category.lower():
+            score += 2
+        if keyword_lower in task.description.lower():
+            score += 1
+        return score
+
+# ===== 批量修改 =====
+
+class TaskBatch:
+    """
+    批量修改的上下文管理器
+
+    仿照 advanced/context_managers.py 中的 TransactionManager：批量期间的
+    修改立即在内存中生效并登记回滚操作，正常退出时一次性持久化，发生
+    异常则按相反顺序执行回滚操作并让异常继续传播。
+    可以嵌套使用：只有最外层退出时才持久化，内层失败只回滚内层的修改。
+    """
+
+    def __init__(self, manager: 'TaskManager'):
+        self.manager = manager
+        self.changes: List[Tuple[str, Task]] = []
+        self.rollback_operations: List[Callable[[], None]] = []
+        self._marks: List[Tuple[int, int]] = []
+
+    def __enter__(self):
+        """开始（或进入一层嵌套的）批量修改"""
+        if not self._marks:
+            self.manager._acquire()
+            # 线程安全的管理器为每个线程创建独立的批量对象，取得锁后才登记
+            self.manager._batch = self
+            self.manager.storage.begin()
+        self._marks.append((len(self.rollback_operations), len(self.changes)))
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """结束批量修改：成功则持久化，失败则回滚"""
+        rollback_mark, changes_mark = self._marks.pop()
+        if exc_type:
+            # 回滚操作会追加补偿性的修改记录，保证内层回滚后外层持久化的结果正确
+            for rollback_op in reversed(self.rollback_operations[rollback_mark:]):
+                rollback_op()
+            del self.rollback_operations[rollback_mark:]
+            self.manager._restore_order()
+            if self._marks:
+                del self.changes[changes_mark:]
+
+        if self._marks:
+            return False  # 内层，交给外层处理
+
+        self.manager._batch = None
+        storage = self.manager.storage
+        try:
+            if exc_type:
+                storage.rollback()
+            elif storage.transactional:
+                storage.commit()
+            elif self.changes:
+                # 同一任务多次修改只需持久化最后一次
+                latest: Dict[str, Tuple[str, Task]] = {}
+                for op, task in self.changes:
+                    latest[task.id] = (op, task)
+                storage.record_many(latest.values(), self.manager._tasks.values())
+            if not exc_type:
+                self.manager._flush_history()
+        except (IOError, sqlite3.Error) as e:
+            print(f"保存任务数据失败: {e}")
+        finally:
+            self.manager._release()
+        return False  # 不处理异常
+
+# ===== 导入导出 =====
+
+# 导出文件的列，与 Task.to_dict 的键一致
+EXPORT_FIELDS = ('id', 'title', 'description', 'priority', 'category', 'status',
+                 'due_date', 'created_at', 'updated_at', 'completed_at', 'recurrence',
+                 'depends_on', 'claimed_by', 'lease_until')
+EXPORT_FORMATS = {'.csv': 'csv', '.jsonl': 'jsonl', '.json': 'jsonl', '.ndjson': 'jsonl'}
+# 每块的任务数：一块内的记录一起校验、一起写出
+CHUNK_SIZE = 10_000
+
+def _export_format(path: str, fmt: Optional[str]) -> str:
+    """导入导出的文件格式：显式指定，或按扩展名推断"""
+    if fmt is None:
+        fmt = EXPORT_FORMATS.get(os.path.splitext(path)[1].lower())
+        if fmt is None:
+            raise ValueError(f"无法从扩展名判断格式: {path}（支持 .csv/.jsonl）")
+    if fmt not in ('csv', 'jsonl'):
+        raise ValueError(f"无效的格式: {fmt}，可用: csv, jsonl")
+    return fmt
+
+def _chunks(iterable: Iterable, size: int) -> Iterator[list]:
+    """把可迭代对象切成每块size个元素的列表"""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+def iter_import_chunks(path: str, fmt: Optional[str] = None,
+                       chunk_size: int = CHUNK_SIZE) -> Iterator[List[Dict[str, Any]]]:
+    """逐块读取导入文件中的记录（CSV第一行为表头）"""
+    if _export_format(path, fmt) == 'jsonl':
+        yield from _chunks(_iter_task_records(path), chunk_size)
+        return
+    with open(path, 'r', newline='', encoding='utf-8-sig') as csvfile:
+        reader = csv.reader(csvfile)
+        header = next(reader, None)
+        if header is None:
+            return
+        # 与 csv.DictReader 相同的结果，但由 zip 在C层组装字典，快一倍
+        yield from _chunks((dict(zip(header, row)) for row in reader), chunk_size)
+
+def _enum_lookup(enum: type, field: str, name: str, default: str,
+                 records: List[Dict[str, Any]], first_row: int) -> Dict[Any, Enum]:
+    """
+    一次校验一块记录中某个枚举字段的所有不同取值，返回 取值 -> 枚举 的对照表
+
+    取值种类很少，逐行构造枚举的开销变成了逐行查字典。
+    """
+    lookup = {}
+    for value in {record.get(field) for record in records}:
+        try:
+            lookup[value] = enum(value or default)
+        except ValueError:
+            row = next(i for i, record in enumerate(records, first_row)
+                       if record.get(field) == value)
+            raise ValueError(f"第{row}条记录: 无效的{name}: {value}") from None
+    return lookup
+
+def tasks_from_records(records: List[Dict[str, Any]], first_row: int = 1) -> List[Task]:
+    """
+    把一块导入记录转换为任务，任一条无效则抛出ValueError（指出第几条记录）
+
+    优先级和状态按块统一校验；缺少ID的记录生成新ID，缺少时间戳的取当前时间。
+    """
+    priorities = _enum_lookup(TaskPriority, 'priority', "优先级", "中", records, first_row)
+    statuses = _enum_lookup(TaskStatus, 'status', "状态", "待办", records, first_row)
+    now = _datetime_to_micros(datetime.now())
+    new, intern = Task.__new__, sys.intern
+    tasks = []
+    row = first_row
+    try:
+        for row, record in enumerate(records, first_row):
+            task = new(Task)
+            task.id = record.get('id') or str(uuid.uuid4())[:8]
+            task.title = record['title']
+            if not task.title:
+                raise ValueError("标题不能为空")
+            task.description = record.get('description') or ''
+            task.priority = priorities[record.get('priority')]
+            task.category = intern(record.get('category') or '默认')
+            task.status = statuses[record.get('status')]
+            task._due_date = _parse_stamp(record.get('due_date'))
+            task._completed_at = _parse_stamp(record.get('completed_at'))
+            task._created_at = _parse_stamp(record.get('created_at')) or now
+            task._updated_at = _parse_stamp(record.get('updated_at')) or now
+            recurrence = record.get('recurrence')
+            task.recurrence = parse_recurrence(recurrence).text if recurrence else None
+            dependencies = record.get('depends_on')
+            task.depends_on = parse_dependencies(dependencies) if dependencies else ()
+            task.claimed_by = record.get('claimed_by') or None
+            task._lease_until = _parse_stamp(record.get('lease_until'))
+            tasks.append(task)
+    except KeyError as e:
+        raise ValueError(f"第{row}条记录: 缺少字段 {e}") from None
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"第{row}条记录: {e}") from None
+    return tasks
+
+def write_task_export(tasks: Iterable[Task], path: str, fmt: Optional[str] = None,
+                      chunk_size: int = CHUNK_SIZE) -> int:
+    """把任务逐块写成CSV或JSON Lines（原子写入），返回导出的任务数"""
+    fmt = _export_format(path, fmt)
+    count = 0
+    with atomic_open(path, newline='' if fmt == 'csv' else None) as f:
+        if fmt == 'csv':
+            writer = csv.writer(f)
+            writer.writerow(EXPORT_FIELDS)
+        dumps = json.JSONEncoder(ensure_ascii=False, separators=(',', ':')).encode
+        for chunk in _chunks(tasks, chunk_size):
+            records = [task.to_dict() for task in chunk]
+            if fmt == 'csv':
+                for record in records:
+                    if 'depends_on' in record:
+                        record['depends_on'] = ' '.join(record['depends_on'])
+                writer.writerows([record.get(field) or '' for field in EXPORT_FIELDS]
+                                 for record in records)
+            else:
+                f.write(''.join(dumps(record) + '\n' for record in records))
+            count += len(chunk)
+    return count
+
+# ===== 修改历史 =====
+
+class TaskHistory:
+    """
+    任务的修改历史，按字段记录差异
+
+    每个任务一个按时间排列的条目列表，条目为 (时间微秒, 操作, 操作者, 旧值)：
+    create 没有旧值；update 只记下变化了的字段的旧值，扁平地存为
+    (槽位, 旧值, 槽位, 旧值, ...)；delete 保留被删除的 Task 对象本身。
+    任务的当前状态就在内存中，从它倒着撤销条目就能得到任意时刻的状态，
+    所以只保存旧值而不保存副本。update 的时间就是修改后的 updated_at，
+    旧的 updated_at 通常等于上一个条目的时间，这时省略不记。
+
+    path 不为None时条目追加写入该 JSON Lines 文件（每行一条，值为导出格式），
+    第一次使用时才读入；多个进程共享任务文件时可以读入其他进程追加的条目。
+    """
+
+    CREATE, UPDATE, DELETE = 'create', 'update', 'delete'
+    # 字段名 -> Task 槽位（时间戳槽位带下划线前缀）
+    _SLOTS = {slot.lstrip('_'): slot for slot in Task.__slots__}
+
+    def __init__(self, path: Optional[str] = None, fsync: str = "interval"):
+        self.path = path
+        self.fsync = FsyncPolicy.coerce(fsync)
+        self._entries: Dict[str, list] = {}
+        self._pending: List[Tuple[str, tuple]] = []  # 尚未写入文件的条目
+        self._offset = 0  # 文件中已读入部分的字节数
+        self._fh = None
+        self._loaded = path is None
+        self._load_lock = threading.Lock()  # 并发的查询可能同时触发第一次读入
+
+    def entries(self, task_id: str) -> list:
+        """任务的条目列表（从早到晚），没有记录时为空"""
+        self._ensure_loaded()
+        return self._entries.get(task_id, [])
+
+    def items(self) -> Iterator[Tuple[str, list]]:
+        """所有有记录的任务ID及其条目"""
+        self._ensure_loaded()
+        return iter(self._entries.items())
+
+    def append(self, task_id: str, stamp: int, op: str, actor: Optional[str],
+               old: Any = None) -> None:
+        self._ensure_loaded()
+        entry = (stamp, op, actor, old)
+        self._entries.setdefault(task_id, []).append(entry)
+        if self.path is not None:
+            self._pending.append((task_id, entry))
+
+    def discard_last(self, task_id: str) -> None:
+        """撤销任务最近的一个条目（批量回滚时按相反顺序调用，条目必定尚未写入文件）"""
+        entries = self._entries[task_id]
+        entry = entries.pop()
+        if not entries:
+            del self._entries[task_id]
+        if self._pending and self._pending[-1][1] is entry:
+            self._pending.pop()
+
+    def flush(self) -> None:
+        """把新条目追加到文件"""
+        if not self._pending:
+            return
+        self.catch_up()
+        if self._fh is None:
+            self._fh = open(self.path, 'ab')
+        encode = json.JSONEncoder(ensure_ascii=False, separators=(',', ':')).encode
+        data = ''.join(encode(self._encode(task_id, entry)) + '\n'
+                       for task_id, entry in self._pending).encode('utf-8')
+        if self._offset < self._fh.seek(0, os.SEEK_END):
+            # 文件末尾是崩溃时写了一半的行，另起一行，它在读入时被跳过
+            data = b'\n' + data
+        self._fh.write(data)
+        self.fsync.sync(self._fh)
+        self._offset = self._fh.tell()
+        self._pending.clear()
+
+    def catch_up(self) -> None:
+        """读入其他进程在上次读取之后追加的条目（尚未读入过文件时不需要）"""
+        if self._loaded and self.path is not None:
+            self._read()
+
+    def close(self) -> None:
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+
+    def _ensure_loaded(self) -> None:
+        if self._loaded:
+            return
+        with self._load_lock:
+            if not self._loaded:
+                self._read()
+                self._loaded = True
+
+    def _read(self) -> None:
+        """从上次读到的位置读取文件，只处理完整的行（最后一行可能正在写入）"""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'rb') as f:
+            f.seek(self._offset)
+            data = f.read()
+        end = data.rfind(b'\n') + 1
+        for line in data[:end].splitlines():
+            if not line.strip():
+                continue
+            try:
+                task_id, entry = self._decode(json.loads(line))
+            except (ValueError, KeyError, TypeError, AttributeError):
+                print(f"跳过损坏的历史记录: {self.path}")
+                continue
+            self._entries.setdefault(task_id, []).append(entry)
+        self._offset += end
+
+    @staticmethod
+    def encode_value(slot: str, value: Any) -> Any:
+        """槽位的值 -> 导出格式（与 Task.to_dict 一致）"""
+        if isinstance(value, Enum):
+            return value.value
+        if slot.startswith('_'):
+            return _stamp_isoformat(value)
+        if isinstance(value, tuple):
+            return list(value)
+        return value
+
+    @staticmethod
+    def _decode_value(field: str, value: Any) -> Any:
+        if field == 'priority':
+            return TaskPriority(value)
+        if field == 'status':
+            return TaskStatus(value)
+        if field == 'depends_on':
+            return parse_dependencies(value)
+        if TaskHistory._SLOTS[field].startswith('_'):
+            return _parse_stamp(value)
+        return value
+
+    def _encode(self, task_id: str, entry: tuple) -> Dict[str, Any]:
+        stamp, op, actor, old = entry
+        record = {'id': task_id, 'at': _stamp_isoformat(stamp), 'op': op}
+        if actor is not None:
+            record['by'] = actor
+        if op == self.DELETE:
+            record['old'] = old.to_dict()
+        elif op == self.UPDATE:
+            record['old'] = {old[i].lstrip('_'): self.encode_value(old[i], old[i + 1])
+                             for i in range(0, len(old), 2)}
+        return record
+
+    def _decode(self, record: Dict[str, Any]) -> Tuple[str, tuple]:
+        op = record['op']
+        old = None
+        if op == self.DELETE:
+            old = Task.from_dict(record['old'])
+        elif op == self.UPDATE:
+            old = []
+            for field, value in record['old'].items():
+                old.extend((self._SLOTS[field], self._decode_value(field, value)))
+            old = tuple(old)
+        elif op != self.CREATE:
+            raise ValueError(f"未知的历史操作: {op}")
+        stamp = _local_micros(_parse_stamp(record['at']))
+        actor = record.get('by')
+        # 操作者只有少数几个，驻留后条目共享同一个字符串
+        return record['id'], (stamp, sys.intern(op), actor and sys.intern(actor), old)
 
 # ===== 任务管理器类 =====
 
+def _exclusive(method):
+    """共享模式下修改方法持有文件锁执行，执行前先合并其他进程的修改"""
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        self._acquire()
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            self._release()
+    return wrapper
+
+class TaskPage(list):
+    """list_tasks 的一页结果：本页的任务，next_cursor 为下一页的游标（已是最后一页时为None）"""
+
+    def __init__(self, tasks: Iterable[Task], next_cursor: Optional[str] = None):
+        super().__init__(tasks)
+        self.next_cursor = next_cursor
+
+def _encode_cursor(order_by: str, key: Tuple[int, ...]) -> str:
+    """把排序方式和上一页最后一个任务的排序键编码为不透明的游标字符串"""
+    raw = json.dumps([order_by, list(key)], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+def _decode_cursor(cursor: str, order_by: str) -> Tuple[int, ...]:
+    try:
+        cursor_order, key = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        if cursor_order == order_by and all(isinstance(part, int) for part in key):
+            return tuple(key)
+    except (ValueError, TypeError):
+        pass
+    raise ValueError(f"无效的分页游标: {cursor}")
+
 class TaskManager:
     """任务管理器类"""
 
-    def __init__(self, data_file: str = "tasks.json"):
+    # list_tasks 支持的排序方式
+    ORDER_BY = ('created', 'due_date', 'priority')
+    # claim_next 的默认租约时长（秒）
+    LEASE_SECONDS = 300.0
+    _PRIORITY_RANKS = {priority: rank for rank, priority in enumerate(TaskPriority)}
+
+    def __init__(self, data_file: str = "tasks.json", journal: bool = False,
+                 compact_every: int = 1000, storage: Optional[TaskStorage] = None,
+                 search_index: bool = False, fsync: str = "interval",
+                 write_behind: Optional[float] = None, snapshot_format: str = "json",
+                 shared: bool = False, lazy: bool = False,
+                 history: Union[bool, TaskHistory] = False):
+        """
+        Args:
+            data_file: 任务文件（日志模式下作为快照文件）
+            journal: 是否启用追加式日志模式，每次修改只追加一条记录
+            compact_every: 日志累计多少条记录后在后台压缩为快照
+            storage: 自定义存储后端，指定后忽略journal、fsync、snapshot_format参数
+            search_index: 是否维护全文倒排索引，加速search_tasks并按相关度排序
+            fsync: 落盘策略，always 每次修改都fsync，interval 最多每秒一次，never 不主动fsync
+            write_behind: 不为None时启用延迟写入，后台线程每隔这么多秒合并写入一次；
+                需要调用 flush() 或 close() 确保修改落盘
+            snapshot_format: 快照文件格式，json 为 JSON Lines，binary 为紧凑的二进制格式
+            shared: 多进程共享同一任务文件：修改时持有 <data_file>.lock 文件锁，
+                文件被其他进程替换后重新读取并逐个合并任务
+            lazy: 构造时不读取任务文件，第一次访问任务数据时才加载；
+                加载前统计信息和按单个状态列出任务由存储的摘要块直接回答
+            history: 记录修改历史，支持 get_task_at、tasks_at 等按时间回溯的查询；
+                True 时保存在 <data_file>.history，也可以传入 TaskHistory 对象
+                （路径为None时只保存在内存中）
+        """
         self.data_file = data_file
-        self.tasks: List[Task] = []
-        self.load_tasks()
+        self.search_index = search_index
+        if storage is None:
+            if snapshot_format not in SNAPSHOT_FORMATS:
+                raise ValueError(f"无效的快照格式: {snapshot_format}，"
+                                 f"可用: {', '.join(SNAPSHOT_FORMATS)}")
+            plain_storage, journal_storage = SNAPSHOT_FORMATS[snapshot_format]
+            if journal:
+                storage = journal_storage(data_file, compact_every, fsync)
+            else:
+                storage = plain_storage(data_file, fsync)
+        if shared and (write_behind is not None or isinstance(storage, JournalTaskStorage)
+                       or not isinstance(storage, JSONTaskStorage)):
+            # 日志和延迟写入会在锁外写文件，无法与其他进程协调
+            raise ValueError("共享模式只支持JSON或二进制快照存储，且不能启用日志或延迟写入")
+        if write_behind is not None:
+            storage = WriteBehindTaskStorage(storage, write_behind)
+        self.storage = storage
+        self._file_lock = FileLock(data_file + ".lock") if shared else None
+        self._signature = None
+        self._batch: Optional[TaskBatch] = None
+        # 查询即将到期的任务时会推进重复任务堆，并发的读操作之间也需要互斥
+        self._recurrence_lock = threading.Lock()
+        self._listeners: List[Callable[[str, Optional[Task]], None]] = []
+        if history is True:
+            history = TaskHistory(data_file + ".history", fsync)
+        self.history: Optional[TaskHistory] = history or None
+        # 修改历史中的操作者：acting_as 为当前线程指定，否则取 actor
+        self.actor: Optional[str] = None
+        self._acting = threading.local()
+        # id -> Task 的哈希索引，字典保持插入顺序，同时充当任务列表
+        self._tasks: Dict[str, Task] = {}
+        self._reset_indexes()
+        # 任务是否已从存储加载；惰性模式下由 refresh 在第一次访问时加载
+        self._loaded = False
+        if not lazy:
+            self.load_tasks()
+
+    @property
+    def tasks(self) -> List[Task]:
+        """所有任务（按添加顺序）"""
+        if not self._loaded:
+            self.refresh()
+        return list(self._tasks.values())
+
+    @tasks.setter
+    def tasks(self, tasks: List[Task]) -> None:
+        self._loaded = True
+        self._tasks = {}
+        self._reset_indexes()
+        with self._bulk_indexing():
+            for task in tasks:
+                self._insert_task(task)
+        self._notify('reload', None)
+
+    # ----- 变更通知 -----
+
+    def add_listener(self, listener: Callable[[str, Optional[Task]], None]) -> None:
+        """
+        注册变更回调 listener(op, task)
+
+        每次增删改（包括批量回滚和合并其他进程的修改）都会调用，op 为 upsert 或
+        delete；整体替换任务列表时 op 为 reload、task 为 None。
+        回调在修改任务的线程中同步执行，应当尽快返回。
+        """
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[[str, Optional[Task]], None]) -> None:
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def _notify(self, op: str, task: Optional[Task]) -> None:
+        for listener in self._listeners:
+            listener(op, task)
+
+    # ----- 二级索引 -----
+
+    def _reset_indexes(self) -> None:
+        """清空所有二级索引"""
+        self._next_seq = 0
+        self._seq: Dict[str, int] = {}  # id -> 添加序号，用于恢复添加顺序
+        self._order_dirty = False
+        self._by_status: Dict[TaskStatus, Set[str]] = {}
+        self._by_category: Dict[str, Set[str]] = {}
+        self._by_priority: Dict[TaskPriority, Set[str]] = {}
+        # 未完成且有截止日期的任务，按 (截止微秒数, 序号, id) 有序排列，可二分查找
+        self._by_due: List[Tuple[int, int, str]] = []
+        self._due_sorted = True  # 批量登记期间为False，见 _bulk_indexing
+        # 未完成的重复任务按下一次发生时间组成小顶堆，条目为 [微秒, 序号, 编号, id]；
+        # 任务变化时旧条目的id置为None，弹出时跳过（惰性删除）
+        self._recurring: Dict[str, list] = {}
+        self._recurrence_heap: List[list] = []
+        self._recurrence_counter = count()
+        # 依赖图的反向邻接表：被依赖的ID -> 直接依赖它的任务ID（被依赖的任务可能已删除）
+        self._dependents: Dict[str, Set[str]] = {}
+        # 有未完成依赖的任务 -> 未完成依赖数；不存在的依赖不计入
+        self._unmet: Dict[str, int] = {}
+        # 就绪集合：待办且没有未完成依赖的任务，随依赖的完成增量维护
+        self._ready: Set[str] = set()
+        # 工作队列的两个小顶堆，第一次领取时才建立（None表示尚未建立）：
+        # 领取堆是就绪任务的 _claim_key，租约堆是进行中任务的 (租约到期微秒数, id)。
+        # 任务变化时只压入新条目，旧条目在弹出时发现与任务不符再丢弃（惰性删除）
+        self._claim_heap: Optional[List[tuple]] = None
+        # 还没到下一次的重复任务暂存在这里 (截止微秒数, _claim_key)，到期后放回领取堆
+        self._deferred_claims: List[Tuple[int, tuple]] = []
+        self._lease_heap: Optional[List[Tuple[int, str]]] = None
+        self._search_index = TaskSearchIndex() if self.search_index else None
+
+    def _index_task(self, task: Task) -> None:
+        """把任务登记到二级索引"""
+        self._by_status.setdefault(task.status, set()).add(task.id)
+        self._by_category.setdefault(task.category, set()).add(task.id)
+        self._by_priority.setdefault(task.priority, set()).add(task.id)
+        due = task.due_stamp
+        if due is not None and task.status != TaskStatus.DONE:
+            if self._due_sorted:
+                bisect.insort(self._by_due, (due, self._seq[task.id], task.id))
+            else:
+                self._by_due.append((due, self._seq[task.id], task.id))
+            if task.recurrence:
+                # 截止日期可能被单独修改过，不一定落在规则上，从它之后的第一次发生开始
+                first = parse_recurrence(task.recurrence).next_at_or_after(due, due)
+                entry = [first, self._seq[task.id], next(self._recurrence_counter), task.id]
+                self._recurring[task.id] = entry
+                heapq.heappush(self._recurrence_heap, entry)
+        self._index_dependencies(task)
+        if (self._lease_heap is not None and task.status is TaskStatus.IN_PROGRESS
+                and task._lease_until is not None):
+            self._push_lease(task)
+        if self._search_index:
+            self._search_index.add(task)
+
+    def _unindex_task(self, task: Task) -> None:
+        """从二级索引中移除任务（必须在修改字段之前调用）"""
+        for index, key in ((self._by_status, task.status),
+                           (self._by_category, task.category),
+                           (self._by_priority, task.priority)):
+            ids = index.get(key)
+            if ids is not None:
+                ids.discard(task.id)
+                if not ids:
+                    del index[key]
+        due = task.due_stamp
+        if due is not None and task.status != TaskStatus.DONE:
+            key = (due, self._seq[task.id], task.id)
+            if not self._due_sorted:
+                with contextlib.suppress(ValueError):
+                    self._by_due.remove(key)
+            else:
+                pos = bisect.bisect_left(self._by_due, key)
+                if pos < len(self._by_due) and self._by_due[pos] == key:
+                    del self._by_due[pos]
+        entry = self._recurring.pop(task.id, None)
+        if entry is not None:
+            entry[3] = None
+            if len(self._recurrence_heap) > 2 * len(self._recurring) + 64:
+                # 失效条目过多时重建堆
+                self._recurrence_heap = [e for e in self._recurrence_heap if e[3] is not None]
+                heapq.heapify(self._recurrence_heap)
+        self._unindex_dependencies(task)
+        if self._search_index:
+            self._search_index.remove(task)
+
+    def _index_dependencies(self, task: Task) -> None:
+        """
+        把任务登记到依赖图，并更新它自己和下游任务的就绪状态
+
+        不变式：_unmet[x] 等于 x 的依赖中已登记且未完成的个数。任务按任意顺序
+        登记都成立：依赖后登记时，由依赖这一侧给下游计数加一。
+        """
+        task_id = task.id
+        unmet = 0
+        if task.depends_on:
+            tasks, done = self._tasks, TaskStatus.DONE
+            for dependency in task.depends_on:
+                self._dependents.setdefault(dependency, set()).add(task_id)
+                other = tasks.get(dependency)
+                if other is not None and other.status is not done:
+                    unmet += 1
+            if unmet:
+                self._unmet[task_id] = unmet
+        if not unmet and task.status is TaskStatus.TODO:
+            self._ready.add(task_id)
+            if self._claim_heap is not None:
+                self._push_claim(task)
+        if task.status is not TaskStatus.DONE:
+            for dependent in self._dependents.get(task_id, ()):
+                self._unmet[dependent] = self._unmet.get(dependent, 0) + 1
+                self._ready.discard(dependent)
+
+    def _unindex_dependencies(self, task: Task) -> None:
+        """从依赖图中移除任务；未完成的任务移除后，下游任务少一个未完成依赖"""
+        task_id = task.id
+        for dependency in task.depends_on:
+            dependents = self._dependents.get(dependency)
+            if dependents is not None:
+                dependents.discard(task_id)
+                if not dependents:
+                    del self._dependents[dependency]
+        self._unmet.pop(task_id, None)
+        self._ready.discard(task_id)
+        if task.status is not TaskStatus.DONE:
+            for dependent in self._dependents.get(task_id, ()):
+                unmet = self._unmet.pop(dependent) - 1
+                if unmet:
+                    self._unmet[dependent] = unmet
+                elif self._tasks[dependent].status is TaskStatus.TODO:
+                    self._ready.add(dependent)
+                    if self._claim_heap is not None:
+                        self._push_claim(self._tasks[dependent])
+
+    @contextlib.contextmanager
+    def _bulk_indexing(self):
+        """
+        批量登记任务：期间截止日期条目追加到索引末尾，结束时整体排序一次
+
+        逐个二分插入每次都要移动列表后半部分，n个任务是O(n²)；
+        Timsort 对"有序的旧条目+新条目"排序只需 O(n log k)。
+        """
+        if not self._due_sorted:
+            yield  # 已在批量登记中
+            return
+        self._due_sorted = False
+        try:
+            yield
+        finally:
+            self._by_due.sort()
+            self._due_sorted = True
+
+    def _due_range(self, start: Optional[datetime] = None,
+                   end: Optional[datetime] = None,
+                   include_end: bool = True) -> List[Tuple[int, int, str]]:
+        """截止日期索引的区间查询，返回按截止日期排序的条目"""
+        lo = 0
+        if start is not None:
+            lo = bisect.bisect_left(self._by_due, (_datetime_to_micros(start),))
+        if end is None:
+            hi = len(self._by_due)
+        elif include_end:
+            hi = bisect.bisect_right(self._by_due, (_datetime_to_micros(end), float('inf')))
+        else:
+            hi = bisect.bisect_left(self._by_due, (_datetime_to_micros(end),))
+        return self._by_due[lo:hi]
+
+    def _count_overdue(self, now: datetime) -> int:
+        """截止日期早于now的未完成任务数，O(log n)"""
+        return bisect.bisect_left(self._by_due, (_datetime_to_micros(now),))
 
     def load_tasks(self) -> None:
-        """从文件加载任务"""
+        """从存储加载任务"""
+        self._loaded = True
         try:
-            if os.path.exists(self.data_file):
-                with open(self.data_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    self.tasks = [Task.from_dict(task_data) for task_data in data]
-        except (json.JSONDecodeError, IOError) as e:
+            self._signature = self.storage.signature()
+            self.tasks = self.storage.load()
+        except (ValueError, KeyError, TypeError, struct.error, IOError, sqlite3.Error) as e:
             print(f"加载任务数据失败: {e}")
-            self.tasks = []
+            self._tasks = {}
 
+    # ----- 多进程共享 -----
+
+    def refresh(self) -> bool:
+        """
+        共享模式下检查任务文件是否被其他进程修改，是则重新读取并合并
+
+        只比较文件签名，未变化时不读文件。合并按任务进行：内容没变的任务
+        保留原对象，变化的任务就地更新字段，新增和删除的任务相应加入或移除。
+        惰性模式下尚未加载时直接加载。返回是否有变化。
+        """
+        if not self._loaded:
+            self.load_tasks()
+            return True
+        if self._file_lock is None:
+            return False
+        signature = self.storage.signature()
+        if signature == self._signature:
+            return False
+        try:
+            fresh = self.storage.load()
+        except (ValueError, struct.error, IOError) as e:
+            print(f"加载任务数据失败: {e}")
+            return False
+        self._signature = signature
+        self._merge_tasks(fresh)
+        if self.history is not None:
+            self.history.catch_up()
+        return True
+
+    def _merge_tasks(self, fresh: List[Task]) -> None:
+        """把重新读取的任务逐个合并到内存结构和索引中"""
+        fresh_ids = {task.id for task in fresh}
+        for task in [task for task in self._tasks.values() if task.id not in fresh_ids]:
+            self._remove_task(task)
+            self._notify('delete', task)
+        for task in fresh:
+            current = self._tasks.get(task.id)
+            if current is None:
+                self._insert_task(task)
+                self._notify('upsert', task)
+                continue
+            state = self._snapshot_task(task)
+            if state != self._snapshot_task(current):
+                self._unindex_task(current)
+                self._restore_fields(current, state)
+                self._index_task(current)
+                self._notify('upsert', current)
+
+    def _acquire(self) -> None:
+        """获取文件锁（可嵌套），最外层获取后先合并其他进程的修改"""
+        if self._file_lock is None:
+            if not self._loaded:
+                self.load_tasks()
+            return
+        self._file_lock.acquire()
+        if self._file_lock.depth == 1:
+            try:
+                self.refresh()
+            except BaseException:
+                self._file_lock.release()
+                raise
+
+    def _release(self) -> None:
+        """释放文件锁；最外层释放前记下自己写入后的文件签名"""
+        if self._file_lock is None:
+            return
+        if self._file_lock.depth == 1:
+            self._signature = self.storage.signature()
+        self._file_lock.release()
+
+    @_exclusive
     def save_tasks(self) -> None:
-        """保存任务到文件"""
+        """保存全部任务"""
         try:
-            data = [task.to_dict() for task in self.tasks]
-            with open(self.data_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
-        except IOError as e:
+            self.storage.save(self._tasks.values())
+        except (IOError, struct.error, sqlite3.Error) as e:
             print(f"保存任务数据失败: {e}")
 
-    def add_task(self, title: str, description: str = "",
-                 priority: str = "中", category: str = "默认",
-                 due_date_str: Optional[str] = None) -> Task:
-        """添加新任务"""
+    def _persist(self, op: str, task: Task) -> None:
+        """持久化一次修改，具体方式由存储后端决定"""
+        try:
+            self.storage.record(op, task, self._tasks.values())
+        except (IOError, struct.error, sqlite3.Error) as e:
+            print(f"保存任务数据失败: {e}")
+
+    def compact(self, background: bool = True) -> None:
+        """整理存储（日志模式下把日志压缩为快照）"""
+        if not self._loaded:
+            return  # 尚未加载，存储没有变化
+        self.storage.compact(self._tasks.values(), background)
+
+    def flush(self) -> None:
+        """立即写入延迟写入模式下尚未落盘的修改"""
+        try:
+            self.storage.flush()
+        except (IOError, struct.error, sqlite3.Error) as e:
+            print(f"保存任务数据失败: {e}")
+
+    def close(self) -> None:
+        """等待后台写入完成并释放存储资源"""
+        try:
+            self.storage.close()
+        except (IOError, struct.error, sqlite3.Error) as e:
+            print(f"保存任务数据失败: {e}")
+        finally:
+            if self.history is not None:
+                self.history.close()
+
+    def _build_task(self, title: str, description: str = "",
+                    priority: str = "中", category: str = "默认",
+                    due_date: Optional[str] = None, recurrence: Optional[str] = None,
+                    depends_on: Optional[Iterable[str]] = None,
+                    strict: bool = False) -> Task:
+        """
+        根据用户输入构造任务
+
+        strict为False时无效的优先级、日期、重复规则和依赖会提示并使用默认值，
+        为True时抛出ValueError（批量操作据此整体回滚）。
+        """
         try:
             priority_enum = TaskPriority(priority)
         except ValueError:
+            if strict:
+                raise ValueError(f"无效的优先级: {priority}")
             print(f"无效的优先级: {priority}，使用默认优先级'中'")
             priority_enum = TaskPriority.MEDIUM
 
-        due_date = None
-        if due_date_str:
+        due = None
+        if due_date:
             try:
-                due_date = datetime.fromisoformat(due_date_str)
+                due = datetime.fromisoformat(due_date)
             except ValueError:
-                print(f"无效的日期格式: {due_date_str}，忽略截止日期")
+                if strict:
+                    raise ValueError(f"无效的日期格式: {due_date}")
+                print(f"无效的日期格式: {due_date}，忽略截止日期")
 
-        task = Task(title, description, priority_enum, category, due_date)
-        self.tasks.append(task)
-        self.save_tasks()
+        task = Task(title, description, priority_enum, category, due)
+        if recurrence:
+            try:
+                task.set_recurrence(recurrence)
+            except ValueError as e:
+                if strict:
+                    raise
+                print(f"{e}，任务不重复")
+        dependencies = parse_dependencies(depends_on)
+        missing = [task_id for task_id in dependencies if self.get_task(task_id) is None]
+        if missing:
+            if strict:
+                raise ValueError(f"依赖的任务不存在: {', '.join(missing)}")
+            print(f"依赖的任务不存在: {', '.join(missing)}，忽略依赖")
+            dependencies = ()
+        task.depends_on = dependencies
+        return task
+
+    def _add(self, task: Task) -> Task:
+        """加入任务并记录修改"""
+        # 8位短ID在任务量很大时可能碰撞，重新生成直到唯一
+        while self.get_task(task.id) is not None:
+            task.id = str(uuid.uuid4())[:8]
+        if task.depends_on:
+            self._check_dependencies(task, task.depends_on)
+        self._insert_task(task)
+        if self.history is not None:
+            self._log_change(task, TaskHistory.CREATE)
+        self._record('upsert', task, partial(self._undo_add, task))
+        return task
+
+    def _update(self, task: Task, fields: Dict[str, Any]) -> None:
+        """更新任务字段并记录修改，失败时恢复原值并抛出ValueError"""
+        if fields.get('recurrence') and not task.recurrence:
+            dependent = next(iter(self._dependents_of(task.id)), None)
+            if dependent is not None:
+                raise ValueError(f"任务 {dependent} 依赖于它，不能设为重复任务")
+        if 'depends_on' in fields:
+            self._check_dependencies(task, parse_dependencies(fields['depends_on']))
+        state = self._snapshot_task(task)
+        # 字段变化会影响索引归属，先移出索引，更新后再登记
+        self._unindex_task(task)
+        try:
+            task.update(**fields)
+        except ValueError:
+            self._restore_fields(task, state)
+            raise
+        finally:
+            self._index_task(task)
+        logged = (self.history is not None
+                  and self._log_change(task, TaskHistory.UPDATE, state))
+        self._record('upsert', task, partial(self._undo_update, task, state, logged))
+
+    def _delete(self, task: Task) -> None:
+        """删除任务并记录修改"""
+        seq = self._seq.get(task.id)
+        self._remove_task(task)
+        if self.history is not None:
+            self._log_change(task, TaskHistory.DELETE)
+        self._record('delete', task, partial(self._undo_delete, task, seq))
+
+    @_exclusive
+    def add_task(self, title: str, description: str = "",
+                 priority: str = "中", category: str = "默认",
+                 due_date_str: Optional[str] = None,
+                 recurrence: Optional[str] = None,
+                 depends_on: Optional[Iterable[str]] = None) -> Task:
+        """添加新任务（recurrence为重复规则，见 Recurrence；depends_on为依赖的任务ID）"""
+        task = self._add(self._build_task(title, description, priority,
+                                          category, due_date_str, recurrence, depends_on))
         print(f"任务已添加: {task}")
         return task
 
     def get_task(self, task_id: str) -> Optional[Task]:
-        """根据ID获取任务"""
-        for task in self.tasks:
-            if task.id == task_id:
-                return task
-        return None
+        """根据ID获取任务（哈希查找，O(1)）"""
+        if not self._loaded:
+            self.refresh()
+        return self._tasks.get(task_id)
+
+    def _insert_task(self, task: Task, seq: Optional[int] = None) -> None:
+        """把任务加入内存结构（seq用于回滚删除时恢复原来的位置）"""
+        self._tasks[task.id] = task
+        if seq is None:
+            seq = self._next_seq
+            self._next_seq += 1
+        else:
+            self._order_dirty = True  # 字典末尾插入了较早的序号
+        self._seq[task.id] = seq
+        self._index_task(task)
 
+    def _remove_task(self, task: Task) -> None:
+        """把任务移出内存结构"""
+        self._unindex_task(task)
+        del self._tasks[task.id]
+        del self._seq[task.id]
+
+    @_exclusive
     def update_task(self, task_id: str, **kwargs) -> bool:
         """更新任务"""
         task = self.get_task(task_id)
@@ -225,14 +1061,14 @@ class TaskManager:
             return False
 
         try:
-            task.update(**kwargs)
-            self.save_tasks()
-            print(f"任务已更新: {task}")
-            return True
+            self._update(task, kwargs)
         except ValueError as e:
             print(f"更新失败: {e}")
             return False
+        print(f"任务已更新: {task}")
+        return True
 
+    @_exclusive
     def delete_task(self, task_id: str) -> bool:
         """删除任务"""
         task = self.get_task(task_id)
@@ -240,63 +1076,431 @@ class TaskManager:
             print(f"任务不存在: {task_id}")
             return False
 
-        self.tasks.remove(task)
-        self.save_tasks()
+        self._delete(task)
         print(f"任务已删除: {task.title}")
         return True
 
+    # ----- 批量修改 -----
+
+    def batch(self) -> TaskBatch:
+        """
+        批量修改上下文：期间的修改在退出时一次性持久化，异常时全部回滚
+
+        用法:
+            with manager.batch():
+                manager.add_task(...)
+                manager.update_task(...)
+        """
+        if self._batch is None:
+            self._batch = TaskBatch(self)
+        return self._batch
+
+    def add_tasks(self, items: Iterable[Dict[str, Any]]) -> List[Task]:
+        """
+        批量添加任务，只持久化一次且不逐条输出
+
+        每项是 add_task 参数组成的字典（截止日期键名为 due_date），
+        任一项无效则抛出ValueError并回滚本次添加的全部任务。
+        """
+        with self.batch():
+            return [self._add(self._build_task(strict=True, **item)) for item in items]
+
+    def update_tasks(self, updates: Dict[str, Dict[str, Any]]) -> int:
+        """批量更新任务 {任务ID: {属性: 值}}，任一项失败则全部回滚"""
+        with self.batch():
+            for task_id, fields in updates.items():
+                task = self.get_task(task_id)
+                if not task:
+                    raise ValueError(f"任务不存在: {task_id}")
+                self._update(task, fields)
+        return len(updates)
+
+    def delete_tasks(self, task_ids: Iterable[str]) -> int:
+        """批量删除任务，任一ID不存在则全部回滚"""
+        count = 0
+        with self.batch():
+            for task_id in task_ids:
+                task = self.get_task(task_id)
+                if not task:
+                    raise ValueError(f"任务不存在: {task_id}")
+                self._delete(task)
+                count += 1
+        return count
+
+    # ----- 导入导出 -----
+
+    def import_tasks(self, path: str, fmt: Optional[str] = None,
+                     chunk_size: int = CHUNK_SIZE) -> int:
+        """
+        从CSV或JSON Lines文件逐块导入任务，返回导入的任务数
+
+        导入总是新增任务，ID与现有任务重复时重新生成（同 add_task），文件中
+        对这些任务的依赖随之改为新ID。任一条记录无效、依赖的任务既不在文件中也不在
+        现有任务中、依赖形成循环或依赖重复任务，则抛出ValueError并回滚整个导入；
+        全部导入后只持久化一次。
+        """
+        count = 0
+        renamed: Dict[str, str] = {}
+        dependent: List[Task] = []
+        get_task, insert, record = self.get_task, self._insert_task, self._record
+        log = self._log_change if self.history is not None else None
+        with self.batch() as batch, self._bulk_indexing(), _gc_paused():
+            for chunk in iter_import_chunks(path, fmt, chunk_size):
+                tasks = tasks_from_records(chunk, count + 1)
+                for task in tasks:
+                    if get_task(task.id) is not None:
+                        original = task.id
+                        while get_task(task.id) is not None:
+                            task.id = str(uuid.uuid4())[:8]
+                        renamed[original] = task.id
+                    if task.depends_on:
+                        dependent.append(task)
+                    insert(task)
+                    if log:
+                        log(task, TaskHistory.CREATE)
+                    record('upsert', task)
+                # 每块登记一个回滚操作，而不是每个任务一个
+                batch.rollback_operations.append(partial(self._undo_import, tasks))
+                count += len(tasks)
+
+            for task in dependent:
+                dependencies = tuple(renamed.get(task_id, task_id) for task_id in task.depends_on)
+                for task_id in dependencies:
+                    other = get_task(task_id)
+                    if other is None:
+                        raise ValueError(f"导入的任务 {task.id} 依赖的任务不存在: {task_id}")
+                    if other.recurrence:
+                        raise ValueError(f"导入的任务 {task.id} 依赖重复任务 {task_id}")
+                if dependencies != task.depends_on:
+                    self._unindex_task(task)
+                    task.depends_on = dependencies
+                    self._index_task(task)
+                    record('upsert', task)
+            cycle = self._find_cycle(dependent)
+            if cycle:
+                raise ValueError(f"导入的任务存在循环依赖: {' -> '.join(cycle)}")
+        return count
+
+    def export_tasks(self, path: str, fmt: Optional[str] = None,
+                     chunk_size: int = CHUNK_SIZE) -> int:
+        """把全部任务按添加顺序导出为CSV或JSON Lines，返回导出的任务数"""
+        return write_task_export(self.tasks, path, fmt, chunk_size)
+
+    def _record(self, op: str, task: Task,
+                undo: Optional[Callable[[], None]] = None) -> None:
+        """记录一次修改：批量期间暂存（事务型存储直接写入但不提交），否则立即持久化"""
+        self._notify(op, task)
+        batch = self._batch
+        if batch is None:
+            self._persist(op, task)
+            self._flush_history()
+            return
+
+        if undo is not None:
+            batch.rollback_operations.append(undo)
+        if self.storage.transactional:
+            self._persist(op, task)
+        else:
+            batch.changes.append((op, task))
+
+    def _snapshot_task(self, task: Task) -> Dict[str, Any]:
+        return {slot: getattr(task, slot) for slot in Task.__slots__}
+
+    def _restore_fields(self, task: Task, state: Dict[str, Any]) -> None:
+        for slot, value in state.items():
+            setattr(task, slot, value)
+
+    def _undo_add(self, task: Task) -> None:
+        self._remove_task(task)
+        self._unlog_change(task)
+        self._record('delete', task)
+
+    def _undo_import(self, tasks: List[Task]) -> None:
+        for task in reversed(tasks):
+            self._undo_add(task)
+
+    def _undo_update(self, task: Task, state: Dict[str, Any], logged: bool = False) -> None:
+        self._unindex_task(task)
+        self._restore_fields(task, state)
+        self._index_task(task)
+        if logged:
+            self._unlog_change(task)
+        self._record('upsert', task)
+
+    def _undo_delete(self, task: Task, seq: Optional[int]) -> None:
+        self._insert_task(task, seq)
+        self._unlog_change(task)
+        self._record('upsert', task)
+
+    def _restore_order(self) -> None:
+        """回滚删除后按序号恢复任务的添加顺序"""
+        if self._order_dirty:
+            self._tasks = {task_id: self._tasks[task_id]
+                           for task_id in sorted(self._tasks, key=self._seq.__getitem__)}
+            self._order_dirty = False
+
     def list_tasks(self, status_filter: Optional[str] = None,
                    category_filter: Optional[str] = None,
                    priority_filter: Optional[str] = None,
-                   show_overdue: bool = False) -> List[Task]:
-        """列出任务（支持过滤）"""
-        filtered_tasks = self.tasks.copy()
+                   show_overdue: bool = False, limit: Optional[int] = None,
+                   cursor: Optional[str] = None, order_by: str = 'created') -> List[Task]:
+        """
+        列出任务（支持过滤、排序和分页）
+
+        order_by: created 按添加顺序，due_date 按截止日期（没有截止日期的排在最后），
+            priority 按优先级从高到低；同一排序键按添加顺序
+        limit: 指定时返回 TaskPage，最多 limit 个任务，把它的 next_cursor 作为
+            cursor 传入即可取下一页。游标记录的是上一页最后一个任务的排序键，
+            翻页期间增删任务不会造成重复或遗漏。
+        结果由惰性的生成器流水线产生，按添加顺序取一页时不需要过滤整个任务集合。
+        惰性模式下尚未加载时，只按状态过滤的查询直接扫描存储，不加载全部任务。
+        """
+        if order_by not in self.ORDER_BY:
+            raise ValueError(f"无效的排序方式: {order_by}，可用: {', '.join(self.ORDER_BY)}")
+        if limit is not None and limit < 1:
+            raise ValueError("limit 必须是正整数")
+        after = _decode_cursor(cursor, order_by) if cursor else None
+        if (not self._loaded and status_filter and order_by == 'created'
+                and not (category_filter or priority_filter or show_overdue)):
+            page = self._scan_status_page(status_filter, limit, after)
+            if page is not None:
+                return page
+        self.refresh()
+
+        tasks = self._ordered_tasks(self._filter_ids(status_filter, category_filter,
+                                                     priority_filter, show_overdue),
+                                    order_by, after, limit)
+        if limit is None:
+            return list(tasks)
+        page = list(islice(tasks, limit + 1))
+        next_cursor = None
+        if len(page) > limit:
+            next_cursor = _encode_cursor(order_by, self._order_key(order_by)(page[limit - 1]))
+        return TaskPage(page[:limit], next_cursor)
+
+    def _scan_status_page(self, status_filter: str, limit: Optional[int],
+                          after: Optional[Tuple[int, ...]]) -> Optional[List[Task]]:
+        """加载前按状态列出任务：只解析该状态的任务，取够一页即停止；存储不支持时返回None"""
+        try:
+            status = TaskStatus(status_filter)
+        except ValueError:
+            return None  # 由常规路径提示
+        scan = self.storage.scan_status(status, after[0] + 1 if after else 0)
+        if scan is None:
+            return None
+        if limit is None:
+            return [task for _, task in scan]
+        page = list(islice(scan, limit + 1))
+        scan.close()
+        next_cursor = None
+        if len(page) > limit:
+            next_cursor = _encode_cursor('created', (page[limit - 1][0],))
+        return TaskPage([task for _, task in page[:limit]], next_cursor)
+
+    def _order_key(self, order_by: str) -> Callable[[Task], Tuple[int, ...]]:
+        """排序键：最后一项总是添加序号，保证键唯一，游标可以精确定位"""
+        seq = self._seq
+        if order_by == 'created':
+            return lambda task: (seq[task.id],)
+        if order_by == 'due_date':
+            def due_key(task: Task) -> Tuple[int, ...]:
+                due = task.due_stamp
+                return (0, due, seq[task.id]) if due is not None else (1, 0, seq[task.id])
+            return due_key
+        ranks = {priority: -rank for rank, priority in enumerate(TaskPriority)}
+        return lambda task: (ranks[task.priority], seq[task.id])
+
+    def _ordered_tasks(self, ids: Optional[Set[str]], order_by: str,
+                       after: Optional[Tuple[int, ...]], limit: Optional[int]) -> Iterator[Task]:
+        """按排序键依次产出排在 after 之后的任务（ids为None表示不过滤）"""
+        if order_by == 'created' and ids is not None and self._sort_is_cheaper(len(ids), limit):
+            # 过滤结果来自索引，规模已经确定，直接按序号排序
+            seq = self._seq
+            after_seq = after[0] if after else -1
+            for task_id in sorted(ids, key=seq.__getitem__):
+                if seq[task_id] > after_seq:
+                    yield self._tasks[task_id]
+            return
+
+        if order_by == 'created':
+            stream = self._tasks_after(after[0] if after else -1)
+        elif order_by == 'priority':
+            yield from self._tasks_by_priority(after, ids)
+            return
+        else:
+            stream = self._tasks_by_due(after)
+        if ids is None:
+            yield from stream
+        else:
+            yield from (task for task in stream if task.id in ids)
+
+    def _sort_is_cheaper(self, matched: int, limit: Optional[int]) -> bool:
+        """
+        按添加顺序取满足过滤条件的任务：排序这matched个ID，还是顺序扫描？
+
+        排序约需 matched·log(matched) 步；扫描取一页平均要看 limit·总数/matched 个任务，
+        取全部则要看所有任务。
+        """
+        total = len(self._tasks)
+        if matched == 0:
+            return True
+        scan = total if limit is None else min(total, (limit + 1) * total // matched)
+        return matched * matched.bit_length() <= scan
+
+    def _tasks_by_priority(self, after: Optional[Tuple[int, ...]],
+                           ids: Optional[Set[str]] = None) -> Iterator[Task]:
+        """按优先级从高到低、同优先级按添加顺序产出任务（ids不为None时只产出其中的任务）"""
+        seq = self._seq
+        priorities = list(TaskPriority)
+        for rank in range(len(priorities) - 1, -1, -1):
+            if after is not None and -rank < after[0]:
+                continue  # 游标之前的优先级已经翻过
+            priority = priorities[rank]
+            after_seq = after[1] if after is not None and -rank == after[0] else -1
+            bucket = self._by_priority.get(priority, set())
+            if ids is not None:
+                # 先与过滤结果求交集，不含匹配任务的优先级不必扫描
+                bucket = bucket & ids
+                if not bucket:
+                    continue
+            if len(bucket) * 8 < len(self._tasks):
+                # 该优先级的任务较少，排序索引集合比扫描全部任务快
+                for task_id in sorted(bucket, key=seq.__getitem__):
+                    if seq[task_id] > after_seq:
+                        yield self._tasks[task_id]
+            else:
+                for task in self._tasks_after(after_seq):
+                    if task.priority is priority and (ids is None or task.id in ids):
+                        yield task
+
+    def _tasks_by_due(self, after: Optional[Tuple[int, ...]]) -> Iterator[Task]:
+        """按截止日期产出任务，没有截止日期的按添加顺序排在最后"""
+        if after is None or after[0] == 0:
+            # 未完成任务已在截止日期索引中排好序，已完成的单独排序后归并
+            seq = self._seq
+            done = sorted((task.due_stamp, seq[task.id], task.id)
+                          for task in (self._tasks[task_id] for task_id
+                                       in self._by_status.get(TaskStatus.DONE, ()))
+                          if task.due_stamp is not None)
+            start = (0,) if after is None else (after[1], after[2] + 1)
+            pending = islice(self._by_due, bisect.bisect_left(self._by_due, start), None)
+            done = done[bisect.bisect_left(done, start):]
+            for _, _, task_id in heapq.merge(pending, done):
+                yield self._tasks[task_id]
+        after_seq = after[2] if after is not None and after[0] == 1 else -1
+        for task in self._tasks_after(after_seq):
+            if task.due_stamp is None:
+                yield task
+
+    def _tasks_after(self, after_seq: int) -> Iterator[Task]:
+        """按添加顺序产出序号大于 after_seq 的任务"""
+        if after_seq < 0:
+            yield from self._tasks.values()
+            return
+        # 复制ID列表在C层完成，再按序号二分找到起点，不逐个访问任务
+        ids = list(self._tasks)
+        seq = self._seq
+        low, high = 0, len(ids)
+        while low < high:
+            middle = (low + high) // 2
+            if seq[ids[middle]] <= after_seq:
+                low = middle + 1
+            else:
+                high = middle
+        tasks = self._tasks
+        for task_id in islice(ids, low, None):
+            yield tasks[task_id]
+
+    def _filter_ids(self, status_filter: Optional[str], category_filter: Optional[str],
+                    priority_filter: Optional[str], show_overdue: bool) -> Optional[Set[str]]:
+        """用二级索引求出满足过滤条件的任务ID，没有过滤条件时返回None"""
+        candidates: List[Set[str]] = []
 
         if status_filter:
             try:
                 status_enum = TaskStatus(status_filter)
-                filtered_tasks = [t for t in filtered_tasks if t.status == status_enum]
+                candidates.append(self._by_status.get(status_enum, set()))
             except ValueError:
                 print(f"无效的状态过滤: {status_filter}")
 
         if category_filter:
-            filtered_tasks = [t for t in filtered_tasks if t.category == category_filter]
+            candidates.append(self._by_category.get(category_filter, set()))
 
         if priority_filter:
             try:
                 priority_enum = TaskPriority(priority_filter)
-                filtered_tasks = [t for t in filtered_tasks if t.priority == priority_enum]
+                candidates.append(self._by_priority.get(priority_enum, set()))
             except ValueError:
                 print(f"无效的优先级过滤: {priority_filter}")
 
         if show_overdue:
-            filtered_tasks = [t for t in filtered_tasks if t.is_overdue()]
+            # 过期任务就是截止日期索引中 now 之前的一段
+            now = datetime.now()
+            candidates.append({task_id for _, _, task_id
+                               in self._due_range(end=now, include_end=False)})
 
-        return filtered_tasks
+        if not candidates:
+            return None
+        # 从最小的集合开始求交集，代价取决于结果规模而不是任务总数
+        candidates.sort(key=len)
+        ids = candidates[0]
+        for other in candidates[1:]:
+            if not ids:
+                break
+            ids = ids & other
+        return ids
 
     def search_tasks(self, keyword: str) -> List[Task]:
-        """搜索任务"""
+        """搜索任务（启用全文索引时按相关度排序）"""
+        self.refresh()
         keyword_lower = keyword.lower()
-        return [task for task in self.tasks
+        if self._search_index:
+            ids = self._search_index.candidates(keyword)
+            if ids is None:
+                pool = self._tasks.values()
+            elif len(ids) * 8 > len(self._tasks):
+                # 候选较多时按添加顺序顺序访问，比随机访问任务对象更快
+                pool = (task for task in self._tasks.values() if task.id in ids)
+            else:
+                pool = (self._tasks[task_id] for task_id in ids)
+            ranked = []
+            for task in pool:
+                score = TaskSearchIndex.score(task, keyword_lower)
+                if score:
+                    ranked.append((-score, self._seq[task.id], task))
+            ranked.sort()  # 相关度高的在前，同分按添加顺序
+            return [task for _, _, task in ranked]
+
+        return [task for task in self._tasks.values()
                 if keyword_lower in task.title.lower()
                 or keyword_lower in task.description.lower()
                 or keyword_lower in task.category.lower()]
 
     def get_statistics(self) -> Dict[str, Any]:
-        """获取统计信息"""
-        total = len(self.tasks)
-        status_counts = {}
-        priority_counts = {}
-        category_counts = {}
-        overdue_count = 0
-
-        for task in self.tasks:
-            status_counts[task.status.value] = status_counts.get(task.status.value, 0) + 1
-            priority_counts[task.priority.value] = priority_counts.get(task.priority.value, 0) + 1
-            category_counts[task.category] = category_counts.get(task.category, 0) + 1
+        """
+        获取统计信息（分布直接取自增量维护的二级索引，不遍历任务）
 
-            if task.is_overdue():
-                overdue_count += 1
+        惰性模式下尚未加载时由存储的摘要块计算，不加载任务。
+        """
+        summary = None if self._loaded else self.storage.summary()
+        overdue_count = None
+        if summary is not None:
+            overdue_count = summary_overdue(summary.get('due'),
+                                            _datetime_to_micros(datetime.now()))
+        if overdue_count is not None:
+            total = summary['total']
+            status_counts = summary['status']
+            priority_counts = summary['priority']
+            category_counts = summary['category']
+        else:
+            self.refresh()
+            total = len(self._tasks)
+            status_counts = {status.value: len(ids) for status, ids in self._by_status.items()}
+            priority_counts = {priority.value: len(ids)
+                               for priority, ids in self._by_priority.items()}
+            category_counts = {category: len(ids)
+                               for category, ids in self._by_category.items()}
+            overdue_count = self._count_overdue(datetime.now())
 
         return {
             'total_tasks': total,
@@ -308,25 +1512,1090 @@ class TaskManager:
         }
 
     def get_upcoming_tasks(self, days: int = 7) -> List[Task]:
-        """获取即将到期的任务"""
+        """
+        获取即将到期的任务（截止日期索引上的区间查询，结果已按日期排序）
+
+        重复任务在期间内的每一次发生都以 TaskOccurrence 列出，由重复任务堆
+        惰性展开，代价与展开出的次数成正比，不随重复任务总数和天数的乘积增长。
+        """
+        self.refresh()
+        now = datetime.now()
+        future_date = now + timedelta(days=days)
+        recurring = self._recurring
+        upcoming = [(due, seq, self._tasks[task_id])
+                    for due, seq, task_id in self._due_range(now, future_date)
+                    if task_id not in recurring]
+        if recurring:
+            occurrences = self._expand_recurring(_datetime_to_micros(now),
+                                                 _datetime_to_micros(future_date))
+            upcoming = heapq.merge(upcoming, occurrences, key=lambda item: item[:2])
+        return [task for _, _, task in upcoming]
+
+    def _expand_recurring(self, start: int, end: int) -> List[Tuple[int, int, TaskOccurrence]]:
+        """重复任务在 [start, end] 内的所有发生，按时间排序"""
+        tasks = self._tasks
+        with self._recurrence_lock:
+            heap = self._recurrence_heap
+            # 堆顶早于start的条目推进到start之后；时间只会向前，推进的结果保留给以后的查询
+            while heap and (heap[0][3] is None or heap[0][0] < start):
+                entry = heapq.heappop(heap)
+                if entry[3] is None:
+                    continue
+                task = tasks[entry[3]]
+                entry[0] = parse_recurrence(task.recurrence).next_at_or_after(task.due_stamp, start)
+                heapq.heappush(heap, entry)
+
+            # 堆中不晚于end的条目构成以堆顶为根的子树，沿子树遍历即可找出
+            # 期间内有发生的任务，代价与这些任务数成正比，也不用改动堆
+            due = []
+            stack = [0] if heap and heap[0][0] <= end else []
+            while stack:
+                i = stack.pop()
+                if heap[i][3] is not None:
+                    due.append(heap[i])
+                for child in (2 * i + 1, 2 * i + 2):
+                    if child < len(heap) and heap[child][0] <= end:
+                        stack.append(child)
+        return _expand_occurrences(((stamp, seq, tasks[task_id])
+                                    for stamp, seq, _, task_id in due), end)
+
+    # ----- 依赖关系 -----
+
+    def ready_tasks(self, limit: Optional[int] = None) -> List[Task]:
+        """
+        可以开始的任务：待办且依赖的任务全部完成（已删除的依赖不再阻塞），按添加顺序
+
+        直接取自增量维护的就绪集合，不扫描任务；limit 指定时只取最早添加的几个。
+        """
+        self.refresh()
+        tasks, seq = self._tasks, self._seq
+        if limit is None:
+            ids = sorted(self._ready, key=seq.__getitem__)
+        else:
+            ids = heapq.nsmallest(limit, self._ready, key=seq.__getitem__)
+        return [tasks[task_id] for task_id in ids]
+
+    def critical_path(self, task_id: str) -> List[Task]:
+        """
+        到达任务的关键路径：沿未完成的依赖能走出的最长链，从最先要做的任务到该任务
+
+        只遍历该任务未完成的上游（迭代的深度优先搜索，每个任务只计算一次），
+        代价与上游规模成正比；已完成和已删除的依赖不在路径上。
+        链长相同时取 depends_on 中排在前面的依赖。任务不存在时抛出ValueError。
+        """
+        self.refresh()
+        target = self.get_task(task_id)
+        if target is None:
+            raise ValueError(f"任务不存在: {task_id}")
+
+        length: Dict[str, int] = {}
+        upstream: Dict[str, Optional[Task]] = {}
+        on_path: Set[str] = set()
+        stack: List[Tuple[Task, Optional[List[Task]]]] = [(target, None)]
+        while stack:
+            task, dependencies = stack.pop()
+            if dependencies is None:
+                if task.id in length:
+                    continue
+                dependencies = self._open_dependencies(task)
+                on_path.add(task.id)
+                stack.append((task, dependencies))
+                for dependency in reversed(dependencies):
+                    if dependency.id in on_path:
+                        raise ValueError(f"依赖存在循环: {dependency.id}")
+                    if dependency.id not in length:
+                        stack.append((dependency, None))
+                continue
+            # 所有依赖都已算出最长链，取最长的一条接上
+            on_path.discard(task.id)
+            best = None
+            for dependency in dependencies:
+                if best is None or length[dependency.id] > length[best.id]:
+                    best = dependency
+            length[task.id] = length[best.id] + 1 if best else 1
+            upstream[task.id] = best
+
+        path = [target]
+        while upstream[path[-1].id] is not None:
+            path.append(upstream[path[-1].id])
+        path.reverse()
+        return path
+
+    def _open_dependencies(self, task: Task) -> List[Task]:
+        """任务尚未完成的依赖（已删除的忽略）"""
+        dependencies = (self.get_task(task_id) for task_id in task.depends_on)
+        return [dependency for dependency in dependencies
+                if dependency is not None and dependency.status is not TaskStatus.DONE]
+
+    def _dependents_of(self, task_id: str) -> Iterable[str]:
+        """直接依赖该任务的任务ID"""
+        return self._dependents.get(task_id, ())
+
+    def _check_dependencies(self, task: Task, dependencies: Tuple[str, ...]) -> None:
+        """
+        校验新的依赖：依赖的任务必须存在、不是重复任务，且不能形成循环，否则抛出ValueError
+
+        重复任务完成一次后立即回到待办，永远不会满足依赖，所以不允许被依赖。
+        新依赖d会形成循环，当且仅当d已经直接或间接依赖本任务，即d在本任务的下游。
+        因此沿反向邻接表从本任务向下游搜索：代价与下游规模成正比，
+        新添加的任务没有下游，检查是O(1)的。
+        """
+        for dependency in dependencies:
+            if dependency == task.id:
+                raise ValueError("任务不能依赖自身")
+            other = self.get_task(dependency)
+            if other is None:
+                raise ValueError(f"依赖的任务不存在: {dependency}")
+            if other.recurrence:
+                raise ValueError(f"不能依赖重复任务: {dependency}")
+        targets = set(dependencies)
+        seen = {task.id}
+        stack = [task.id]
+        while stack:
+            for dependent in self._dependents_of(stack.pop()):
+                if dependent in targets:
+                    raise ValueError(f"依赖形成循环: {dependent} 已经依赖于 {task.id}")
+                if dependent not in seen:
+                    seen.add(dependent)
+                    stack.append(dependent)
+
+    def _find_cycle(self, tasks: Iterable[Task]) -> Optional[List[str]]:
+        """从给定任务出发沿依赖查找循环，返回循环上的ID（首尾相同），没有则返回None"""
+        state: Dict[str, bool] = {}  # True 正在访问，False 已访问完
+        for root in tasks:
+            if root.id in state:
+                continue
+            state[root.id] = True
+            path = [root.id]
+            stack = [iter(root.depends_on)]
+            while stack:
+                for dependency in stack[-1]:
+                    visiting = state.get(dependency)
+                    if visiting:
+                        return path[path.index(dependency):] + [dependency]
+                    if visiting is None:
+                        task = self.get_task(dependency)
+                        if task is not None:
+                            state[dependency] = True
+                            path.append(dependency)
+                            stack.append(iter(task.depends_on))
+                            break
+                else:
+                    state[path.pop()] = False
+                    stack.pop()
+        return None
+
+    # ----- 工作队列 -----
+
+    @_exclusive
+    def claim_next(self, worker_id: str, lease: Optional[float] = None) -> Optional[Task]:
+        """
+        为工作者领取下一个任务，没有可领取的任务时返回None
+
+        从就绪任务（见 ready_tasks）中取优先级最高的，同优先级取截止日期最早的
+        （没有截止日期的排最后），再取创建最早的；任务改为进行中，记下领取者和
+        租约到期时间（默认 LEASE_SECONDS 秒后）。领取前先把租约已过期的任务
+        放回待办，工作者需要在租约到期前调用 renew_lease 续约，完成后调用 release_task。
+        重复任务在当前这一次到期（截止日期不晚于现在）之前不能领取，因此完成一次后
+        要等到下一次才会再被领到。
+        领取和续约、交还一样在写锁（ThreadSafeTaskManager）和文件锁（共享模式）
+        中执行，多个工作线程或进程不会领到同一个任务。
+        """
+        if not worker_id:
+            raise ValueError("工作者ID不能为空")
+        now = datetime.now()
+        lease_until = self._lease_end(now, lease)
+        with self.batch(), self.acting_as(worker_id):
+            self._requeue_expired(now)
+            task = self._next_claimable(_datetime_to_micros(now))
+            if task is not None:
+                self._update(task, {'status': TaskStatus.IN_PROGRESS,
+                                    'claimed_by': worker_id,
+                                    'lease_until': lease_until})
+        return task
+
+    @_exclusive
+    def renew_lease(self, task_id: str, worker_id: str,
+                    lease: Optional[float] = None) -> bool:
+        """续约：租约从现在起重新计时。任务已不归该工作者（超时被收回）时返回False"""
+        task = self._claimed_task(task_id, worker_id)
+        if task is None:
+            return False
+        with self.acting_as(worker_id):
+            self._update(task, {'lease_until': self._lease_end(datetime.now(), lease)})
+        return True
+
+    @_exclusive
+    def release_task(self, task_id: str, worker_id: str,
+                     status: str = TaskStatus.DONE.value) -> bool:
+        """
+        交还领取的任务：默认标记为完成，也可以放回待办或标记为已取消
+
+        任务已不归该工作者（超时被收回）时返回False，此时任务可能已被别人领取。
+        """
+        status = TaskStatus(status)
+        if status is TaskStatus.IN_PROGRESS:
+            raise ValueError("交还任务时状态不能是进行中")
+        task = self._claimed_task(task_id, worker_id)
+        if task is None:
+            return False
+        with self.acting_as(worker_id):
+            self._update(task, {'status': status})
+        return True
+
+    @_exclusive
+    def requeue_expired(self) -> int:
+        """把租约已过期的任务放回待办，返回放回的任务数（claim_next 也会顺便执行）"""
+        with self.batch():
+            return self._requeue_expired(datetime.now())
+
+    def _lease_end(self, now: datetime, lease: Optional[float]) -> datetime:
+        seconds = self.LEASE_SECONDS if lease is None else lease
+        if seconds <= 0:
+            raise ValueError(f"租约时长必须为正数: {seconds}")
+        return now + timedelta(seconds=seconds)
+
+    def _claimed_task(self, task_id: str, worker_id: str) -> Optional[Task]:
+        """该工作者领取且仍在进行中的任务"""
+        task = self.get_task(task_id)
+        if (task is None or task.status is not TaskStatus.IN_PROGRESS
+                or task.claimed_by != worker_id):
+            return None
+        return task
+
+    def _requeue_expired(self, now: datetime) -> int:
+        expired = self._expired_leases(now)
+        for task in expired:
+            self._update(task, {'status': TaskStatus.TODO})
+        return len(expired)
+
+    def _claim_key(self, task: Task) -> tuple:
+        """领取顺序的排序键，最后是添加序号和ID，保证唯一"""
+        due = task.due_stamp
+        return (-self._PRIORITY_RANKS[task.priority], due is None, due or 0,
+                _local_micros(task._created_at), self._seq[task.id], task.id)
+
+    def _push_claim(self, task: Task) -> None:
+        heap = self._claim_heap
+        if len(heap) > 2 * len(self._ready) + 64:
+            self._claim_heap = None  # 过时条目太多，下次领取时重建
+        else:
+            heapq.heappush(heap, self._claim_key(task))
+
+    def _push_lease(self, task: Task) -> None:
+        heap = self._lease_heap
+        if len(heap) > 2 * len(self._by_status.get(TaskStatus.IN_PROGRESS, ())) + 64:
+            self._lease_heap = None
+        else:
+            heapq.heappush(heap, (_local_micros(task._lease_until), task.id))
+
+    @staticmethod
+    def _not_due_yet(task: Task, now: int) -> bool:
+        """重复任务的当前这一次还没到（now 为本地时间的微秒数），暂不能领取"""
+        return task.recurrence is not None and task.due_stamp > now
+
+    def _next_claimable(self, now: int) -> Optional[Task]:
+        """
+        领取堆顶的就绪任务（不弹出，领取后它离开就绪集合，条目随之过时）
+
+        第一次调用时由就绪集合建堆，O(k)；之后每次领取摊还 O(log k)。
+        还没到期的重复任务移到按截止时间排序的暂存堆，到期后再放回领取堆。
+        """
+        heap = self._claim_heap
+        if heap is None:
+            tasks = self._tasks
+            heap = [self._claim_key(tasks[task_id]) for task_id in self._ready]
+            heapq.heapify(heap)
+            self._claim_heap = heap
+            self._deferred_claims = []
+        deferred = self._deferred_claims
+        while deferred and deferred[0][0] <= now:
+            heapq.heappush(heap, heapq.heappop(deferred)[1])
+        while heap:
+            key = heap[0]
+            task = self._tasks.get(key[-1])
+            # 任务已删除、不再就绪或排序字段变了（已压入新条目）时条目过时
+            if task is not None and task.id in self._ready and self._claim_key(task) == key:
+                if not self._not_due_yet(task, now):
+                    return task
+                heapq.heappush(deferred, (task.due_stamp, key))
+            heapq.heappop(heap)
+        return None
+
+    def _expired_leases(self, now: datetime) -> List[Task]:
+        """弹出租约在now之前到期的进行中任务"""
+        heap = self._lease_heap
+        if heap is None:
+            tasks = self._tasks
+            heap = [(_local_micros(task._lease_until), task.id) for task in
+                    (tasks[task_id] for task_id in
+                     self._by_status.get(TaskStatus.IN_PROGRESS, ()))
+                    if task._lease_until is not None]
+            heapq.heapify(heap)
+            self._lease_heap = heap
+        cutoff = _datetime_to_micros(now)
+        # 租约未变而任务重新登记过时会有相同的条目，按ID去重
+        expired: Dict[str, Task] = {}
+        while heap and heap[0][0] <= cutoff:
+            stamp, task_id = heapq.heappop(heap)
+            task = self._tasks.get(task_id)
+            if (task is not None and task.status is TaskStatus.IN_PROGRESS
+                    and _local_micros(task._lease_until) == stamp):
+                expired[task_id] = task
+        return list(expired.values())
+
+    # ----- 修改历史 -----
+
+    @contextlib.contextmanager
+    def acting_as(self, actor: Optional[str]):
+        """
+        在 with 块中以 actor 的名义修改任务，修改历史记下该操作者（只影响当前线程）
+
+        用法:
+            with manager.acting_as("alice"):
+                manager.update_task(task_id, status="完成")
+        """
+        previous = getattr(self._acting, 'actor', None)
+        self._acting.actor = actor
+        try:
+            yield self
+        finally:
+            self._acting.actor = previous
+
+    def get_history(self, task_id: str) -> List[Dict[str, Any]]:
+        """
+        任务的修改记录，从早到晚
+
+        每条为 {'at': 时间, 'op': create/update/delete, 'by': 操作者,
+        'changes': {字段: (旧值, 新值)}}，值为导出格式；updated_at 不列入 changes。
+        需要启用修改历史（history 参数），否则返回空列表。
+        """
+        if self.history is None:
+            return []
+        entries = self.history.entries(task_id)
+        current = self.get_task(task_id)
+        state = self._snapshot_task(current) if current is not None else None
+        records = []
+        for index in range(len(entries) - 1, -1, -1):
+            stamp, op, actor, old = entries[index]
+            changes = {}
+            if op == TaskHistory.UPDATE:
+                for i in range(0, len(old), 2):
+                    slot = old[i]
+                    if slot != '_updated_at':
+                        changes[slot.lstrip('_')] = (TaskHistory.encode_value(slot, old[i + 1]),
+                                                     TaskHistory.encode_value(slot, state[slot]))
+            records.append({'at': _micros_to_datetime(stamp), 'op': op, 'by': actor,
+                            'changes': changes})
+            state = self._undo_entry(entries, index, state)
+        records.reverse()
+        return records
+
+    def get_task_at(self, task_id: str, when: datetime) -> Optional[Task]:
+        """
+        任务在 when 时刻的样子（由修改历史倒推出的副本），当时不存在或已删除时返回None
+
+        从当前状态倒着撤销 when 之后的修改，代价与这些修改的条数成正比。
+        启用修改历史之前的变化无从得知，更早的时刻按最早记录到的状态回答。
+        """
+        state = self._state_at(task_id, _datetime_to_micros(when))
+        if state is None:
+            return None
+        task = Task.__new__(Task)
+        self._restore_fields(task, state)
+        return task
+
+    def tasks_at(self, when: datetime, status_filter: Optional[str] = None) -> List[Task]:
+        """
+        when 时刻存在的任务，可按当时的状态过滤，按创建时间排列
+
+        when 之后没有修改过的任务直接返回当前对象，修改过的（包括已删除的）
+        才倒推出副本，代价是扫描一遍任务再加上撤销 when 之后的修改。
+        """
+        status = TaskStatus(status_filter) if status_filter else None
+        cutoff = _datetime_to_micros(when)
+        history = self.history
+        found = []
+        live = self.tasks
+        for task in live:
+            entries = history.entries(task.id) if history is not None else None
+            if not entries or entries[-1][0] <= cutoff:
+                if (_local_micros(task._created_at) <= cutoff
+                        and (status is None or task.status is status)):
+                    found.append(task)
+                continue
+            past = self.get_task_at(task.id, when)
+            if past is not None and (status is None or past.status is status):
+                found.append(past)
+        if history is not None:
+            # 已删除的任务只存在于历史中
+            live_ids = {task.id for task in live}
+            for task_id, entries in history.items():
+                if (task_id not in live_ids and entries[-1][1] == TaskHistory.DELETE
+                        and entries[-1][0] > cutoff):
+                    past = self.get_task_at(task_id, when)
+                    if past is not None and (status is None or past.status is status):
+                        found.append(past)
+        found.sort(key=lambda task: _local_micros(task._created_at))
+        return found
+
+    def _state_at(self, task_id: str, cutoff: int) -> Optional[Dict[str, Any]]:
+        """任务在 cutoff（微秒）时刻各槽位的值，当时不存在时返回None"""
+        entries = self.history.entries(task_id) if self.history is not None else []
+        # 二分查找第一个晚于cutoff的条目
+        lo, hi = 0, len(entries)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if entries[mid][0] <= cutoff:
+                lo = mid + 1
+            else:
+                hi = mid
+        current = self.get_task(task_id)
+        state = self._snapshot_task(current) if current is not None else None
+        for index in range(len(entries) - 1, lo - 1, -1):
+            state = self._undo_entry(entries, index, state)
+        if state is None or _local_micros(state['_created_at']) > cutoff:
+            return None
+        if _local_micros(state['_updated_at']) > cutoff:
+            # 续约和空更新不记历史却会刷新 updated_at，取当时最近一次有记录的修改时间
+            state['_updated_at'] = entries[lo - 1][0] if lo else state['_created_at']
+        return state
+
+    def _undo_entry(self, entries: list, index: int,
+                    state: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """撤销一个条目：由它之后的状态得到它之前的状态（state会被修改）"""
+        _, op, _, old = entries[index]
+        if op == TaskHistory.CREATE:
+            return None
+        if op == TaskHistory.DELETE:
+            return self._snapshot_task(old)
+        for i in range(0, len(old), 2):
+            state[old[i]] = old[i + 1]
+        if '_updated_at' not in old[::2]:
+            # 省略的旧 updated_at 就是上一个条目的时间
+            state['_updated_at'] = entries[index - 1][0]
+        return state
+
+    def _log_change(self, task: Task, op: str,
+                    state: Optional[Dict[str, Any]] = None) -> bool:
+        """
+        记一个修改历史条目；update 时 state 为修改前各槽位的值，返回是否记录
+
+        条目时间：create 为创建时间，update 为修改后的 updated_at，delete 为现在。
+        没有实际改变字段的更新和只延长租约的续约（工作者的心跳）不记录。
+        """
+        actor = getattr(self._acting, 'actor', None) or self.actor
+        if op == TaskHistory.CREATE:
+            self.history.append(task.id, _local_micros(task._created_at), op, actor)
+        elif op == TaskHistory.DELETE:
+            self.history.append(task.id, _datetime_to_micros(datetime.now()), op, actor, task)
+        else:
+            old = []
+            for slot, value in state.items():
+                if slot != '_updated_at' and getattr(task, slot) != value:
+                    old.extend((slot, value))
+            if not old or old == ['_lease_until', state['_lease_until']]:
+                return False
+            entries = self.history.entries(task.id)
+            previous = state['_updated_at']
+            if not entries or entries[-1][0] != _local_micros(previous):
+                old.extend(('_updated_at', previous))
+            self.history.append(task.id, _local_micros(task._updated_at), op, actor,
+                                tuple(old))
+        return True
+
+    def _unlog_change(self, task: Task) -> None:
+        """批量回滚时撤销对应的修改历史条目"""
+        if self.history is not None:
+            self.history.discard_last(task.id)
+
+    def _flush_history(self) -> None:
+        if self.history is not None:
+            try:
+                self.history.flush()
+            except IOError as e:
+                print(f"保存修改历史失败: {e}")
+
+class SQLiteTaskManager(TaskManager):
+    """
+    基于SQLite的任务管理器
+
+    启动时不加载任务，查询直接交给 SQLiteTaskStorage 的索引完成，
+    每次修改在一个事务中写入单行。
+    """
+
+    def __init__(self, db_file: str = "tasks.db", fsync: str = "interval",
+                 history: Union[bool, TaskHistory] = False):
+        super().__init__(db_file, storage=SQLiteTaskStorage(db_file, fsync),
+                         fsync=fsync, history=history)
+
+    def load_tasks(self) -> None:
+        """任务按需从数据库查询，无需预先加载；标记为已加载，refresh 不再调用本方法"""
+        self._loaded = True
+
+    def save_tasks(self) -> None:
+        """每次修改都已提交，无需整体保存"""
+
+    @property
+    def tasks(self) -> List[Task]:
+        return self.storage.load()
+
+    def get_task(self, task_id: str) -> Optional[Task]:
+        return self.storage.get(task_id)
+
+    def _insert_task(self, task: Task, seq: Optional[int] = None) -> None:
+        """任务只保存在数据库中，由 _persist 写入"""
+
+    def _remove_task(self, task: Task) -> None:
+        """任务只保存在数据库中，由 _persist 删除"""
+
+    def _index_task(self, task: Task) -> None:
+        """索引由数据库维护"""
+
+    def _unindex_task(self, task: Task) -> None:
+        """索引由数据库维护"""
+
+    def list_tasks(self, status_filter: Optional[str] = None,
+                   category_filter: Optional[str] = None,
+                   priority_filter: Optional[str] = None,
+                   show_overdue: bool = False, limit: Optional[int] = None,
+                   cursor: Optional[str] = None, order_by: str = 'created') -> List[Task]:
+        """分页在SQL中完成（WHERE rowid > ? LIMIT ?），只支持按添加顺序"""
+        if order_by != 'created':
+            raise ValueError("SQLite存储只支持按添加顺序（created）分页")
+        if limit is not None and limit < 1:
+            raise ValueError("limit 必须是正整数")
+        after = _decode_cursor(cursor, order_by)[0] if cursor else None
+        if status_filter:
+            try:
+                TaskStatus(status_filter)
+            except ValueError:
+                print(f"无效的状态过滤: {status_filter}")
+                status_filter = None
+        if priority_filter:
+            try:
+                TaskPriority(priority_filter)
+            except ValueError:
+                print(f"无效的优先级过滤: {priority_filter}")
+                priority_filter = None
+
+        tasks = self.storage.query(status_filter or None, category_filter or None,
+                                   priority_filter or None,
+                                   datetime.now() if show_overdue else None,
+                                   after_rowid=after,
+                                   limit=limit + 1 if limit is not None else None)
+        if limit is None:
+            return tasks
+        next_cursor = None
+        if len(tasks) > limit:
+            next_cursor = _encode_cursor(order_by, (self.storage.rowid(tasks[limit - 1].id),))
+        return TaskPage(tasks[:limit], next_cursor)
+
+    def search_tasks(self, keyword: str) -> List[Task]:
+        return self.storage.search(keyword)
+
+    def get_statistics(self) -> Dict[str, Any]:
+        total = self.storage.count()
+        status_counts = self.storage.distribution('status')
+        return {
+            'total_tasks': total,
+            'status_distribution': status_counts,
+            'priority_distribution': self.storage.distribution('priority'),
+            'category_distribution': self.storage.distribution('category'),
+            'overdue_tasks': self.storage.count(overdue_at=datetime.now()),
+            'completion_rate': (status_counts.get(TaskStatus.DONE.value, 0) / total * 100) if total > 0 else 0
+        }
+
+    def get_upcoming_tasks(self, days: int = 7) -> List[Task]:
         now = datetime.now()
         future_date = now + timedelta(days=days)
+        upcoming = [(task.due_stamp, seq, task) for seq, task
+                    in enumerate(self.storage.due_between(now, future_date))
+                    if not task.recurrence]
+        # 重复任务不常驻内存，每次查询从数据库取出后建堆展开
+        start, end = _datetime_to_micros(now), _datetime_to_micros(future_date)
+        firsts = ((parse_recurrence(task.recurrence).next_at_or_after(task.due_stamp, start),
+                   seq, task) for seq, task in enumerate(self.storage.recurring()))
+        occurrences = _expand_occurrences(firsts, end)
+        return [task for _, _, task in heapq.merge(upcoming, occurrences,
+                                                   key=lambda item: item[:2])]
+
+    def ready_tasks(self, limit: Optional[int] = None) -> List[Task]:
+        # 没有常驻的就绪集合：取出待办任务，逐个查询有依赖的任务的依赖状态
+        ready = (task for task in self.storage.query(TaskStatus.TODO.value)
+                 if not task.depends_on or not self._open_dependencies(task))
+        return list(islice(ready, limit))
+
+    def _dependents_of(self, task_id: str) -> Iterable[str]:
+        return self.storage.dependents(task_id)
+
+    def _next_claimable(self, now: int) -> Optional[Task]:
+        # 沿领取顺序的索引读取待办任务，跳过依赖未完成的和还没到期的重复任务
+        for task in self.storage.claimable():
+            if self._not_due_yet(task, now):
+                continue
+            if not task.depends_on or not self._open_dependencies(task):
+                return task
+        return None
+
+    def _expired_leases(self, now: datetime) -> List[Task]:
+        return self.storage.expired_leases(now)
 
-        upcoming = []
-        for task in self.tasks:
-            if (task.due_date and now <= task.due_date <= future_date
-                and task.status != TaskStatus.DONE):
-                upcoming.append(task)
+# ===== 线程安全 =====
 
-        return sorted(upcoming, key=lambda t: t.due_date)
+class ReadWriteLock:
+    """
+    读写锁
+
+    在 advanced/context_managers.py 中 LockManager 的基础上区分读写：
+    多个读者可以同时持有读锁，写者独占。有写者在等待时新的读者也要等待，
+    避免写者饿死。写锁可重入，持有写锁的线程也可以获取读锁；
+    持有读锁时不能再获取写锁（会与其他读者互相等待）。
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer: Optional[int] = None
+        self._write_depth = 0
+        self._waiting_writers = 0
+        self._local = threading.local()  # 每个线程的读锁嵌套层数
+
+    def reading(self) -> bool:
+        """当前线程是否持有读锁"""
+        return getattr(self._local, 'depth', 0) > 0
+
+    def writing(self) -> bool:
+        """当前线程是否持有写锁"""
+        return self._writer == threading.get_ident()
+
+    def acquire_read(self) -> None:
+        local = self._local
+        depth = getattr(local, 'depth', 0)
+        if depth == 0:
+            # 写者自己读不需要登记；嵌套的读锁不等待，否则会与等待中的写者死锁
+            local.counted = self._writer != threading.get_ident()
+            if local.counted:
+                with self._condition:
+                    while self._writer is not None or self._waiting_writers:
+                        self._condition.wait()
+                    self._readers += 1
+        local.depth = depth + 1
+
+    def release_read(self) -> None:
+        local = self._local
+        local.depth -= 1
+        if local.depth == 0 and local.counted:
+            with self._condition:
+                self._readers -= 1
+                if self._readers == 0:
+                    self._condition.notify_all()
+
+    def acquire_write(self) -> None:
+        me = threading.get_ident()
+        with self._condition:
+            if self._writer == me:
+                self._write_depth += 1
+                return
+            if self.reading():
+                raise RuntimeError("持有读锁时不能获取写锁")
+            self._waiting_writers += 1
+            while self._writer is not None or self._readers:
+                self._condition.wait()
+            self._waiting_writers -= 1
+            self._writer = me
+            self._write_depth = 1
+
+    def release_write(self) -> None:
+        with self._condition:
+            self._write_depth -= 1
+            if self._write_depth == 0:
+                self._writer = None
+                self._condition.notify_all()
+
+    @contextlib.contextmanager
+    def read(self):
+        self.acquire_read()
+        try:
+            yield self
+        finally:
+            self.release_read()
+
+    @contextlib.contextmanager
+    def write(self):
+        self.acquire_write()
+        try:
+            yield self
+        finally:
+            self.release_write()
+
+def _reader(method):
+    """在读锁中执行"""
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        # 共享模式下先在写锁中合并其他进程的修改，读锁中不能再升级
+        self.refresh()
+        with self._rwlock.read():
+            return method(self, *args, **kwargs)
+    return wrapper
+
+def _writer(method):
+    """在写锁中执行"""
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._rwlock.write():
+            return method(self, *args, **kwargs)
+    return wrapper
+
+class ThreadSafeTaskManager(TaskManager):
+    """
+    线程安全的任务管理器
+
+    查询（get_task、list_tasks、search_tasks、get_statistics等）持有读锁，
+    可以并发执行；修改和批量修改持有写锁，互相排斥，也排斥所有查询。
+    批量修改在整个 with 块期间持有写锁，其他线程的修改不会混入。
+    返回的 Task 对象仍是共享的，调用方不应直接修改其字段。
+    """
+
+    def __init__(self, *args, **kwargs):
+        self._rwlock = ReadWriteLock()
+        super().__init__(*args, **kwargs)
+
+    @property
+    @_reader
+    def tasks(self) -> List[Task]:
+        return list(self._tasks.values())
+
+    @tasks.setter
+    @_writer
+    def tasks(self, tasks: List[Task]) -> None:
+        TaskManager.tasks.fset(self, tasks)
+
+    def batch(self) -> TaskBatch:
+        # 已在批量中（持有写锁）时沿用当前批量，否则新建，进入时才等待写锁
+        if self._rwlock.writing():
+            return super().batch()
+        return TaskBatch(self)
+
+    def refresh(self) -> bool:
+        if (self._file_lock is None and self._loaded) or self._rwlock.reading():
+            return False
+        with self._rwlock.write():
+            return super().refresh()
+
+    def _acquire(self) -> None:
+        # 所有修改（包括批量）都经过这里：先取写锁，再取跨进程的文件锁
+        self._rwlock.acquire_write()
+        try:
+            super()._acquire()
+        except BaseException:
+            self._rwlock.release_write()
+            raise
+
+    def _release(self) -> None:
+        try:
+            super()._release()
+        finally:
+            self._rwlock.release_write()
+
+    load_tasks = _writer(TaskManager.load_tasks)
+    compact = _writer(TaskManager.compact)
+    get_task = _reader(TaskManager.get_task)
+    list_tasks = _reader(TaskManager.list_tasks)
+    search_tasks = _reader(TaskManager.search_tasks)
+    get_statistics = _reader(TaskManager.get_statistics)
+    get_upcoming_tasks = _reader(TaskManager.get_upcoming_tasks)
+    ready_tasks = _reader(TaskManager.ready_tasks)
+    critical_path = _reader(TaskManager.critical_path)
+    get_history = _reader(TaskManager.get_history)
+    get_task_at = _reader(TaskManager.get_task_at)
+    tasks_at = _reader(TaskManager.tasks_at)
+
+# ===== 到期提醒 =====
+
+class Reminder:
+    """一条提醒：kind 为 upcoming（提前提醒）或 due（到期），due 为这一次的截止时间"""
+
+    __slots__ = ('task', 'kind', 'due')
+    KINDS = {'upcoming': "即将到期", 'due': "已到期"}
+
+    def __init__(self, task: Task, kind: str, due: datetime):
+        self.task = task
+        self.kind = kind
+        self.due = due
+
+    def __str__(self) -> str:
+        return f"⏰ {self.KINDS[self.kind]} ({self.due:%Y-%m-%d %H:%M}): {self.task}"
+
+def print_sink(reminder: Reminder) -> None:
+    """默认的提醒方式：打印到终端"""
+    print(f"\n{reminder}")
+
+class ReminderScheduler:
+    """
+    到期提醒服务
+
+    未完成且有截止日期的任务按提醒时间放进一个小顶堆（截止时刻一条，
+    指定 lead 时再加一条提前提醒），服务只睡到堆顶的时间，醒来后发出到期的
+    提醒，不需要轮询。任务增删改时通过 TaskManager.add_listener 收到通知，
+    作废该任务的旧条目并按新的截止日期重新入堆（惰性删除）。
+    重复任务的一次到期提醒发出后，接着为下一次发生排期。
+
+    sink 接收 Reminder，可以是普通函数或协程函数。
+    在 asyncio 程序中 await run()，调用 stop() 结束；同步程序用 start()/stop()
+    在后台线程中运行。启动前已经过去的提醒不会补发。
+    """
+
+    # 最长睡眠秒数：墙上时钟被调整（如手动改时间）后最多这么久重新对时
+    MAX_SLEEP = 60.0
+
+    def __init__(self, manager: TaskManager,
+                 sink: Callable[[Reminder], Any] = print_sink,
+                 lead: Optional[timedelta] = None):
+        self.manager = manager
+        self.sink = sink
+        self.lead = lead // timedelta(microseconds=1) if lead else 0
+        self._lock = threading.Lock()
+        # 条目为 [提醒微秒数, 编号, 类型, 截止微秒数, 任务]，作废时任务置为None。
+        # 条目直接引用任务对象，服务线程不需要再访问 manager（SQLite连接不能跨线程）
+        self._heap: List[list] = []
+        self._entries: Dict[str, List[list]] = {}
+        self._counter = count()
+        self._pending: Optional[List[Tuple[str, Task]]] = None
+        self._next_wakeup: Optional[int] = None  # 服务睡到的时间，None表示无限期
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._stopping = False
+        self._attached = False
+        self._thread: Optional[threading.Thread] = None
+
+    def __len__(self) -> int:
+        """已排期的提醒数"""
+        with self._lock:
+            return sum(len(entries) for entries in self._entries.values())
+
+    # ----- 排期 -----
+
+    def _entries_for(self, task: Task, after: int) -> List[list]:
+        """任务在after之后的下一次截止对应的提醒条目"""
+        due = task.due_stamp
+        if due is None or task.status in (TaskStatus.DONE, TaskStatus.CANCELLED):
+            return []
+        if task.recurrence:
+            due = parse_recurrence(task.recurrence).next_at_or_after(due, after)
+        entries = []
+        for kind, stamp in (('upcoming', due - self.lead), ('due', due)):
+            if stamp >= after and (kind == 'due' or self.lead):
+                entries.append([stamp, next(self._counter), kind, due, task])
+        return entries
+
+    def _schedule(self, task: Task, after: int) -> None:
+        """为任务排入提醒（调用方持有锁）"""
+        entries = self._entries_for(task, after)
+        if entries:
+            self._entries[task.id] = entries
+            for entry in entries:
+                heapq.heappush(self._heap, entry)
+
+    def _cancel(self, task_id: str) -> None:
+        """作废任务已排期的提醒（调用方持有锁）"""
+        for entry in self._entries.pop(task_id, ()):
+            entry[4] = None
+        if len(self._heap) > 2 * len(self._entries) + 64:
+            # 作废条目过多时重建堆
+            self._heap = [entry for entry in self._heap if entry[4] is not None]
+            heapq.heapify(self._heap)
+
+    def _reload(self) -> None:
+        """
+        按当前的任务重建整个堆
+
+        读取任务时不持有自己的锁（否则会与在写锁中发来通知的线程互相等待），
+        这期间收到的修改先暂存，新堆就位后再依次应用。这期间任务被整体重新
+        加载（例如惰性加载的管理器在第一次读取任务时才加载）则再重建一次。
+        """
+        while True:
+            with self._lock:
+                self._pending = []
+            now = _datetime_to_micros(datetime.now())
+            heap, by_id = [], {}
+            for task in self.manager.tasks:
+                entries = self._entries_for(task, now)
+                if entries:
+                    by_id[task.id] = entries
+                    heap.extend(entries)
+            heapq.heapify(heap)
+            with self._lock:
+                self._heap, self._entries = heap, by_id
+                pending, self._pending = self._pending, None
+                if all(op != 'reload' for op, _ in pending):
+                    for op, task in pending:
+                        self._apply(op, task)
+                    break
+        self._wake()
+
+    def _on_change(self, op: str, task: Optional[Task]) -> None:
+        """TaskManager的变更回调：重新为该任务排期并唤醒服务"""
+        with self._lock:
+            if self._pending is not None:
+                # 正在重建堆：修改先暂存，重新加载的通知由 _reload 在重建结束时处理
+                self._pending.append((op, task))
+                return
+            if op != 'reload':
+                self._apply(op, task)
+                # 只有新的最早提醒早于服务醒来的时间才需要唤醒；作废的条目留在堆里，
+                # 服务按时醒来后跳过即可
+                earlier = self._heap and (self._next_wakeup is None
+                                          or self._heap[0][0] < self._next_wakeup)
+        if op == 'reload':
+            self._reload()
+        elif earlier:
+            self._wake()
+
+    def _apply(self, op: str, task: Task) -> None:
+        """作废任务的旧提醒，仍存在的任务按新的截止日期重新排期（调用方持有锁）"""
+        self._cancel(task.id)
+        if op == 'upsert':
+            self._schedule(task, _datetime_to_micros(datetime.now()))
+
+    def _wake(self) -> None:
+        """唤醒正在睡眠的服务（可以在任意线程调用）"""
+        loop, wakeup = self._loop, self._wakeup
+        if loop is not None:
+            try:
+                loop.call_soon_threadsafe(wakeup.set)
+            except RuntimeError:
+                pass  # 事件循环已关闭
+
+    def _pop_due(self) -> Tuple[List[Reminder], Optional[float]]:
+        """取出已经到时间的提醒，并返回距下一条提醒的秒数（没有则为None）"""
+        now = _datetime_to_micros(datetime.now())
+        reminders = []
+        with self._lock:
+            heap = self._heap
+            while heap and (heap[0][4] is None or heap[0][0] <= now):
+                stamp, _, kind, due, task = entry = heapq.heappop(heap)
+                if task is None:
+                    continue
+                entries = self._entries[task.id]
+                entries.remove(entry)
+                if not entries:
+                    del self._entries[task.id]
+                reminders.append(Reminder(task, kind, _micros_to_datetime(due)))
+                if kind == 'due' and task.recurrence:
+                    # 重复任务：这一次的提醒已发出，为下一次排期
+                    self._schedule(task, due + 1)
+            self._next_wakeup = heap[0][0] if heap else None
+            delay = (heap[0][0] - now) / 1e6 if heap else None
+        return reminders, delay
+
+    # ----- 运行 -----
+
+    def _attach(self) -> None:
+        """注册变更回调并建堆（先注册，建堆期间的修改不会遗漏）"""
+        self.manager.add_listener(self._on_change)
+        try:
+            self._reload()
+        except BaseException:
+            self.manager.remove_listener(self._on_change)
+            raise
+        self._attached = True
+
+    async def run(self) -> None:
+        """在当前事件循环中运行，直到 stop() 被调用"""
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        if not self._attached:
+            self._attach()
+        try:
+            while not self._stopping:
+                # 先清除唤醒标志再查看堆，避免漏掉查看期间到来的修改
+                self._wakeup.clear()
+                reminders, delay = self._pop_due()
+                if reminders:
+                    for reminder in reminders:
+                        await self._deliver(reminder)
+                    continue
+                timeout = self.MAX_SLEEP if delay is None else min(delay, self.MAX_SLEEP)
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            self.manager.remove_listener(self._on_change)
+            self._attached = False
+            self._loop = self._wakeup = None
+            self._stopping = False
+
+    async def _deliver(self, reminder: Reminder) -> None:
+        """把提醒交给sink，sink出错不影响服务继续运行"""
+        try:
+            result = self.sink(reminder)
+            if inspect.isawaitable(result):
+                await result
+        except Exception as e:
+            print(f"发送提醒失败: {e}")
+
+    def start(self) -> None:
+        """在后台线程中运行（供同步程序使用）"""
+        if self._thread is not None:
+            return
+        # 在调用线程中读取任务建堆，服务线程只操作堆
+        self._attach()
+        self._thread = threading.Thread(target=asyncio.run, args=(self.run(),),
+                                        name="reminder-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """停止服务；由 start() 启动的后台线程会等待其退出"""
+        self._stopping = True
+        self._wake()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
 
 # ===== 用户界面 =====
 
 class TaskManagerUI:
     """任务管理器用户界面"""
 
-    def __init__(self):
-        self.manager = TaskManager()
+    # 会修改任务的命令，批处理模式下连续的修改合并为一次持久化
+    MUTATING_COMMANDS = ('add', 'update', 'delete')
+    UPDATE_ATTRIBUTES = ('title', 'description', 'priority', 'category', 'status',
+                         'due_date', 'recurrence', 'depends_on')
+    # 含引号、转义或注释的脚本行才需要进一步解析；其中只由空白分隔的
+    # 整段引号和普通单词组成的行用正则切分，其余（转义、注释等）交给 shlex
+    _SHELL_SYNTAX = re.compile(r'["\'\\#]')
+    _QUOTED_LINE = re.compile(r'''(?:\s*(?:"[^"\\]*"|'[^']*'|[^\s"'\\#]+)(?=\s|$))*\s*''')
+    _QUOTED_TOKEN = re.compile(r'''"([^"\\]*)"|'([^']*)'|([^\s"'\\#]+)''')
+
+    def __init__(self, manager: Optional[TaskManager] = None):
+        # 惰性加载：显示提示符和 help 不需要读取任务文件
+        self.manager = manager or TaskManager(lazy=True)
+        # 批处理模式下 list 不分页
+        self.batch_mode = False
+        # 命令名 -> 处理函数，处理函数都接受参数列表
+        self.commands: Dict[str, Callable[[List[str]], None]] = {
+            'help': lambda args: self.show_help(),
+            'add': self.add_task_interactive,
+            'list': self.list_tasks_interactive,
+            'show': self.show_task_detail,
+            'update': self.update_task_interactive,
+            'delete': self.delete_task_interactive,
+            'search': self.search_tasks_interactive,
+            'stats': lambda args: self.show_statistics(),
+            'upcoming': self.show_upcoming_tasks,
+            'ready': self.show_ready_tasks,
+            'path': self.show_critical_path,
+            'history': self.show_task_history,
+            'asof': self.show_tasks_as_of,
+        }
+        # 批处理模式下修改命令不逐条输出，失败时抛出ValueError
+        self.script_commands: Dict[str, Callable[[List[str]], None]] = {
+            'add': self._script_add,
+            'update': self._script_update,
+            'delete': self._script_delete,
+        }
 
     def show_help(self) -> None:
         """显示帮助信息"""
@@ -335,21 +2604,26 @@ class TaskManagerUI:
 ================
 
 任务管理:
-  add <标题> [描述] [优先级] [分类] [截止日期]
+  add <标题> [描述] [优先级] [分类] [截止日期] [重复规则]
      添加新任务
      优先级: 低/中/高/紧急 (默认: 中)
      日期格式: YYYY-MM-DD 或 YYYY-MM-DD HH:MM:SS
+     重复规则: 每天/每周/每小时、every N days 或 cron表达式 "分 时 日 月 周"
+     重复任务标记为完成后截止日期自动推进到下一次
 
-  list [状态] [分类] [优先级] [--overdue]
-     列出任务
+  list [状态] [分类] [优先级] [--overdue] [--sort=排序]
+     列出任务（每页20个，回车显示下一页）
      状态: 待办/进行中/完成/已取消
+     排序: created(添加顺序)/due_date(截止日期)/priority(优先级)
 
   show <任务ID>
      显示任务详情
 
   update <任务ID> <属性> <值>
      更新任务属性
-     属性: title, description, priority, category, status, due_date
+     属性: title, description, priority, category, status, due_date, recurrence, depends_on
+     depends_on 为依赖的任务ID（空格或逗号分隔，- 表示清除），不能形成循环，
+     也不能依赖重复任务；被依赖的任务不能设置 recurrence
 
   delete <任务ID>
      删除任务
@@ -359,7 +2633,20 @@ class TaskManagerUI:
 
 统计和报告:
   stats          显示统计信息
-  upcoming [天数] 显示即将到期的任务 (默认7天)
+  upcoming [天数] 显示即将到期的任务 (默认7天，重复任务列出每一次)
+
+依赖关系:
+  ready          显示可以开始的任务（待办且依赖全部完成）
+  path <任务ID>   显示到达该任务的关键路径（最长的未完成依赖链）
+
+修改历史（以 --history 启动时记录）:
+  history <任务ID>        显示任务的修改记录
+  asof <日期> [状态]       显示当时存在的任务（可按当时的状态过滤）
+
+批处理:
+  python task_manager.py --batch 脚本文件|-
+     非交互地执行脚本中的命令（每行一条，# 开头为注释，- 表示标准输入）
+     连续的 add/update/delete 只保存一次且不逐条输出，结束时报告吞吐量
 
 其他命令:
   help           显示此帮助
@@ -367,10 +2654,14 @@ class TaskManagerUI:
 
 示例:
   add "完成Python项目" "实现计算器功能" 高 工作 2024-12-31
+  add 周报 每周五提交 中 工作 2024-12-27 0 17 * * 5
+  update abc12345 recurrence 每天
+  update abc12345 depends_on def67890 0a1b2c3d
   list 待办
   update abc12345 status 完成
   search 项目
   upcoming 3
+  asof 2024-12-01 进行中
         """
         print(help_text)
 
@@ -387,6 +2678,7 @@ class TaskManagerUI:
             priority = input("优先级 (低/中/高/紧急, 默认: 中): ").strip() or "中"
             category = input("分类 (默认: 默认): ").strip() or "默认"
             due_date_str = input("截止日期 (YYYY-MM-DD, 可选): ").strip()
+            recurrence = input("重复规则 (如 每天/每周/\"0 9 * * 1-5\", 可选): ").strip()
 
         else:
             # 命令行参数
@@ -395,19 +2687,25 @@ class TaskManagerUI:
             priority = args[2] if len(args) > 2 else "中"
             category = args[3] if len(args) > 3 else "默认"
             due_date_str = args[4] if len(args) > 4 else None
+            # cron表达式含空格，其余参数都并入重复规则
+            recurrence = ' '.join(args[5:]) or None
 
         if not title:
             print("任务标题不能为空")
             return
 
-        self.manager.add_task(title, description, priority, category, due_date_str)
+        self.manager.add_task(title, description, priority, category, due_date_str,
+                              recurrence)
+
+    PAGE_SIZE = 20
 
     def list_tasks_interactive(self, args: List[str]) -> None:
-        """列出任务"""
+        """列出任务（分页显示）"""
         status_filter = None
         category_filter = None
         priority_filter = None
         show_overdue = False
+        order_by = 'created'
 
         # 解析参数
         for arg in args:
@@ -417,21 +2715,41 @@ class TaskManagerUI:
                 priority_filter = arg
             elif arg == '--overdue':
                 show_overdue = True
+            elif arg.startswith('--sort='):
+                order_by = arg.split('=', 1)[1]
             else:
                 category_filter = arg
 
-        tasks = self.manager.list_tasks(status_filter, category_filter,
-                                      priority_filter, show_overdue)
+        list_page = partial(self.manager.list_tasks, status_filter, category_filter,
+                            priority_filter, show_overdue,
+                            limit=self.PAGE_SIZE, order_by=order_by)
+        try:
+            page = list_page()
+        except ValueError as e:
+            print(e)
+            return
 
-        if not tasks:
+        if not page:
             print("没有找到匹配的任务")
             return
 
-        print(f"\n找到 {len(tasks)} 个任务:")
+        shown = 0
         print("-" * 80)
-        for task in tasks:
-            print(task)
+        while True:
+            for task in page:
+                print(task)
+            shown += len(page)
+            if not page.next_cursor:
+                break
+            if self.batch_mode:
+                page = list_page(cursor=page.next_cursor)
+                continue
+            more = input(f"已显示 {shown} 个任务，回车显示下一页，q 结束: ").strip().lower()
+            if more == 'q':
+                break
+            page = list_page(cursor=page.next_cursor)
         print("-" * 80)
+        print(f"共显示 {shown} 个任务")
 
     def show_task_detail(self, args: List[str]) -> None:
         """显示任务详情"""
@@ -454,6 +2772,12 @@ class TaskManagerUI:
         print(f"优先级: {task.priority.value}")
         print(f"分类: {task.category}")
         print(f"截止日期: {task.due_date.strftime('%Y-%m-%d %H:%M') if task.due_date else '无'}")
+        print(f"重复: {task.recurrence or '不重复'}")
+        print(f"依赖: {', '.join(task.depends_on) or '无'}")
+        if task.claimed_by:
+            lease_until = task.lease_until
+            print(f"领取者: {task.claimed_by}（租约至 "
+                  f"{lease_until.strftime('%Y-%m-%d %H:%M:%S') if lease_until else '无'}）")
         print(f"创建时间: {task.created_at.strftime('%Y-%m-%d %H:%M')}")
         print(f"更新时间: {task.updated_at.strftime('%Y-%m-%d %H:%M')}")
         print(f"完成时间: {task.completed_at.strftime('%Y-%m-%d %H:%M') if task.completed_at else '未完成'}")
@@ -471,22 +2795,14 @@ class TaskManagerUI:
         attribute = args[1]
         value = ' '.join(args[2:])
 
-        # 属性映射
-        attr_mapping = {
-            'title': 'title',
-            'description': 'description',
-            'priority': 'priority',
-            'category': 'category',
-            'status': 'status',
-            'due_date': 'due_date'
-        }
-
-        if attribute not in attr_mapping:
+        if attribute not in self.UPDATE_ATTRIBUTES:
             print(f"无效的属性: {attribute}")
-            print("可用属性: title, description, priority, category, status, due_date")
+            print(f"可用属性: {', '.join(self.UPDATE_ATTRIBUTES)}")
             return
+        if attribute == 'depends_on' and value == '-':
+            value = ''
 
-        self.manager.update_task(task_id, **{attr_mapping[attribute]: value})
+        self.manager.update_task(task_id, **{attribute: value})
 
     def delete_task_interactive(self, args: List[str]) -> None:
         """删除任务"""
@@ -567,6 +2883,83 @@ class TaskManagerUI:
             print(f"{task} - {urgency}")
         print("-" * 80)
 
+    def show_ready_tasks(self, args: List[str]) -> None:
+        """显示可以开始的任务"""
+        tasks = self.manager.ready_tasks()
+        if not tasks:
+            print("没有可以开始的任务")
+            return
+
+        print(f"\n▶️  可以开始的任务 ({len(tasks)} 个):")
+        print("-" * 80)
+        for task in tasks:
+            print(task)
+        print("-" * 80)
+
+    def show_critical_path(self, args: List[str]) -> None:
+        """显示到达任务的关键路径"""
+        if not args:
+            print("请提供任务ID")
+            return
+
+        try:
+            path = self.manager.critical_path(args[0])
+        except ValueError as e:
+            print(e)
+            return
+
+        print(f"\n关键路径 ({len(path)} 个任务，依次完成):")
+        print("-" * 80)
+        for step, task in enumerate(path, 1):
+            print(f"{step:>3}. {task}")
+        print("-" * 80)
+
+    def show_task_history(self, args: List[str]) -> None:
+        """显示任务的修改记录"""
+        if not args:
+            print("请提供任务ID")
+            return
+        if self.manager.history is None:
+            print("未启用修改历史（以 --history 启动）")
+            return
+
+        records = self.manager.get_history(args[0])
+        if not records:
+            print(f"没有修改记录: {args[0]}")
+            return
+
+        names = {TaskHistory.CREATE: "创建", TaskHistory.UPDATE: "修改",
+                 TaskHistory.DELETE: "删除"}
+        print(f"\n修改记录 ({len(records)} 条):")
+        print("-" * 80)
+        for record in records:
+            changes = "，".join(f"{field}: {old or '无'} → {new or '无'}"
+                               for field, (old, new) in record['changes'].items())
+            print(f"{record['at'].strftime('%Y-%m-%d %H:%M:%S')} "
+                  f"{record['by'] or '-'} {names[record['op']]} {changes}".rstrip())
+        print("-" * 80)
+
+    def show_tasks_as_of(self, args: List[str]) -> None:
+        """显示某个时刻存在的任务"""
+        if not args:
+            print("请提供日期")
+            return
+        if self.manager.history is None:
+            print("未启用修改历史（以 --history 启动）")
+            return
+        try:
+            when = datetime.fromisoformat(args[0])
+            tasks = self.manager.tasks_at(when, args[1] if len(args) > 1 else None)
+        except ValueError as e:
+            print(e)
+            return
+
+        print(f"\n{args[0]} 时的任务 ({len(tasks)} 个):")
+        print("-" * 80)
+        for task in tasks:
+            print(task)
+        print("-" * 80)
+
     def run(self) -> None:
         """运行任务管理器界面"""
         print("=" * 50)
@@ -576,6 +2969,14 @@ class TaskManagerUI:
         print("输入 'quit' 或 'exit' 退出")
         print()
 
+        try:
+            self._command_loop()
+        finally:
+            # 无论正常退出、Ctrl+C 还是输入结束，都先写入延迟写入的修改
+            self.manager.flush()
+
+    def _command_loop(self) -> None:
+        """读取并执行命令，直到用户退出"""
         while True:
             try:
                 user_input = input("任务管理器> ").strip()
@@ -587,30 +2988,15 @@ class TaskManagerUI:
                 command = parts[0].lower()
                 args = parts[1:]
 
-                if command == 'help':
-                    self.show_help()
-                elif command in ['quit', 'exit']:
+                if command in ['quit', 'exit']:
                     print("感谢使用任务管理器！再见！")
                     break
-                elif command == 'add':
-                    self.add_task_interactive(args)
-                elif command == 'list':
-                    self.list_tasks_interactive(args)
-                elif command == 'show':
-                    self.show_task_detail(args)
-                elif command == 'update':
-                    self.update_task_interactive(args)
-                elif command == 'delete':
-                    self.delete_task_interactive(args)
-                elif command == 'search':
-                    self.search_tasks_interactive(args)
-                elif command == 'stats':
-                    self.show_statistics()
-                elif command == 'upcoming':
-                    self.show_upcoming_tasks(args)
-                else:
+                handler = self.commands.get(command)
+                if handler is None:
                     print(f"未知命令: {command}")
                     print("输入 'help' 查看可用命令")
+                else:
+                    handler(args)
 
             except KeyboardInterrupt:
                 print("\n\n感谢使用任务管理器！再见！")
@@ -621,12 +3007,283 @@ class TaskManagerUI:
             except Exception as e:
                 print(f"命令执行出错: {e}")
 
+    # ----- 批处理模式 -----
+
+    def run_batch(self, lines: Iterable[str]) -> Dict[str, Any]:
+        """
+        非交互地执行命令脚本（每行一条命令），结束时报告吞吐量并返回统计
+
+        连续的修改命令合并在一个批量修改中，只持久化一次；遇到查询命令时
+        先保存之前的修改再照常输出查询结果。某条命令失败只报告行号，
+        不影响其他命令。遇到 quit/exit 提前结束。
+        """
+        stats = Counter()
+        start = time.perf_counter()
+        self.batch_mode = True
+        try:
+            commands = self._parse_script(lines)
+            for mutating, group in groupby(commands, key=lambda item: item[1] in
+                                           self.MUTATING_COMMANDS):
+                if mutating:
+                    with self.manager.batch():
+                        for item in group:
+                            self._run_script_command(*item, stats)
+                else:
+                    for item in group:
+                        self._run_script_command(*item, stats)
+        finally:
+            self.batch_mode = False
+            self.manager.flush()
+        elapsed = time.perf_counter() - start
+        print(f"批处理完成: 执行 {stats['commands']} 条命令"
+              f"（修改 {stats['mutations']} 条，失败 {stats['failed']} 条），"
+              f"耗时 {elapsed:.2f} 秒（{stats['commands'] / max(elapsed, 1e-9):,.0f} 条/秒）")
+        return {'commands': stats['commands'], 'mutations': stats['mutations'],
+                'failed': stats['failed'], 'elapsed': elapsed}
+
+    def _parse_script(self, lines: Iterable[str]) -> Iterator[Tuple[int, Optional[str], List[str]]]:
+        """逐行解析脚本，产出 (行号, 命令, 参数)；无法解析的行命令为None，参数为错误信息"""
+        quoted, simple, tokens = (self._SHELL_SYNTAX.search, self._QUOTED_LINE.fullmatch,
+                                  self._QUOTED_TOKEN.findall)
+        for lineno, line in enumerate(lines, 1):
+            # shlex 逐字符解析，比正则慢一个数量级，只用于少数复杂的行
+            if not quoted(line):
+                parts = line.split()
+            elif simple(line):
+                parts = [a or b or c for a, b, c in tokens(line)]
+            else:
+                try:
+                    parts = shlex.split(line, comments=True)
+                except ValueError as e:
+                    yield lineno, None, [str(e)]
+                    continue
+            if not parts:
+                continue
+            command = parts[0].lower()
+            if command in ('quit', 'exit'):
+                return
+            yield lineno, command, parts[1:]
+
+    def _run_script_command(self, lineno: int, command: Optional[str], args: List[str],
+                            stats: Counter) -> None:
+        """执行脚本中的一条命令，失败时输出行号和原因"""
+        stats['commands'] += 1
+        try:
+            if command is None:
+                raise ValueError(args[0])
+            handler = self.script_commands.get(command) or self.commands.get(command)
+            if handler is None:
+                raise ValueError(f"未知命令: {command}")
+            handler(args)
+            if command in self.script_commands:
+                stats['mutations'] += 1
+        except Exception as e:
+            stats['failed'] += 1
+            print(f"第{lineno}行{' ' + command if command else ''}: {e}")
+
+    def _script_add(self, args: List[str]) -> None:
+        if not args or not args[0]:
+            raise ValueError("任务标题不能为空")
+        item = dict(zip(('title', 'description', 'priority', 'category', 'due_date'), args))
+        item['recurrence'] = ' '.join(args[5:]) or None
+        self.manager.add_tasks([item])
+
+    def _script_update(self, args: List[str]) -> None:
+        if len(args) < 3:
+            raise ValueError("用法: update <任务ID> <属性> <值>")
+        if args[1] not in self.UPDATE_ATTRIBUTES:
+            raise ValueError(f"无效的属性: {args[1]}")
+        value = ' '.join(args[2:])
+        if args[1] == 'depends_on' and value == '-':
+            value = ''
+        self.manager.update_tasks({args[0]: {args[1]: value}})
+
+    def _script_delete(self, args: List[str]) -> None:
+        if not args:
+            raise ValueError("请提供任务ID")
+        self.manager.delete_tasks(args)
+
 # ===== 主程序 =====
 
+def _number_option(option: str, positive: bool = False) -> Optional[float]:
+    """解析 --名称=数值 形式的选项，数值无效时打印原因并返回None"""
+    name, _, value = option.partition('=')
+    try:
+        number = float(value)
+    except ValueError:
+        number = None
+    # 取反的比较同时排除了NaN
+    if number is None or not 0 <= number < float('inf') or (positive and number == 0):
+        print(f"无效的{name}参数: {value}，应为{'正数' if positive else '非负数'}")
+        return None
+    return number
+
+def _open_manager(options: List[str]) -> Optional[TaskManager]:
+    """
+    按命令行选项打开任务管理器，选项无效时打印原因并返回None
+
+    --journal 启用追加式日志持久化，--sqlite 使用SQLite数据库 tasks.db，
+    --search-index 维护全文搜索索引，--fsync=always|interval|never 指定落盘策略，
+    --write-behind[=秒] 在后台线程中合并写入，--binary 使用二进制快照 tasks.bin，
+    --shared 允许多个进程同时使用同一个任务文件，--history 记录修改历史
+    """
+    fsync = "interval"
+    write_behind = None
+    for option in options:
+        if option.startswith('--fsync='):
+            fsync = option.split('=', 1)[1]
+        elif option == '--write-behind':
+            write_behind = 1.0
+        elif option.startswith('--write-behind='):
+            write_behind = _number_option(option, positive=True)
+            if write_behind is None:
+                return None
+    if fsync not in FsyncPolicy.MODES:
+        print(f"无效的fsync策略: {fsync}，可用: {', '.join(FsyncPolicy.MODES)}")
+        return None
+    history = '--history' in options
+    if '--sqlite' in options:
+        return SQLiteTaskManager(fsync=fsync, history=history)
+    binary = '--binary' in options
+    try:
+        return TaskManager("tasks.bin" if binary else "tasks.json",
+                           snapshot_format="binary" if binary else "json",
+                           journal='--journal' in options,
+                           search_index='--search-index' in options, fsync=fsync,
+                           write_behind=write_behind, shared='--shared' in options,
+                           lazy=True, history=history)
+    except ValueError as e:
+        print(f"无效的存储选项: {e}")
+        return None
+
+def _run_script(script: str, options: List[str]) -> None:
+    """以批处理模式执行命令脚本文件（- 表示标准输入）"""
+    if script == '-':
+        # 标准输入不是这里打开的，不能关闭
+        _run_batch(sys.stdin, options)
+        return
+    try:
+        lines = open(script, encoding='utf-8')
+    except IOError as e:
+        print(f"无法读取脚本: {e}")
+        return
+    with lines:
+        _run_batch(lines, options)
+
+def _run_batch(lines: Iterable[str], options: List[str]) -> None:
+    """按命令行选项打开任务管理器，执行脚本各行后关闭"""
+    manager = _open_manager(options)
+    if manager is None:
+        return
+    try:
+        TaskManagerUI(manager).run_batch(lines)
+    finally:
+        manager.close()
+
 def main():
     """主程序入口"""
-    ui = TaskManagerUI()
-    ui.run()
+    # python task_manager.py convert <源文件> <目标文件> 在JSON与二进制快照之间转换
+    if len(sys.argv) > 1 and sys.argv[1] == 'convert':
+        if len(sys.argv) != 4:
+            print("用法: python task_manager.py convert <源文件> <目标文件>")
+            return
+        try:
+            count = convert_snapshot(sys.argv[2], sys.argv[3])
+        except (ValueError, KeyError, TypeError, struct.error, IOError) as e:
+            print(f"转换失败: {e}")
+            sys.exit(1)
+        print(f"已转换 {count} 个任务: {sys.argv[2]} -> {sys.argv[3]}")
+        return
+
+    # python task_manager.py migrate <任务文件> 把旧的JSON数组文件迁移为 JSON Lines（原文件保留为 .bak）
+    if len(sys.argv) > 1 and sys.argv[1] == 'migrate':
+        if len(sys.argv) != 3:
+            print("用法: python task_manager.py migrate <任务文件>")
+            return
+        try:
+            if migrate_to_json_lines(sys.argv[2]):
+                print(f"已将 {sys.argv[2]} 迁移为 JSON Lines 格式，原文件保存在 {sys.argv[2]}.bak")
+            else:
+                print(f"{sys.argv[2]} 不是旧的JSON数组文件，无需迁移")
+        except (ValueError, IOError) as e:
+            print(f"迁移失败: {e}")
+        return
+
+    # python task_manager.py columnar <任务文件> <快照文件> 生成供报表使用的只读列式快照
+    if len(sys.argv) > 1 and sys.argv[1] == 'columnar':
+        if len(sys.argv) != 4:
+            print("用法: python task_manager.py columnar <任务文件> <快照文件>")
+            return
+        try:
+            count = ColumnarTaskStore.write(sys.argv[3], load_snapshot(sys.argv[2]))
+        except (ValueError, KeyError, TypeError, struct.error, IOError) as e:
+            print(f"生成列式快照失败: {e}")
+            sys.exit(1)
+        print(f"已写入 {count} 个任务的列式快照: {sys.argv[3]}")
+        return
+
+    # python task_manager.py import|export <文件> [存储选项] 导入导出CSV或JSON Lines
+    if len(sys.argv) > 1 and sys.argv[1] in ('import', 'export'):
+        command = sys.argv[1]
+        paths = [arg for arg in sys.argv[2:] if not arg.startswith('--')]
+        if len(paths) != 1:
+            print(f"用法: python task_manager.py {command} <文件.csv|文件.jsonl> [存储选项]")
+            return
+        manager = _open_manager(sys.argv[2:])
+        if manager is None:
+            return
+        action = "导入" if command == 'import' else "导出"
+        try:
+            start = time.perf_counter()
+            if command == 'import':
+                count = manager.import_tasks(paths[0])
+            else:
+                count = manager.export_tasks(paths[0])
+            elapsed = time.perf_counter() - start
+            print(f"已{action} {count} 个任务，耗时 {elapsed:.2f} 秒"
+                  f"（{count / max(elapsed, 1e-9):,.0f} 个/秒）")
+        except (ValueError, IOError, csv.Error) as e:
+            print(f"{action}失败: {e}")
+        finally:
+            manager.close()
+        return
+
+    # --remind[=分钟] 在后台运行到期提醒服务（可提前若干分钟提醒）
+    # --batch 文件|- 非交互地执行命令脚本（- 表示从标准输入读取）
+    options = sys.argv[1:]
+    remind = None
+    script = None
+    for i, option in enumerate(options):
+        if option == '--remind':
+            remind = 0.0
+        elif option.startswith('--remind='):
+            remind = _number_option(option)
+            if remind is None:
+                return
+        elif option == '--batch':
+            if i + 1 == len(options):
+                print("用法: python task_manager.py --batch <脚本文件|-> [存储选项]")
+                return
+            script = options[i + 1]
+        elif option.startswith('--batch='):
+            script = option.split('=', 1)[1]
+    if script is not None:
+        _run_script(script, options)
+        return
+    manager = _open_manager(options)
+    if manager is None:
+        return
+    scheduler = None
+    if remind is not None:
+        scheduler = ReminderScheduler(manager, lead=timedelta(minutes=remind))
+        scheduler.start()
+    ui = TaskManagerUI(manager)
+    try:
+        ui.run()
+    finally:
+        if scheduler is not None:
+            scheduler.stop()
+        manager.close()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,524 @@
+# Python学习项目 - 实际项目：任务管理器的数据模型
+# 供 task_manager.py 及其存储模块共用的任务、状态、优先级和重复规则
+# 本模块展示如何用 __slots__ 和整数时间戳压缩大量小对象的内存
+
+"""
+任务数据模型:
+1. 任务状态和优先级枚举
+2. Task：以本地时间微秒数保存日期，导出格式与JSON文件一致
+3. 重复规则：每天/每周/cron，按时间顺序展开到期的各次出现
+"""
+
+import bisect
+import calendar
+import heapq
+import re
+import sys
+from datetime import date, datetime, timedelta
+from typing import List, Dict, Optional, Any, Iterable, Tuple
+from enum import Enum
+from functools import lru_cache
+from itertools import islice
+import uuid
+
+# ===== 数据模型 =====
+
+class TaskStatus(Enum):
+    """任务状态枚举"""
+    TODO = "待办"
+    IN_PROGRESS = "进行中"
+    DONE = "完成"
+    CANCELLED = "已取消"
+
+class TaskPriority(Enum):
+    """任务优先级枚举"""
+    LOW = "低"
+    MEDIUM = "中"
+    HIGH = "高"
+    URGENT = "紧急"
+
+# 时间戳统一保存为"朴素纪元"以来的微秒整数：把不带时区的datetime
+# 按字面值换算，往返转换精确且不受本地时区和夏令时影响
+_EPOCH = datetime(1970, 1, 1)
+
+def _datetime_to_micros(value: datetime) -> int:
+    """datetime -> 微秒整数"""
+    delta = value - _EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1_000_000 + delta.microseconds
+
+def _micros_to_datetime(value: int) -> datetime:
+    """微秒整数 -> datetime"""
+    return _EPOCH + timedelta(microseconds=value)
+
+def _local_micros(value) -> Optional[int]:
+    """时间戳槽位的值 -> 微秒整数，带时区的时间换算为本地时间，供比较使用"""
+    if isinstance(value, datetime):
+        value = _datetime_to_micros(value.astimezone().replace(tzinfo=None))
+    return value
+
+def _stamp_isoformat(value) -> Optional[str]:
+    """时间戳槽位的值（微秒整数、datetime或None） -> ISO字符串"""
+    if value is None:
+        return None
+    if isinstance(value, int):
+        value = _EPOCH + timedelta(microseconds=value)
+    return value.isoformat()
+
+def parse_dependencies(value) -> Tuple[str, ...]:
+    """依赖的任务ID：接受ID序列或以逗号、空白分隔的字符串，去掉重复并保持顺序"""
+    if not value:
+        return ()
+    if isinstance(value, str):
+        value = re.split(r'[\s,]+', value.strip())
+    return tuple(dict.fromkeys(task_id for task_id in value if task_id))
+
+def _parse_stamp(value: Optional[str]):
+    """ISO字符串 -> 微秒整数（带时区的时间保留为datetime），空值返回None"""
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value)
+    return parsed if parsed.tzinfo else _datetime_to_micros(parsed)
+
+class _Timestamp:
+    """
+    Task的时间戳属性描述符
+
+    底层槽位保存微秒整数，读取属性时才构造datetime。带时区的时间
+    无法换算为朴素纪元，按原样保存datetime。
+    """
+
+    def __set_name__(self, owner, name):
+        self.slot = '_' + name
+
+    def __get__(self, task, owner=None):
+        if task is None:
+            return self
+        value = getattr(task, self.slot)
+        if value is None or isinstance(value, datetime):
+            return value
+        return _micros_to_datetime(value)
+
+    def __set__(self, task, value):
+        if isinstance(value, datetime) and value.tzinfo is None:
+            value = _datetime_to_micros(value)
+        setattr(task, self.slot, None if value == '' else value)
+
+    def isoformat(self, task) -> Optional[str]:
+        return _stamp_isoformat(getattr(task, self.slot))
+
+class Task:
+    """
+    任务类
+
+    使用 __slots__ 去掉每个实例的 __dict__；时间戳以微秒整数保存，
+    访问 due_date 等属性时才构造 datetime 对象。
+
+    设置了重复规则（recurrence）的任务，due_date 是当前这一次的截止日期，
+    以后各次由规则推算，不另外保存。
+    depends_on 是它依赖的任务ID元组，这些任务全部完成后它才可以开始。
+    重复任务永远不会停留在完成状态，因此不能被其他任务依赖。
+    claimed_by 和 lease_until 记录通过工作队列领取任务的工作者及其租约到期时间，
+    只在进行中时有效，状态改变时一并清除。
+    """
+
+    __slots__ = ('id', 'title', 'description', 'priority', 'category', 'status',
+                 '_due_date', '_created_at', '_updated_at', '_completed_at', 'recurrence',
+                 'depends_on', 'claimed_by', '_lease_until')
+
+    due_date = _Timestamp()
+    created_at = _Timestamp()
+    updated_at = _Timestamp()
+    completed_at = _Timestamp()
+    lease_until = _Timestamp()
+
+    def __init__(self, title: str, description: str = "",
+                 priority: TaskPriority = TaskPriority.MEDIUM,
+                 category: str = "默认",
+                 due_date: Optional[datetime] = None):
+        self.id = str(uuid.uuid4())[:8]  # 简短的UUID
+        self.title = title
+        self.description = description
+        self.priority = priority
+        self.category = category
+        self.status = TaskStatus.TODO
+        self.due_date = due_date
+        now = datetime.now()
+        self.created_at = now
+        self.updated_at = now
+        self.completed_at = None
+        self.recurrence = None
+        self.depends_on: Tuple[str, ...] = ()
+        self.claimed_by: Optional[str] = None
+        self.lease_until = None
+
+    @property
+    def due_stamp(self) -> Optional[int]:
+        """截止日期的微秒整数，供索引比较使用，不构造datetime"""
+        return _local_micros(self._due_date)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为字典格式（用于JSON序列化）"""
+        created = _stamp_isoformat(self._created_at)
+        # 创建后未修改过的任务两个时间相同，只需格式化一次
+        updated = (created if self._updated_at == self._created_at
+                   else _stamp_isoformat(self._updated_at))
+        data = {
+            'id': self.id,
+            'title': self.title,
+            'description': self.description,
+            'priority': self.priority.value,
+            'category': self.category,
+            'status': self.status.value,
+            'due_date': _stamp_isoformat(self._due_date),
+            'created_at': created,
+            'updated_at': updated,
+            'completed_at': _stamp_isoformat(self._completed_at),
+        }
+        # 没有重复规则、依赖或领取者时不写入这些键，普通任务的数据格式保持不变
+        if self.recurrence:
+            data['recurrence'] = self.recurrence
+        if self.depends_on:
+            data['depends_on'] = list(self.depends_on)
+        if self.claimed_by:
+            data['claimed_by'] = self.claimed_by
+            data['lease_until'] = _stamp_isoformat(self._lease_until)
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'Task':
+        """从字典创建任务实例（时间戳直接换算为微秒整数，不保留datetime）"""
+        # 绕过 __init__，避免为每个任务生成UUID和当前时间
+        task = cls.__new__(cls)
+        task.id = data['id']
+        task.title = data['title']
+        task.description = data.get('description', '')
+        task.priority = TaskPriority(data.get('priority', '中'))
+        # 分类取值很少，驻留后所有任务共享同一个字符串对象
+        task.category = sys.intern(data.get('category', '默认'))
+        task.status = TaskStatus(data.get('status', '待办'))
+        task._due_date = _parse_stamp(data.get('due_date'))
+        task._completed_at = _parse_stamp(data.get('completed_at'))
+        task._created_at = _parse_stamp(data.get('created_at'))
+        task._updated_at = _parse_stamp(data.get('updated_at'))
+        task.recurrence = data.get('recurrence') or None
+        dependencies = data.get('depends_on')
+        task.depends_on = parse_dependencies(dependencies) if dependencies else ()
+        task.claimed_by = data.get('claimed_by') or None
+        task._lease_until = _parse_stamp(data.get('lease_until'))
+        if task._created_at is None or task._updated_at is None:
+            now = _datetime_to_micros(datetime.now())
+            if task._created_at is None:
+                task._created_at = now
+            if task._updated_at is None:
+                task._updated_at = now
+        return task
+
+    def update(self, **kwargs) -> None:
+        """更新任务属性（id 是索引的键，下划线开头的是内部槽位，都不能修改）"""
+        for key in kwargs:
+            if key == 'id' or key.startswith('_'):
+                raise ValueError(f"不能修改的字段: {key}")
+        for key, value in kwargs.items():
+            if hasattr(self, key):
+                if key == 'priority':
+                    value = TaskPriority(value)
+                elif key == 'status':
+                    value = TaskStatus(value)
+                elif key == 'due_date' and value:
+                    value = datetime.fromisoformat(value)
+                elif key == 'recurrence':
+                    self.set_recurrence(value)
+                    continue
+                elif key == 'depends_on':
+                    value = parse_dependencies(value)
+                setattr(self, key, value)
+
+        self.updated_at = datetime.now()
+
+        # 如果状态变为完成，设置完成时间
+        if kwargs.get('status') == TaskStatus.DONE and not self.completed_at:
+            self.completed_at = datetime.now()
+
+        # 领取只在进行中时有效：完成、放回待办或取消后不再属于任何工作者
+        if self.claimed_by is not None and self.status is not TaskStatus.IN_PROGRESS:
+            self.claimed_by = None
+            self.lease_until = None
+
+        if self.recurrence and self.status is TaskStatus.DONE:
+            self._complete_occurrence()
+
+    def set_recurrence(self, rule: Optional[str]) -> None:
+        """
+        设置重复规则（空值表示取消重复），无效的规则抛出ValueError
+
+        截止日期调整到规则的下一次发生（不早于原截止日期）；
+        任务还没有截止日期时，以规则从现在起的第一次发生作为截止日期。
+        """
+        if not rule:
+            self.recurrence = None
+            return
+        recurrence = parse_recurrence(rule)
+        self.recurrence = recurrence.text
+        due = self.due_stamp
+        if due is None:
+            due = _datetime_to_micros(datetime.now())
+        self._due_date = recurrence.next_at_or_after(due, due)
+
+    def _complete_occurrence(self) -> None:
+        """
+        完成重复任务的当前这一次：截止日期推进到下一次，状态回到待办
+
+        已经错过的各次不再补做，下一次不早于现在。
+        要彻底结束重复任务，先清空 recurrence 或把状态改为已取消。
+        """
+        now = _datetime_to_micros(datetime.now())
+        due = self.due_stamp if self.due_stamp is not None else now
+        self._due_date = parse_recurrence(self.recurrence).next_at_or_after(
+            due, max(due + 1, now))
+        self.status = TaskStatus.TODO
+        self.completed_at = datetime.now()
+
+    def is_overdue(self, now: Optional[datetime] = None) -> bool:
+        """检查任务是否过期（批量判断时可传入同一个now）"""
+        if self.due_date and self.status != TaskStatus.DONE:
+            return (now or datetime.now()) > self.due_date
+        return False
+
+    def days_until_due(self) -> Optional[int]:
+        """计算距离截止日期的天数"""
+        if not self.due_date:
+            return None
+        delta = self.due_date - datetime.now()
+        return delta.days
+
+    def __str__(self) -> str:
+        """字符串表示"""
+        status_icon = {
+            TaskStatus.TODO: "⏳",
+            TaskStatus.IN_PROGRESS: "🔄",
+            TaskStatus.DONE: "✅",
+            TaskStatus.CANCELLED: "❌"
+        }
+
+        priority_color = {
+            TaskPriority.LOW: "🟢",
+            TaskPriority.MEDIUM: "🟡",
+            TaskPriority.HIGH: "🟠",
+            TaskPriority.URGENT: "🔴"
+        }
+
+        due_info = ""
+        if self.due_date:
+            days = self.days_until_due()
+            if days is not None:
+                if days < 0:
+                    due_info = f" 过期{-days}天"
+                elif days == 0:
+                    due_info = " 今天截止"
+                else:
+                    due_info = f" {days}天后截止"
+
+        if self.recurrence:
+            due_info += f" 🔁{self.recurrence}"
+        if self.depends_on:
+            due_info += f" ⛓{len(self.depends_on)}"
+
+        return (f"{status_icon[self.status]} {priority_color[self.priority]} "
+                f"[{self.id}] {self.title} ({self.category}){due_info}")
+
+# ===== 重复规则 =====
+
+_MINUTE = 60 * 1_000_000
+_DAY = 1440 * _MINUTE
+_EPOCH_ORDINAL = _EPOCH.toordinal()
+
+class Recurrence:
+    """
+    重复规则
+
+    支持两类写法:
+        固定间隔  daily / weekly / hourly / 每天 / 每周 / 每小时 /
+                  every N minutes|hours|days|weeks，从任务的截止日期起算
+        cron表达式 "分 时 日 月 周"，例如 "0 9 * * 1-5" 表示工作日9点；
+                  字段支持 * 、数字、a-b 区间、/步长和逗号列表，周日为0或7，
+                  日和周字段都不以 * 开头时满足其一即可，否则两者都要满足
+                  （与cron相同，*/2 这样带步长的字段照常按取值过滤）
+    时间统一为朴素纪元以来的微秒整数（见 _datetime_to_micros）。
+    """
+
+    ALIASES = {'hourly': 'every 1 hours', 'daily': 'every 1 days', 'weekly': 'every 1 weeks',
+               '每小时': 'every 1 hours', '每天': 'every 1 days', '每周': 'every 1 weeks'}
+    UNITS = {'minute': _MINUTE, 'hour': 60 * _MINUTE, 'day': _DAY, 'week': 7 * _DAY}
+    _INTERVAL = re.compile(r'every\s+(\d+)\s+(minute|hour|day|week)s?')
+    # cron各字段的取值范围
+    _FIELDS = (('分', 0, 59), ('时', 0, 23), ('日', 1, 31), ('月', 1, 12), ('周', 0, 7))
+    # 各月最多的天数（2月按闰年计）
+    _MONTH_DAYS = (31, 29, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
+
+    def __init__(self, text: str):
+        self.text = text
+        self.step = None
+        rule = self.ALIASES.get(text.lower(), text.lower())
+        match = self._INTERVAL.fullmatch(rule)
+        if match:
+            self.step = int(match.group(1)) * self.UNITS[match.group(2)]
+            if self.step <= 0:
+                raise ValueError(f"无效的重复规则: {text}（间隔必须大于0）")
+            return
+
+        fields = rule.split()
+        if len(fields) != len(self._FIELDS):
+            raise ValueError(f"无效的重复规则: {text}")
+        minutes, hours, days, months, weekdays = (
+            self._parse_field(field, *spec) for field, spec in zip(fields, self._FIELDS))
+        self.minutes, self.hours = minutes, hours
+        self.day_list, self.months = days, set(months)
+        self.weekdays = weekdays = {day % 7 for day in weekdays}
+        # 从周几（周日为0）到下一个匹配的周几相隔的天数
+        self._weekday_gap = [min((target - weekday) % 7 for target in weekdays)
+                             for weekday in range(7)]
+        # 是否为“日或周满足其一”；以 * 开头只决定这一点，不代表不限制取值
+        self.day_or_weekday = not (fields[2].startswith('*') or fields[4].startswith('*'))
+        self._every_day = len(days) == 31 and len(weekdays) == 7
+        if not self.day_or_weekday and not any(day <= self._MONTH_DAYS[month - 1]
+                                               for day in days for month in months):
+            raise ValueError(f"无效的重复规则: {text}（日期永远不会出现）")
+
+    @classmethod
+    def _parse_field(cls, field: str, name: str, low: int, high: int) -> List[int]:
+        """解析cron的一个字段，返回排好序的取值列表"""
+        values = set()
+        for part in field.split(','):
+            base, _, step = part.partition('/')
+            try:
+                step = int(step) if step else 1
+                if base == '*':
+                    start, end = low, high
+                elif '-' in base:
+                    start, end = (int(value) for value in base.split('-', 1))
+                else:
+                    start = int(base)
+                    end = high if step > 1 else start
+            except ValueError:
+                raise ValueError(f"无效的{name}字段: {field}") from None
+            if step < 1 or not low <= start <= end <= high:
+                raise ValueError(f"无效的{name}字段: {field}（范围 {low}-{high}）")
+            values.update(range(start, end + 1, step))
+        return sorted(values)
+
+    def next_at_or_after(self, anchor: int, stamp: int) -> int:
+        """不早于anchor（规则的起点）和stamp的第一次发生时间"""
+        if self.step is not None:
+            if stamp <= anchor:
+                return anchor
+            return anchor + -(-(stamp - anchor) // self.step) * self.step
+        return self._next_cron(max(anchor, stamp))
+
+    def _next_day(self, day: date) -> date:
+        """不早于day的第一个日、月、周都匹配的日期"""
+        if self._every_day and day.month in self.months:
+            return day
+        while True:
+            if day.month in self.months:
+                found = None
+                last = calendar.monthrange(day.year, day.month)[1]
+                i = bisect.bisect_left(self.day_list, day.day)
+                if self.day_or_weekday:
+                    if i < len(self.day_list) and self.day_list[i] <= last:
+                        found = day.replace(day=self.day_list[i])
+                    candidate = day + timedelta(days=self._weekday_gap[(day.weekday() + 1) % 7])
+                    if candidate.month == day.month and (found is None or candidate < found):
+                        found = candidate
+                else:
+                    # 本月1日是周几（周日为0），据此推算其余日期是周几
+                    first_weekday = (day.weekday() - day.day + 2) % 7
+                    for value in islice(self.day_list, i, None):
+                        if value > last:
+                            break
+                        if (first_weekday + value - 1) % 7 in self.weekdays:
+                            found = day.replace(day=value)
+                            break
+                if found is not None:
+                    return found
+            # 本月没有匹配的日期，从下个月1日继续
+            day = (day.replace(day=1) + timedelta(days=32)).replace(day=1)
+
+    def _time_at_or_after(self, hour: int, minute: int) -> Optional[Tuple[int, int]]:
+        """当天不早于 hour:minute 的第一个匹配时刻"""
+        hours, minutes = self.hours, self.minutes
+        i = bisect.bisect_left(hours, hour)
+        if i < len(hours) and hours[i] == hour:
+            j = bisect.bisect_left(minutes, minute)
+            if j < len(minutes):
+                return hour, minutes[j]
+            i += 1
+        return (hours[i], minutes[0]) if i < len(hours) else None
+
+    def _next_cron(self, stamp: int) -> int:
+        # 向上取整到整分钟，再拆成日期和当天的分钟数，避免构造datetime
+        stamp = -(-stamp // _MINUTE) * _MINUTE
+        days, rest = divmod(stamp, _DAY)
+        first = date.fromordinal(days + _EPOCH_ORDINAL)
+        day = first
+        while True:
+            day = self._next_day(day)
+            moment = (self._time_at_or_after(*divmod(rest // _MINUTE, 60)) if day == first
+                      else (self.hours[0], self.minutes[0]))
+            if moment is not None:
+                return ((day.toordinal() - _EPOCH_ORDINAL) * _DAY
+                        + (moment[0] * 60 + moment[1]) * _MINUTE)
+            day += timedelta(days=1)
+
+@lru_cache(maxsize=1024)
+def parse_recurrence(text: str) -> Recurrence:
+    """解析重复规则（按文本缓存，同一规则的任务共享一个对象），无效时抛出ValueError"""
+    return Recurrence(text.strip())
+
+class TaskOccurrence:
+    """
+    重复任务的某一次发生
+
+    只记录原任务和这一次的截止日期，其余属性都取自原任务，
+    不会为每次发生复制出新的任务。
+    """
+
+    __slots__ = ('task', '_due_date')
+
+    def __init__(self, task: Task, due: int):
+        self.task = task
+        self._due_date = due
+
+    def __getattr__(self, name):
+        return getattr(self.task, name)
+
+    due_date = Task.due_date
+    due_stamp = Task.due_stamp
+    to_dict = Task.to_dict
+    is_overdue = Task.is_overdue
+    days_until_due = Task.days_until_due
+    __str__ = Task.__str__
+
+def _expand_occurrences(firsts: Iterable[Tuple[int, int, Task]],
+                        end: int) -> List[Tuple[int, int, TaskOccurrence]]:
+    """
+    从每个重复任务的第一次发生 (微秒, 序号, 任务) 出发，
+    按时间顺序展开到end为止的所有发生，返回 (微秒, 序号, 发生) 列表
+
+    小顶堆里每个任务只有一个条目：弹出最早的一次，再压入它的下一次，
+    代价为 O(k log n)，k为展开出的发生次数，n为参与的任务数。
+    """
+    # 条目带上规则和起点，展开时不必重复查找；序号唯一，比较不会走到后面几项
+    heap = [(stamp, seq, task, parse_recurrence(task.recurrence).next_at_or_after,
+             task.due_stamp) for stamp, seq, task in firsts if stamp <= end]
+    heapq.heapify(heap)
+    occurrences = []
+    append, heapreplace, heappop = occurrences.append, heapq.heapreplace, heapq.heappop
+    while heap:
+        stamp, seq, task, next_at_or_after, anchor = entry = heap[0]
+        append((stamp, seq, TaskOccurrence(task, stamp)))
+        following = next_at_or_after(anchor, stamp + 1)
+        if following <= end:
+            heapreplace(heap, (following,) + entry[1:])
+        else:
+            heappop(heap)
+    return occurrences
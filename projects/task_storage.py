@@ -0,0 +1,995 @@
+# Python学习项目 - 实际项目：任务管理器的存储后端
+# 供 task_manager.py 使用的各种存储格式，文件读写的通用工具在 persistence.py
+# 本模块展示同一个接口下的多种持久化策略及其取舍
+
+"""
+存储后端:
+1. JSON Lines 快照和紧凑的二进制快照，快照中的摘要块支持不加载就统计
+2. 追加式日志，后台压缩为快照
+3. 延迟写入包装器，把一段时间内的修改合并后写入
+4. SQLite 数据库，提供索引查询
+"""
+
+import bisect
+import contextlib
+import gc
+import json
+import os
+import sqlite3
+import struct
+import sys
+import threading
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import List, Dict, Optional, Any, Iterable, Iterator, Tuple
+from itertools import chain
+
+from persistence import FsyncPolicy, atomic_open, iter_json_records, write_json_lines
+from task_models import (Task, TaskPriority, TaskStatus, _DAY, _datetime_to_micros,
+                         _local_micros, _micros_to_datetime)
+
+# ===== 存储后端 =====
+
+class TaskStorage:
+    """
+    任务存储后端接口
+
+    load/save 负责整体读写，record 负责持久化单次修改，
+    record_many 负责批量修改结束时的一次性持久化。
+    默认实现直接整体重写，支持增量写入的后端应当覆盖它们。
+
+    transactional 为True的后端支持事务：批量修改期间每次修改
+    立即通过 record 写入但不提交，结束时 commit 或 rollback。
+    """
+
+    transactional = False
+
+    def load(self) -> List[Task]:
+        """读取全部任务"""
+        raise NotImplementedError
+
+    def save(self, tasks: Iterable[Task]) -> None:
+        """整体写入全部任务"""
+        raise NotImplementedError
+
+    def record(self, op: str, task: Task, tasks: Iterable[Task]) -> None:
+        """持久化一次修改（op为'upsert'或'delete'），tasks为修改后的全部任务"""
+        self.save(tasks)
+
+    def record_many(self, changes: Iterable[Tuple[str, Task]],
+                    tasks: Iterable[Task]) -> None:
+        """一次性持久化多次修改（每项为 (op, task)）"""
+        self.save(tasks)
+
+    def begin(self) -> None:
+        """开始事务（仅 transactional 后端）"""
+
+    def commit(self) -> None:
+        """提交事务（仅 transactional 后端）"""
+
+    def rollback(self) -> None:
+        """回滚事务（仅 transactional 后端）"""
+
+    def compact(self, tasks: Iterable[Task], background: bool = True) -> None:
+        """整理存储，默认无需处理"""
+
+    def flush(self) -> None:
+        """把尚未写入的修改落盘（仅延迟写入的后端需要）"""
+
+    def signature(self) -> Any:
+        """标识存储当前版本的值，内容被替换后随之改变；None表示无法判断"""
+        return None
+
+    def summary(self) -> Optional[Dict[str, Any]]:
+        """不加载任务即可读取的摘要（见 store_summary），不支持时返回None"""
+        return None
+
+    def scan_status(self, status: TaskStatus,
+                    start: int = 0) -> Optional[Iterator[Tuple[int, Task]]]:
+        """
+        不加载全部任务，按存储顺序产出指定状态的 (序号, 任务)，从序号start开始
+
+        序号与整体加载后的添加序号一致。不支持时返回None。
+        """
+        return None
+
+    def close(self) -> None:
+        """释放资源"""
+
+class MemoryTaskStorage(TaskStorage):
+    """不落盘的存储，用于临时的管理器和性能基准"""
+
+    def load(self) -> List[Task]:
+        return []
+
+    def save(self, tasks: Iterable[Task]) -> None:
+        pass
+
+@contextlib.contextmanager
+def _gc_paused():
+    """
+    暂停循环垃圾回收
+
+    加载时会连续创建上百万个对象，频繁触发的分代回收要反复扫描它们，
+    而这些对象之间没有循环引用，加载完成前没有回收的必要。
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+# ----- 摘要块 -----
+
+# 任务文件第一行的摘要块 {"_summary": {...}}，记录任务数和各维度的分布
+SUMMARY_KEY = '_summary'
+# 截止时间摘要中精确取值 [微秒, 个数] 和按天计数 [天, 个数] 各自的上限，见 _due_summary
+SUMMARY_MAX_DUE = 4096
+
+def store_summary(tasks: Iterable[Task]) -> Dict[str, Any]:
+    """
+    计算任务文件的摘要块
+
+    分布按首次出现的顺序排列，与整体加载后二级索引的顺序一致；
+    due 是未完成任务截止时间的有界摘要，据此可以算出过期任务数（见 summary_overdue）。
+    """
+    statuses, priorities, categories, dues = Counter(), Counter(), Counter(), Counter()
+    total = 0
+    done = TaskStatus.DONE
+    for task in tasks:
+        total += 1
+        statuses[task.status.value] += 1
+        priorities[task.priority.value] += 1
+        categories[task.category] += 1
+        if task.status is not done:
+            due = task.due_stamp
+            if due is not None:
+                dues[due] += 1
+    return {'total': total, 'status': dict(statuses), 'priority': dict(priorities),
+            'category': dict(categories), 'due': _due_summary(dues)}
+
+def _due_summary(dues: Counter) -> Dict[str, Any]:
+    """
+    截止时间 {微秒: 个数} 的有界摘要
+
+    exact 是 first..last 这些天里的精确取值，其余的天只按天计数：
+    全部取值不超过 SUMMARY_MAX_DUE 个时都记精确值（first、last 为None表示不设界）；
+    否则从今天起逐天加入精确值直到放不下，更早的合计为 before，
+    更晚的按天计数记入 days（最多 SUMMARY_MAX_DUE 天，再往后合计为 rest）。
+    """
+    stamps = sorted(dues.items())
+    if len(stamps) <= SUMMARY_MAX_DUE:
+        return {'first': None, 'last': None, 'before': 0, 'exact': stamps,
+                'days': [], 'rest': 0}
+    first = _datetime_to_micros(datetime.now()) // _DAY
+    start = end = bisect.bisect_left(stamps, (first * _DAY,))
+    last = None
+    while end < len(stamps):
+        day = stamps[end][0] // _DAY
+        stop = bisect.bisect_left(stamps, ((day + 1) * _DAY,), end)
+        if stop - start > SUMMARY_MAX_DUE:
+            last = day - 1
+            break
+        end = stop
+    days = Counter()
+    for stamp, count in stamps[end:]:
+        days[stamp // _DAY] += count
+    days = sorted(days.items())
+    return {'first': first, 'last': last,
+            'before': sum(count for _, count in stamps[:start]),
+            'exact': stamps[start:end], 'days': days[:SUMMARY_MAX_DUE],
+            'rest': sum(count for _, count in days[SUMMARY_MAX_DUE:])}
+
+def summary_overdue(due: Any, now: int) -> Optional[int]:
+    """
+    由摘要块的 due 算出截止时间早于now（本地时间微秒数）的任务数，算不准确时返回None
+
+    now 所在的天有精确取值时总能算出；在精确范围之后的某天，只要那天没有截止的任务，
+    按天计数也能算出。旧文件中 due 是全部取值 [[微秒, 个数], ...]，省略时为None。
+    """
+    if due is None:
+        return None
+    if isinstance(due, list):
+        return sum(count for stamp, count in due if stamp < now)
+    today = now // _DAY
+    first, last = due['first'], due['last']
+    if first is not None and today < first:
+        return None
+    overdue = due['before'] + sum(count for stamp, count in due['exact'] if stamp < now)
+    if last is None or today <= last:
+        return overdue
+    for day, count in due['days']:
+        if day == today:
+            return None  # 这一天只知道总数，不知道各自的时刻
+        if day > today:
+            return overdue
+        overdue += count
+    return None if due['rest'] else overdue
+
+def _iter_task_records(path: str) -> Iterator[Dict[str, Any]]:
+    """逐条读取任务文件中的任务记录，跳过开头的摘要块"""
+    records = iter_json_records(path)
+    first = next(records, None)
+    if first is not None and SUMMARY_KEY not in first:
+        yield first
+    yield from records
+
+class JSONTaskStorage(TaskStorage):
+    """
+    JSON文件存储：每次修改都重写整个文件
+
+    文件为 JSON Lines 格式（每行一个任务），加载时逐行构造Task，
+    峰值内存不会因为先解析出完整的字典列表而翻倍。
+    第一行是摘要块（store_summary），不解析任务就能回答统计查询。
+    旧的JSON数组格式可以直接读取，下一次保存时写成 JSON Lines；
+    也可以用 python task_manager.py migrate 显式迁移（原文件保留为 .bak）。
+    保存时先写临时文件再重命名，fsync 指定落盘策略（always/interval/never）。
+    加载失败的文件不会被覆盖，见 _check_overwrite。
+    """
+
+    def __init__(self, data_file: str = "tasks.json", fsync: str = "interval"):
+        self.data_file = data_file
+        self.fsync = FsyncPolicy.coerce(fsync)
+        self._unreadable = False
+
+    def load(self) -> List[Task]:
+        try:
+            tasks = self._load()
+        except Exception:
+            # 可能只是格式不对（例如把二进制快照当作JSON打开），文件本身完好
+            self._unreadable = os.path.exists(self.data_file)
+            raise
+        self._unreadable = False
+        return tasks
+
+    def _load(self) -> List[Task]:
+        with _gc_paused():
+            return [Task.from_dict(record) for record in _iter_task_records(self.data_file)]
+
+    def _check_overwrite(self) -> None:
+        """加载失败的文件拒绝覆盖，否则下一次保存会用空的任务列表冲掉原数据"""
+        if self._unreadable:
+            raise IOError(f"{self.data_file} 加载失败，为保护原数据拒绝覆盖；"
+                          f"请检查文件格式或存储选项")
+
+    def summary(self) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self.data_file, 'rb') as f:
+                line = f.readline()
+        except FileNotFoundError:
+            return None
+        if not line.startswith(b'{"' + SUMMARY_KEY.encode('ascii') + b'"'):
+            return None  # 旧版本写的文件或JSON数组
+        try:
+            return json.loads(line)[SUMMARY_KEY]
+        except (ValueError, KeyError):
+            return None
+
+    def scan_status(self, status: TaskStatus,
+                    start: int = 0) -> Optional[Iterator[Tuple[int, Task]]]:
+        # 有摘要块说明文件由 _save_snapshot 写出，格式紧凑，可以先按子串筛选
+        if self.summary() is None:
+            return None
+        return self._scan_status(status, start)
+
+    def _scan_status(self, status: TaskStatus, start: int) -> Iterator[Tuple[int, Task]]:
+        """
+        逐行扫描任务文件，只解析含 "status":"<状态>" 的行
+
+        子串查找在C层完成，比 json.loads 快两个数量级；标题等字段里的引号
+        都被转义，不会误中，解析后仍再核对一次状态。
+        """
+        needle = json.dumps({'status': status.value}, ensure_ascii=False,
+                            separators=(',', ':'))[1:-1].encode('utf-8')
+        with open(self.data_file, 'rb') as f:
+            f.readline()  # 摘要块
+            for seq, line in enumerate(f):
+                if seq >= start and needle in line:
+                    record = json.loads(line)
+                    if record['status'] == status.value:
+                        yield seq, Task.from_dict(record)
+
+    def save(self, tasks: Iterable[Task]) -> None:
+        self._save_snapshot(tasks, self.fsync)
+
+    def signature(self) -> Any:
+        # 原子保存每次都换成新文件，inode与修改时间、大小一起相当于版本号，
+        # 即使文件系统的修改时间精度较粗也能发现变化
+        try:
+            stat = os.stat(self.data_file)
+        except FileNotFoundError:
+            return None
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    def _save_snapshot(self, tasks: Iterable[Task], policy) -> None:
+        """原子地把摘要块和全部任务写入 data_file"""
+        self._check_overwrite()
+        tasks = list(tasks)
+        records = (task.to_dict() for task in tasks)
+        write_json_lines(self.data_file, chain([{SUMMARY_KEY: store_summary(tasks)}], records),
+                         policy)
+
+class BinaryTaskStorage(JSONTaskStorage):
+    """
+    二进制快照存储
+
+    文件结构: 魔数（含格式版本） | 分类表 | 任务数 | 任务记录...
+    每条记录是定长头部加三段UTF-8字符串（ID、标题、描述）：优先级和状态
+    编码为小整数，分类写成分类表下标，四个时间戳为int64微秒（None用最小值表示），
+    带时区的时间戳在头部后额外记录UTC偏移秒数，有重复规则的任务在其后
+    记录规则文本，有依赖的任务再记录依赖ID列表，被领取的任务再记录租约到期
+    时间和领取者（均由时区标志字节中的对应位标明）。
+    加载时只需 struct 解包，不再解析JSON和ISO日期字符串。
+    版本2把所有字符串长度扩大为四字节；版本1的文件仍可读取，保存时写成版本2。
+    """
+
+    MAGIC = b'TASKBIN2'
+    _COUNT = struct.Struct('<I')
+    _OFFSET = struct.Struct('<i')
+    # 魔数 -> (字符串长度, 记录头部)
+    # 记录头部: 优先级 状态 时区标志 分类下标 截止 创建 更新 完成 ID长度 标题长度 描述长度
+    _FORMATS = {
+        b'TASKBIN1': (struct.Struct('<H'), struct.Struct('<BBBIqqqqHII')),
+        b'TASKBIN2': (struct.Struct('<I'), struct.Struct('<BBBIqqqqIII')),
+    }
+    _LENGTH, _RECORD = _FORMATS[MAGIC]
+    _NONE = -(1 << 63)
+    _STAMPS = ('_due_date', '_created_at', '_updated_at', '_completed_at')
+    _RECURRING = 1 << len(_STAMPS)  # 标志位：记录后跟着重复规则
+    _DEPENDENT = _RECURRING << 1     # 标志位：记录后跟着依赖ID列表
+    _LEASED = _DEPENDENT << 1        # 标志位：记录后跟着租约到期时间和领取者
+    _STAMP = struct.Struct('<q')
+    _PRIORITY_CODES = {priority: code for code, priority in enumerate(TaskPriority)}
+    _STATUS_CODES = {status: code for code, status in enumerate(TaskStatus)}
+
+    @classmethod
+    def is_binary(cls, path: str) -> bool:
+        """文件是否为二进制任务快照"""
+        with open(path, 'rb') as f:
+            return f.read(len(cls.MAGIC)) in cls._FORMATS
+
+    def summary(self) -> Optional[Dict[str, Any]]:
+        """二进制快照整体加载已经很快，不写摘要块"""
+        return None
+
+    def _load(self) -> List[Task]:
+        if not os.path.exists(self.data_file):
+            return []
+        with open(self.data_file, 'rb') as f:
+            data = f.read()
+        if data[:len(self.MAGIC)] not in self._FORMATS:
+            raise ValueError(f"不是二进制任务快照: {self.data_file}")
+        with _gc_paused():
+            return self._decode(data)
+
+    def _decode(self, data: bytes) -> List[Task]:
+        """解析快照文件的全部内容"""
+        length_field, record = self._FORMATS[data[:len(self.MAGIC)]]
+        pos = len(self.MAGIC)
+        (count,) = self._COUNT.unpack_from(data, pos)
+        pos += self._COUNT.size
+        categories = []
+        for _ in range(count):
+            (length,) = length_field.unpack_from(data, pos)
+            pos += length_field.size
+            categories.append(sys.intern(data[pos:pos + length].decode('utf-8')))
+            pos += length
+
+        (count,) = self._COUNT.unpack_from(data, pos)
+        pos += self._COUNT.size
+        unpack, size = record.unpack_from, record.size
+        priorities, statuses = list(TaskPriority), list(TaskStatus)
+        none = self._NONE
+        new = Task.__new__
+        tasks = []
+        for _ in range(count):
+            (priority, status, flags, category, due, created, updated, completed,
+             id_length, title_length, description_length) = unpack(data, pos)
+            pos += size
+            recurrence = None
+            dependencies = ()
+            claimed_by = lease_until = None
+            if flags:
+                stamps = [due, created, updated, completed]
+                for bit in range(len(stamps)):
+                    if flags & (1 << bit):
+                        (offset,) = self._OFFSET.unpack_from(data, pos)
+                        pos += self._OFFSET.size
+                        stamps[bit] = _micros_to_datetime(stamps[bit]).replace(
+                            tzinfo=timezone(timedelta(seconds=offset)))
+                due, created, updated, completed = stamps
+                if flags & self._RECURRING:
+                    (length,) = length_field.unpack_from(data, pos)
+                    pos += length_field.size
+                    recurrence = data[pos:pos + length].decode('utf-8')
+                    pos += length
+                if flags & self._DEPENDENT:
+                    (dependency_count,) = length_field.unpack_from(data, pos)
+                    pos += length_field.size
+                    ids = []
+                    for _ in range(dependency_count):
+                        (length,) = length_field.unpack_from(data, pos)
+                        pos += length_field.size
+                        ids.append(data[pos:pos + length].decode('utf-8'))
+                        pos += length
+                    dependencies = tuple(ids)
+                if flags & self._LEASED:
+                    (lease_until,) = self._STAMP.unpack_from(data, pos)
+                    pos += self._STAMP.size
+                    if lease_until == none:
+                        lease_until = None
+                    (length,) = length_field.unpack_from(data, pos)
+                    pos += length_field.size
+                    claimed_by = data[pos:pos + length].decode('utf-8')
+                    pos += length
+
+            task = new(Task)
+            end = pos + id_length
+            task.id = data[pos:end].decode('utf-8')
+            pos, end = end, end + title_length
+            task.title = data[pos:end].decode('utf-8')
+            pos, end = end, end + description_length
+            task.description = data[pos:end].decode('utf-8')
+            pos = end
+            task.priority = priorities[priority]
+            task.status = statuses[status]
+            task.category = categories[category]
+            task._due_date = None if due == none else due
+            task._created_at = created
+            task._updated_at = updated
+            task._completed_at = None if completed == none else completed
+            task.recurrence = recurrence
+            task.depends_on = dependencies
+            task.claimed_by = claimed_by
+            task._lease_until = lease_until
+            tasks.append(task)
+        return tasks
+
+    def _save_snapshot(self, tasks: Iterable[Task], policy) -> None:
+        self._check_overwrite()
+        tasks = list(tasks)
+        categories: Dict[str, int] = {}
+        for task in tasks:
+            categories.setdefault(task.category, len(categories))
+
+        pack, pack_offset = self._RECORD.pack, self._OFFSET.pack
+        priority_codes, status_codes = self._PRIORITY_CODES, self._STATUS_CODES
+        with atomic_open(self.data_file, policy, binary=True) as f:
+            write = f.write
+            write(self.MAGIC)
+            write(self._COUNT.pack(len(categories)))
+            for category in categories:
+                encoded = category.encode('utf-8')
+                write(self._LENGTH.pack(len(encoded)))
+                write(encoded)
+
+            write(self._COUNT.pack(len(tasks)))
+            for task in tasks:
+                stamps, flags, offsets = [], 0, b''
+                for bit, slot in enumerate(self._STAMPS):
+                    value = getattr(task, slot)
+                    if value is None:
+                        value = self._NONE
+                    elif isinstance(value, datetime):
+                        flags |= 1 << bit
+                        offsets += pack_offset(int(value.utcoffset().total_seconds()))
+                        value = _datetime_to_micros(value.replace(tzinfo=None))
+                    stamps.append(value)
+                if task.recurrence:
+                    flags |= self._RECURRING
+                    rule = task.recurrence.encode('utf-8')
+                    offsets += self._LENGTH.pack(len(rule)) + rule
+                if task.depends_on:
+                    flags |= self._DEPENDENT
+                    offsets += self._LENGTH.pack(len(task.depends_on))
+                    for dependency in task.depends_on:
+                        encoded = dependency.encode('utf-8')
+                        offsets += self._LENGTH.pack(len(encoded)) + encoded
+                if task.claimed_by:
+                    # 租约到期时间按本地时间保存
+                    flags |= self._LEASED
+                    lease_until = _local_micros(task._lease_until)
+                    worker = task.claimed_by.encode('utf-8')
+                    offsets += (self._STAMP.pack(self._NONE if lease_until is None
+                                                 else lease_until)
+                                + self._LENGTH.pack(len(worker)) + worker)
+                task_id = task.id.encode('utf-8')
+                title = task.title.encode('utf-8')
+                description = task.description.encode('utf-8')
+                write(pack(priority_codes[task.priority], status_codes[task.status], flags,
+                           categories[task.category], *stamps,
+                           len(task_id), len(title), len(description)))
+                write(offsets + task_id + title + description)
+
+def load_snapshot(path: str) -> List[Task]:
+    """读取 JSON Lines、旧的JSON数组或二进制格式的快照，不修改文件"""
+    if BinaryTaskStorage.is_binary(path):
+        return BinaryTaskStorage(path).load()
+    with _gc_paused():
+        return [Task.from_dict(record) for record in _iter_task_records(path)]
+
+def convert_snapshot(source: str, target: str) -> int:
+    """
+    在 JSON Lines 与二进制快照之间转换，目标格式与源格式相反
+
+    源文件不会被修改（旧的JSON数组格式同样可以作为源），返回转换的任务数。
+    """
+    tasks = load_snapshot(source)
+    if BinaryTaskStorage.is_binary(source):
+        JSONTaskStorage(target).save(tasks)
+    else:
+        BinaryTaskStorage(target).save(tasks)
+    return len(tasks)
+
+class JournalTaskStorage(JSONTaskStorage):
+    """
+    追加式日志存储（write-ahead journal）
+
+    每次修改只向 <data_file>.journal 追加一条紧凑记录，
+    累计 compact_every 条后在后台线程把全部任务压缩成快照。
+    加载时读取快照并按顺序重放日志。
+    """
+
+    def __init__(self, data_file: str = "tasks.json", compact_every: int = 1000,
+                 fsync: str = "interval"):
+        super().__init__(data_file, fsync)
+        self.journal_file = data_file + ".journal"
+        # 上次压缩未完成时遗留的日志，必须先于当前日志重放
+        self.pending_file = self.journal_file + ".old"
+        self.compact_every = compact_every
+        self._journal_fh = None
+        self._journal_records = 0
+        self._compactor: Optional[threading.Thread] = None
+
+    def load(self) -> List[Task]:
+        tasks = {task.id: task for task in super().load()}
+        for path in (self.pending_file, self.journal_file):
+            self._journal_records += self._replay(path, tasks)
+        if os.path.exists(self.pending_file):
+            self.compact(tasks.values(), background=False)
+        return list(tasks.values())
+
+    def summary(self) -> Optional[Dict[str, Any]]:
+        # 日志中的修改没有反映在快照的摘要块里
+        for path in (self.pending_file, self.journal_file):
+            if os.path.exists(path) and os.path.getsize(path):
+                return None
+        return super().summary()
+
+    def _replay(self, path: str, tasks: Dict[str, Task]) -> int:
+        """重放日志文件中的记录，返回重放条数"""
+        if not os.path.exists(path):
+            return 0
+
+        count = 0
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    self._apply(json.loads(line), tasks)
+                except (ValueError, KeyError, TypeError, AttributeError):
+                    # 崩溃时最后一行可能只写了一半；缺少字段或取值无效的记录
+                    # 同样视为损坏，跳过后继续重放，不让一条记录毁掉整个加载
+                    print(f"跳过损坏的日志记录: {path}")
+                    continue
+                count += 1
+        return count
+
+    @staticmethod
+    def _apply(record: Dict[str, Any], tasks: Dict[str, Task]) -> None:
+        """重放一条日志记录，记录无效时抛出ValueError、KeyError等异常"""
+        op = record['op']
+        if op == 'upsert':
+            task = Task.from_dict(record['task'])
+            tasks[task.id] = task
+        elif op == 'delete':
+            tasks.pop(record['id'], None)
+        else:
+            raise ValueError(f"未知的日志操作: {op}")
+
+    def record(self, op: str, task: Task, tasks: Iterable[Task]) -> None:
+        self.record_many([(op, task)], tasks)
+
+    def record_many(self, changes: Iterable[Tuple[str, Task]],
+                    tasks: Iterable[Task]) -> None:
+        if self._journal_fh is None:
+            self._journal_fh = open(self.journal_file, 'a', encoding='utf-8')
+
+        for op, task in changes:
+            if op == 'delete':
+                record = {'op': 'delete', 'id': task.id}
+            else:
+                # 记录完整任务内容，重放是幂等的
+                record = {'op': 'upsert', 'task': task.to_dict()}
+            self._journal_fh.write(json.dumps(record, ensure_ascii=False,
+                                              separators=(',', ':')) + '\n')
+            self._journal_records += 1
+        self.fsync.sync(self._journal_fh)
+
+        if self._journal_records >= self.compact_every:
+            self.compact(tasks)
+
+    def compact(self, tasks: Iterable[Task], background: bool = True) -> None:
+        """把当前任务写成快照并丢弃已合并的日志"""
+        if self._compactor and self._compactor.is_alive():
+            if background:
+                return  # 上一次压缩尚未完成，继续累积日志
+            self._compactor.join()
+
+        if self._journal_fh:
+            self._journal_fh.close()
+            self._journal_fh = None
+
+        # 轮换日志：此后的修改写入新日志，快照写完前旧日志保留以防崩溃
+        if os.path.exists(self.journal_file):
+            if os.path.exists(self.pending_file):
+                with open(self.pending_file, 'a', encoding='utf-8') as dst, \
+                        open(self.journal_file, 'r', encoding='utf-8') as src:
+                    dst.write(src.read())
+                os.remove(self.journal_file)
+            else:
+                os.replace(self.journal_file, self.pending_file)
+        self._journal_records = 0
+
+        # 浅拷贝任务列表；序列化期间被修改的任务也会出现在新日志中，
+        # 加载时重放新日志即可修正快照里的中间状态
+        tasks = list(tasks)
+        if background:
+            self._compactor = threading.Thread(target=self._write_snapshot,
+                                               args=(tasks,), daemon=True)
+            self._compactor.start()
+        else:
+            self._write_snapshot(tasks)
+
+    def _write_snapshot(self, tasks: List[Task]) -> None:
+        """原子地写快照，成功后删除旧日志"""
+        # 快照落盘前旧日志就会被删除，除非策略为never，否则总是fsync
+        policy = 'never' if self.fsync.mode == 'never' else 'always'
+        try:
+            self._save_snapshot(tasks, policy)
+            if os.path.exists(self.pending_file):
+                os.remove(self.pending_file)
+        except (IOError, struct.error) as e:
+            print(f"压缩任务日志失败: {e}")
+
+    def save(self, tasks: Iterable[Task]) -> None:
+        # 整体保存等价于一次同步压缩
+        self.compact(tasks, background=False)
+
+    def close(self) -> None:
+        """等待后台压缩完成并关闭日志文件"""
+        if self._compactor:
+            self._compactor.join()
+        if self._journal_fh:
+            self._journal_fh.close()
+            self._journal_fh = None
+
+class BinaryJournalTaskStorage(JournalTaskStorage, BinaryTaskStorage):
+    """追加式日志存储，快照使用二进制格式"""
+
+# 快照格式 -> (普通存储, 日志存储)
+SNAPSHOT_FORMATS = {
+    'json': (JSONTaskStorage, JournalTaskStorage),
+    'binary': (BinaryTaskStorage, BinaryJournalTaskStorage),
+}
+
+class WriteBehindTaskStorage(TaskStorage):
+    """
+    延迟写入（write-behind）包装器
+
+    修改只登记到待写表并唤醒后台线程，线程等待 interval 秒把这段时间内的
+    修改合并（同一任务只保留最新状态）后交给内层存储一次写入，
+    交互命令不再阻塞在磁盘I/O上。flush() 立即写入，close() 写完后才返回。
+    进程异常终止时最多丢失最近 interval 秒的修改。
+    后台写入失败时修改留在待写表中，下个周期重试；flush()、close() 在调用方线程
+    重试，仍然失败时抛出异常。
+    """
+
+    def __init__(self, storage: TaskStorage, interval: float = 1.0):
+        if storage.transactional:
+            raise ValueError("事务型存储不支持延迟写入")
+        self.storage = storage
+        self.interval = interval
+        self._pending: Dict[str, Tuple[str, Task]] = {}
+        self._tasks: Iterable[Task] = ()
+        self._lock = threading.Lock()        # 保护待写表
+        self._write_lock = threading.Lock()  # 同一时刻只有一个线程写内层存储
+        self._dirty = threading.Event()
+        self._closing = threading.Event()
+        self._writer = threading.Thread(target=self._run, daemon=True)
+        self._writer.start()
+
+    def load(self) -> List[Task]:
+        return self.storage.load()
+
+    def summary(self) -> Optional[Dict[str, Any]]:
+        # 有待写修改时文件中的摘要已经过时
+        return None if self._pending else self.storage.summary()
+
+    def scan_status(self, status: TaskStatus,
+                    start: int = 0) -> Optional[Iterator[Tuple[int, Task]]]:
+        return None if self._pending else self.storage.scan_status(status, start)
+
+    def save(self, tasks: Iterable[Task]) -> None:
+        # 整体保存包含了所有待写修改
+        with self._write_lock:
+            with self._lock:
+                self._pending = {}
+                self._dirty.clear()
+            self.storage.save(tasks)
+
+    def record(self, op: str, task: Task, tasks: Iterable[Task]) -> None:
+        self.record_many([(op, task)], tasks)
+
+    def record_many(self, changes: Iterable[Tuple[str, Task]],
+                    tasks: Iterable[Task]) -> None:
+        with self._lock:
+            for op, task in changes:
+                self._pending[task.id] = (op, task)
+            self._tasks = tasks
+        self._dirty.set()
+
+    def _run(self) -> None:
+        """后台线程：有修改时等待一个周期，再把积累的修改一次写入"""
+        while not self._closing.is_set():
+            self._dirty.wait()
+            # 关闭时不必等满一个周期，由 close() 负责最后一次写入
+            if self._closing.wait(self.interval):
+                break
+            try:
+                self.flush()
+            except Exception as e:
+                # 后台线程不能因此退出，修改已放回待写表，由调用方的 flush()/close() 报告
+                print(f"保存任务数据失败: {e}")
+
+    def flush(self) -> None:
+        with self._write_lock:
+            with self._lock:
+                changes = list(self._pending.values())
+                self._pending = {}
+                self._dirty.clear()
+                # 在持锁时取快照：list() 在C层一次完成，不会与主线程的增删交错
+                tasks = list(self._tasks)
+            if not changes:
+                return
+            try:
+                self.storage.record_many(changes, tasks)
+            except Exception:
+                # 放回写入失败的修改，已有更新的任务以新状态为准
+                with self._lock:
+                    for op, task in changes:
+                        self._pending.setdefault(task.id, (op, task))
+                    self._dirty.set()
+                raise
+
+    def compact(self, tasks: Iterable[Task], background: bool = True) -> None:
+        self.flush()
+        with self._write_lock:
+            self.storage.compact(tasks, background)
+
+    def close(self) -> None:
+        """停止后台线程，写入剩余修改并关闭内层存储"""
+        self._closing.set()
+        self._dirty.set()
+        self._writer.join()
+        try:
+            self.flush()
+        finally:
+            self.storage.close()
+
+class SQLiteTaskStorage(TaskStorage):
+    """
+    SQLite存储
+
+    每个任务一行，status/category/priority/due_date 上建有索引，
+    既可以作为普通存储后端，也为 SQLiteTaskManager 提供索引查询。
+    日期以ISO格式字符串保存，同一格式下字符串顺序与时间顺序一致。
+    fsync 策略映射为 PRAGMA synchronous（always=FULL, interval=NORMAL, never=OFF）。
+    """
+
+    COLUMNS = ('id', 'title', 'description', 'priority', 'category', 'status',
+               'due_date', 'created_at', 'updated_at', 'completed_at', 'recurrence',
+               'depends_on', 'claimed_by', 'lease_until')
+    transactional = True
+    SYNCHRONOUS = {'always': 'FULL', 'interval': 'NORMAL', 'never': 'OFF'}
+    # 在给定时刻已过期的条件，参数为 (时刻, 完成状态)
+    OVERDUE = "due_date IS NOT NULL AND due_date < ? AND status != ?"
+    # 工作队列的领取顺序：优先级从高到低，截止日期从早到晚（没有的排最后），创建时间从早到晚；
+    # 建有同样表达式的索引，按状态过滤后沿索引顺序读取，不需要排序
+    CLAIM_ORDER = ("CASE priority " + " ".join(
+        f"WHEN '{priority.value}' THEN {rank}"
+        for rank, priority in enumerate(reversed(TaskPriority))) +
+        " END, due_date IS NULL, due_date, created_at")
+
+    def __init__(self, db_file: str = "tasks.db", fsync: str = "interval"):
+        self.db_file = db_file
+        self.fsync = FsyncPolicy.coerce(fsync)
+        self._in_transaction = False
+        self.connection = sqlite3.connect(db_file)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute(f"PRAGMA synchronous = {self.SYNCHRONOUS[self.fsync.mode]}")
+        with self.connection:
+            self.connection.execute('''
+                CREATE TABLE IF NOT EXISTS tasks (
+                    id TEXT PRIMARY KEY,
+                    title TEXT NOT NULL,
+                    description TEXT,
+                    priority TEXT NOT NULL,
+                    category TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    due_date TEXT,
+                    created_at TEXT,
+                    updated_at TEXT,
+                    completed_at TEXT,
+                    recurrence TEXT,
+                    depends_on TEXT,
+                    claimed_by TEXT,
+                    lease_until TEXT
+                )
+            ''')
+            # 旧版本创建的数据库没有后来增加的列
+            columns = {row[1] for row in self.connection.execute("PRAGMA table_info(tasks)")}
+            for column in ('recurrence', 'depends_on', 'claimed_by', 'lease_until'):
+                if column not in columns:
+                    self.connection.execute(f"ALTER TABLE tasks ADD COLUMN {column} TEXT")
+            for column in ('status', 'category', 'priority', 'due_date', 'lease_until'):
+                self.connection.execute(
+                    f"CREATE INDEX IF NOT EXISTS idx_tasks_{column} ON tasks ({column})")
+            self.connection.execute(
+                f"CREATE INDEX IF NOT EXISTS idx_tasks_claim ON tasks (status, {self.CLAIM_ORDER})")
+
+    def _rows_to_tasks(self, rows) -> List[Task]:
+        return [Task.from_dict(dict(row)) for row in rows]
+
+    def _select(self, where: str = "", params: tuple = (),
+                order_by: str = "rowid", limit: Optional[int] = None) -> List[Task]:
+        sql = "SELECT * FROM tasks"
+        if where:
+            sql += f" WHERE {where}"
+        sql += f" ORDER BY {order_by}"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params = tuple(params) + (limit,)
+        return self._rows_to_tasks(self.connection.execute(sql, params))
+
+    def load(self) -> List[Task]:
+        return self._select()
+
+    def save(self, tasks: Iterable[Task]) -> None:
+        with self.connection:
+            self.connection.execute("DELETE FROM tasks")
+            self.connection.executemany(self._upsert_sql(),
+                                        (self._row(task) for task in tasks))
+
+    def record(self, op: str, task: Task, tasks: Iterable[Task]) -> None:
+        if self._in_transaction:
+            # 批量修改期间只执行不提交，由 commit/rollback 结束事务
+            self._execute_change(op, task)
+            return
+        # 上下文管理器：成功提交，异常回滚
+        with self.connection:
+            self._execute_change(op, task)
+
+    def _execute_change(self, op: str, task: Task) -> None:
+        if op == 'delete':
+            self.connection.execute("DELETE FROM tasks WHERE id = ?", (task.id,))
+        else:
+            self.connection.execute(self._upsert_sql(), self._row(task))
+
+    def begin(self) -> None:
+        self._in_transaction = True
+
+    def commit(self) -> None:
+        self._in_transaction = False
+        self.connection.commit()
+
+    def rollback(self) -> None:
+        self._in_transaction = False
+        self.connection.rollback()
+
+    def _upsert_sql(self) -> str:
+        # ON CONFLICT DO UPDATE 保留原rowid，从而保持添加顺序
+        placeholders = ", ".join("?" for _ in self.COLUMNS)
+        updates = ", ".join(f"{c} = excluded.{c}" for c in self.COLUMNS[1:])
+        return (f"INSERT INTO tasks ({', '.join(self.COLUMNS)}) VALUES ({placeholders}) "
+                f"ON CONFLICT(id) DO UPDATE SET {updates}")
+
+    def _row(self, task: Task) -> tuple:
+        data = task.to_dict()
+        if 'depends_on' in data:
+            # 依赖ID以空格分隔保存，便于用 LIKE 查找依赖某任务的任务
+            data['depends_on'] = ' '.join(data['depends_on'])
+        return tuple(data.get(column) for column in self.COLUMNS)
+
+    def close(self) -> None:
+        self.connection.close()
+
+    # ----- 索引查询 -----
+
+    def get(self, task_id: str) -> Optional[Task]:
+        tasks = self._select("id = ?", (task_id,))
+        return tasks[0] if tasks else None
+
+    def query(self, status: Optional[str] = None, category: Optional[str] = None,
+              priority: Optional[str] = None, overdue_at: Optional[datetime] = None,
+              after_rowid: Optional[int] = None, limit: Optional[int] = None) -> List[Task]:
+        """
+        按条件查询；overdue_at 不为空时只返回在该时刻已过期的任务
+
+        after_rowid 和 limit 用于分页：只返回rowid更大的前limit行。
+        """
+        conditions, params = [], []
+        for column, value in (('status', status), ('category', category),
+                              ('priority', priority)):
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                params.append(value)
+        if overdue_at is not None:
+            conditions.append(self.OVERDUE)
+            params.extend([overdue_at.isoformat(), TaskStatus.DONE.value])
+        if after_rowid is not None:
+            conditions.append("rowid > ?")
+            params.append(after_rowid)
+        return self._select(" AND ".join(conditions), tuple(params), limit=limit)
+
+    def rowid(self, task_id: str) -> Optional[int]:
+        """任务所在行的rowid（添加顺序），用作分页游标"""
+        row = self.connection.execute("SELECT rowid FROM tasks WHERE id = ?",
+                                      (task_id,)).fetchone()
+        return row[0] if row else None
+
+    def due_between(self, start: datetime, end: datetime) -> List[Task]:
+        """截止日期在[start, end]之间且未完成的任务，按截止日期排序"""
+        return self._select("due_date BETWEEN ? AND ? AND status != ?",
+                            (start.isoformat(), end.isoformat(), TaskStatus.DONE.value),
+                            order_by="due_date")
+
+    def recurring(self) -> List[Task]:
+        """有重复规则且未完成的任务"""
+        return self._select("recurrence IS NOT NULL AND due_date IS NOT NULL AND status != ?",
+                            (TaskStatus.DONE.value,))
+
+    def dependents(self, task_id: str) -> List[str]:
+        """直接依赖该任务的任务ID"""
+        escaped = task_id.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        rows = self.connection.execute(
+            "SELECT id FROM tasks WHERE ' ' || depends_on || ' ' LIKE ? ESCAPE '\\'",
+            (f"% {escaped} %",))
+        return [row[0] for row in rows]
+
+    def claimable(self) -> Iterator[Task]:
+        """待办任务按领取顺序逐个产出，调用方取到需要的任务后即可停止"""
+        rows = self.connection.execute(
+            f"SELECT * FROM tasks WHERE status = ? ORDER BY {self.CLAIM_ORDER}",
+            (TaskStatus.TODO.value,))
+        for row in rows:
+            yield Task.from_dict(dict(row))
+
+    def expired_leases(self, now: datetime) -> List[Task]:
+        """进行中且租约在now之前到期的任务"""
+        return self._select("status = ? AND lease_until <= ?",
+                            (TaskStatus.IN_PROGRESS.value, now.isoformat()),
+                            order_by="lease_until")
+
+    def search(self, keyword: str) -> List[Task]:
+        # LIKE '%...%' 无法使用索引，但过滤在SQLite内完成，不需要加载全部任务
+        escaped = keyword.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        pattern = f"%{escaped}%"
+        return self._select("title LIKE ? ESCAPE '\\' OR description LIKE ? ESCAPE '\\' "
+                            "OR category LIKE ? ESCAPE '\\'",
+                            (pattern, pattern, pattern))
+
+    def count(self, overdue_at: Optional[datetime] = None) -> int:
+        """任务数；overdue_at 不为空时只数在该时刻已过期的任务，不构造任务对象"""
+        if overdue_at is None:
+            return self.connection.execute("SELECT COUNT(*) FROM tasks").fetchone()[0]
+        return self.connection.execute(
+            f"SELECT COUNT(*) FROM tasks WHERE {self.OVERDUE}",
+            (overdue_at.isoformat(), TaskStatus.DONE.value)).fetchone()[0]
+
+    def distribution(self, column: str) -> Dict[str, int]:
+        """某一列各取值的任务数（column只接受内部传入的列名）"""
+        rows = self.connection.execute(
+            f"SELECT {column}, COUNT(*) FROM tasks GROUP BY {column}")
+        return {row[0]: row[1] for row in rows}
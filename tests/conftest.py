@@ -0,0 +1,7 @@
+"""pytest配置：测试直接导入 projects/ 下的模块"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                'projects'))
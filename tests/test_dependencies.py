@@ -0,0 +1,109 @@
+"""依赖关系：增量维护的就绪集合、循环检查和关键路径"""
+
+import json
+import random
+
+import pytest
+
+from task_manager import MemoryTaskStorage, TaskManager, TaskStatus
+
+def naive_ready(manager):
+    """逐个任务检查依赖是否全部完成（已删除的依赖不阻塞）"""
+    return [task.id for task in manager.tasks
+            if task.status is TaskStatus.TODO
+            and all(manager.get_task(d) is None or manager.get_task(d).status is TaskStatus.DONE
+                    for d in task.depends_on)]
+
+def test_ready_set_matches_naive_check():
+    rng = random.Random(5)
+    manager = TaskManager(storage=MemoryTaskStorage())
+    ids = []
+    for i in range(200):
+        task = manager.add_task(f"任务{i}")
+        if ids and rng.random() < 0.7:
+            manager.update_task(task.id, depends_on=rng.sample(ids, min(len(ids), rng.randint(1, 3))))
+        ids.append(task.id)
+    statuses = [status.value for status in TaskStatus]
+    for step in range(400):
+        task_id = rng.choice(ids)
+        if step % 10 == 0:
+            manager.delete_task(task_id)
+            ids.remove(task_id)
+        elif step % 7 == 0:
+            with pytest.raises(ValueError):
+                with manager.batch():
+                    manager.update_task(task_id, status=TaskStatus.DONE.value)
+                    raise ValueError("回滚")
+        else:
+            manager.update_task(task_id, status=rng.choice(statuses))
+        if step % 20 == 0:
+            assert [task.id for task in manager.ready_tasks()] == naive_ready(manager)
+    assert [task.id for task in manager.ready_tasks()] == naive_ready(manager)
+    assert [task.id for task in manager.ready_tasks(5)] == naive_ready(manager)[:5]
+
+def test_cycles_are_rejected():
+    manager = TaskManager(storage=MemoryTaskStorage())
+    a, b, c = (manager.add_task(title) for title in "abc")
+    manager.update_task(b.id, depends_on=[a.id])
+    manager.update_task(c.id, depends_on=[b.id])
+    assert not manager.update_task(a.id, depends_on=[c.id])
+    assert not manager.update_task(a.id, depends_on=[a.id])
+    assert not manager.update_task(a.id, depends_on=["missing"])
+    assert a.depends_on == ()
+
+def test_recurring_tasks_cannot_be_dependencies(tmp_path):
+    manager = TaskManager(storage=MemoryTaskStorage())
+    daily, other = manager.add_task("日报"), manager.add_task("周报")
+    manager.update_task(daily.id, recurrence="daily")
+    assert not manager.update_task(other.id, depends_on=[daily.id])
+    with pytest.raises(ValueError):
+        manager.add_tasks([{'title': "汇总", 'depends_on': [daily.id]}])
+
+    # 已被依赖的任务不能再设为重复任务
+    manager.update_task(other.id, depends_on=[manager.add_task("准备").id])
+    assert not manager.update_task(other.depends_on[0], recurrence="weekly")
+    assert manager.get_task(other.depends_on[0]).recurrence is None
+
+    # 导入的文件里也不能出现
+    records = [daily.to_dict(), dict(other.to_dict(), depends_on=[daily.id])]
+    path = tmp_path / "tasks.jsonl"
+    path.write_text("\n".join(json.dumps(record, ensure_ascii=False) for record in records),
+                    encoding='utf-8')
+    empty = TaskManager(storage=MemoryTaskStorage())
+    with pytest.raises(ValueError):
+        empty.import_tasks(str(path))
+    assert empty.tasks == []
+
+def write_import(path, records):
+    path.write_text("\n".join(json.dumps(record, ensure_ascii=False) for record in records),
+                    encoding='utf-8')
+    return str(path)
+
+def test_import_checks_dependencies(tmp_path):
+    manager = TaskManager(storage=MemoryTaskStorage())
+    existing = manager.add_task("已有")
+    scratch = TaskManager(storage=MemoryTaskStorage())
+    a, b = scratch.add_task("a"), scratch.add_task("b")
+    before = [task.to_dict() for task in manager.tasks]
+
+    for depends in ({a.id: ["missing"]}, {a.id: [b.id], b.id: [a.id]}, {a.id: [a.id]}):
+        records = [dict(task.to_dict(), depends_on=depends.get(task.id, []))
+                   for task in (a, b)]
+        with pytest.raises(ValueError):
+            manager.import_tasks(write_import(tmp_path / "bad.jsonl", records))
+        assert [task.to_dict() for task in manager.tasks] == before
+        assert manager.ready_tasks() == manager.tasks
+
+    records = [dict(a.to_dict(), depends_on=[existing.id]),
+               dict(b.to_dict(), depends_on=[a.id])]
+    assert manager.import_tasks(write_import(tmp_path / "good.jsonl", records)) == 2
+    assert [task.id for task in manager.ready_tasks()] == [existing.id]
+
+def test_critical_path_follows_longest_open_chain():
+    manager = TaskManager(storage=MemoryTaskStorage())
+    a, b, c, d = (manager.add_task(title) for title in "abcd")
+    manager.update_task(b.id, depends_on=[a.id])
+    manager.update_task(d.id, depends_on=[c.id, b.id])
+    assert [task.id for task in manager.critical_path(d.id)] == [a.id, b.id, d.id]
+    manager.update_task(a.id, status=TaskStatus.DONE.value)
+    assert [task.id for task in manager.critical_path(d.id)] in ([c.id, d.id], [b.id, d.id])
@@ -0,0 +1,126 @@
+"""修改历史：按字段差异落盘、按时间回溯，以及批量回滚和内存占用"""
+
+import gc
+import time
+import tracemalloc
+from datetime import datetime
+
+import pytest
+
+from task_manager import MemoryTaskStorage, TaskHistory, TaskManager, TaskStatus
+
+def pause():
+    """让前后两次修改的时间戳分开"""
+    time.sleep(0.01)
+    return datetime.now()
+
+def test_history_round_trips_through_file(tmp_path):
+    path = str(tmp_path / "tasks.json")
+    manager = TaskManager(path, history=True)
+    first = manager.add_task("写报告", priority="低", category="工作")
+    other = manager.add_task("准备数据")
+    pause()
+    with manager.acting_as("alice"):
+        manager.update_task(first.id, status=TaskStatus.IN_PROGRESS.value, priority="高")
+    pause()
+    with manager.acting_as("bob"):
+        manager.update_task(first.id, due_date="2030-01-01T09:00:00",
+                            depends_on=[other.id], category="季度")
+    pause()
+    manager.delete_task(other.id)
+    expected = {task_id: manager.get_history(task_id) for task_id in (first.id, other.id)}
+    manager.close()
+
+    with open(path + ".history", encoding='utf-8') as f:
+        assert len(f.read().splitlines()) == 5
+
+    reopened = TaskManager(path, history=True)
+    for task_id, records in expected.items():
+        assert reopened.get_history(task_id) == records
+    records = expected[first.id]
+    assert [record['op'] for record in records] == ['create', 'update', 'update']
+    assert [record['by'] for record in records] == [None, "alice", "bob"]
+    assert records[1]['changes'] == {'status': ("待办", "进行中"), 'priority': ("低", "高")}
+    assert records[2]['changes']['depends_on'] == ([], [other.id])
+    assert [record['op'] for record in expected[other.id]] == ['create', 'delete']
+    reopened.close()
+
+def test_time_travel_over_updated_and_deleted_tasks(tmp_path):
+    manager = TaskManager(str(tmp_path / "tasks.json"), history=True)
+    before = pause()
+    kept = manager.add_task("保留")
+    gone = manager.add_task("删除")
+    created = pause()
+    manager.update_task(kept.id, status=TaskStatus.IN_PROGRESS.value, title="保留-改名")
+    manager.update_task(gone.id, status=TaskStatus.IN_PROGRESS.value)
+    started = pause()
+    manager.update_task(kept.id, status=TaskStatus.DONE.value)
+    manager.delete_task(gone.id)
+    pause()
+
+    assert manager.get_task_at(kept.id, before) is None
+    past = manager.get_task_at(kept.id, created)
+    assert (past.title, past.status) == ("保留", TaskStatus.TODO)
+    assert manager.get_task_at(kept.id, started).title == "保留-改名"
+    assert manager.get_task_at(gone.id, started).status is TaskStatus.IN_PROGRESS
+    assert manager.get_task_at(gone.id, datetime.now()) is None
+    # 回溯得到的是副本，当前任务不受影响
+    assert kept.status is TaskStatus.DONE and kept.title == "保留-改名"
+
+    assert manager.tasks_at(before) == []
+    assert [task.id for task in manager.tasks_at(created)] == [kept.id, gone.id]
+    assert [task.id for task in manager.tasks_at(started, TaskStatus.IN_PROGRESS.value)] == \
+        [kept.id, gone.id]
+    assert [task.id for task in manager.tasks_at(datetime.now())] == [kept.id]
+    assert manager.tasks_at(datetime.now(), TaskStatus.IN_PROGRESS.value) == []
+    manager.close()
+
+def test_rolled_back_batch_leaves_no_history(tmp_path):
+    path = str(tmp_path / "tasks.json")
+    manager = TaskManager(path, history=True)
+    task = manager.add_task("任务")
+    before = manager.get_history(task.id)
+    with pytest.raises(ValueError):
+        with manager.batch():
+            manager.update_task(task.id, status=TaskStatus.DONE.value)
+            manager.add_task("回滚的任务")
+            raise ValueError("中途失败")
+    assert manager.get_history(task.id) == before
+    assert [task_id for task_id, _ in manager.history.items()] == [task.id]
+    manager.close()
+    with open(path + ".history", encoding='utf-8') as f:
+        assert len(f.read().splitlines()) == 1
+
+def test_heartbeats_and_noop_updates_are_not_recorded():
+    manager = TaskManager(storage=MemoryTaskStorage(), history=TaskHistory())
+    task = manager.add_task("任务")
+    manager.update_task(task.id, title="任务")
+    claimed = manager.claim_next("w")
+    for _ in range(10):
+        assert manager.renew_lease(claimed.id, "w")
+    assert [record['op'] for record in manager.get_history(task.id)] == ['create', 'update']
+
+def test_history_memory_stays_below_twice_live_data():
+    size = 2000
+    manager = TaskManager(storage=MemoryTaskStorage(), history=TaskHistory())
+    history, manager.history = manager.history, None
+    gc.collect()
+    tracemalloc.start()
+    try:
+        manager.add_tasks([{'title': f"任务{i}", 'description': f"描述{i}",
+                            'category': f"分类{i % 20}"} for i in range(size)])
+        gc.collect()
+        live = tracemalloc.get_traced_memory()[0]
+        manager.history = history
+        for task in manager.tasks:
+            manager._log_change(task, TaskHistory.CREATE)
+        for fields in ({'status': TaskStatus.IN_PROGRESS.value}, {'priority': "高"}):
+            with manager.batch():
+                for task in manager.tasks:
+                    manager.update_task(task.id, **fields)
+        gc.collect()
+        recorded = tracemalloc.get_traced_memory()[0] - live
+    finally:
+        tracemalloc.stop()
+    assert sum(len(entries) for _, entries in history.items()) == 3 * size
+    assert recorded < 2 * live
@@ -0,0 +1,65 @@
+"""list_tasks 的过滤、排序和游标分页"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from task_manager import MemoryTaskStorage, SQLiteTaskManager, TaskManager, TaskStatus
+
+def filled(manager, count=120):
+    now = datetime.now()
+    manager.add_tasks([{'title': f"任务{i}", 'priority': ["低", "中", "高"][i % 3],
+                        'category': f"分类{i % 4}",
+                        'due_date': (now + timedelta(days=i % 9 - 4, hours=1)).isoformat()
+                        if i % 3 else None}
+                       for i in range(count)])
+    for task in manager.tasks[::5]:
+        manager.update_task(task.id, status=TaskStatus.DONE.value)
+    return manager
+
+def walk(manager, page_size, **kwargs):
+    """逐页取完全部结果"""
+    found, cursor = [], None
+    while True:
+        page = manager.list_tasks(limit=page_size, cursor=cursor, **kwargs)
+        assert len(page) <= page_size
+        found.extend(task.id for task in page)
+        cursor = page.next_cursor
+        if cursor is None:
+            return found
+
+@pytest.mark.parametrize('order_by', TaskManager.ORDER_BY)
+@pytest.mark.parametrize('filters', [{}, {'category_filter': "分类1"},
+                                     {'status_filter': "待办", 'priority_filter': "高"},
+                                     {'show_overdue': True}])
+def test_pages_cover_full_listing(order_by, filters):
+    manager = filled(TaskManager(storage=MemoryTaskStorage()))
+    expected = [task.id for task in manager.list_tasks(order_by=order_by, **filters)]
+    assert walk(manager, 7, order_by=order_by, **filters) == expected
+
+def test_sorted_orders():
+    manager = filled(TaskManager(storage=MemoryTaskStorage()))
+    by_due = manager.list_tasks(order_by='due_date')
+    dues = [task.due_date for task in by_due if task.due_date]
+    assert dues == sorted(dues) and all(task.due_date is None for task in by_due[len(dues):])
+    ranks = [TaskManager._PRIORITY_RANKS[task.priority] for task in
+             manager.list_tasks(order_by='priority')]
+    assert ranks == sorted(ranks, reverse=True)
+
+def test_filters_match_between_backends(tmp_path):
+    memory = filled(TaskManager(storage=MemoryTaskStorage()))
+    sqlite = SQLiteTaskManager(str(tmp_path / "tasks.db"))
+    sqlite.add_tasks({'title': task.title, 'priority': task.priority.value,
+                      'category': task.category,
+                      'due_date': task.due_date.isoformat() if task.due_date else None}
+                     for task in memory.tasks)
+    for task, copy in zip(memory.tasks, sqlite.tasks):
+        if task.status is TaskStatus.DONE:
+            sqlite.update_task(copy.id, status=TaskStatus.DONE.value)
+    for filters in ({'status_filter': "待办"}, {'category_filter': "分类2"},
+                    {'priority_filter': "低"}, {'show_overdue': True}):
+        assert [task.title for task in sqlite.list_tasks(**filters)] == \
+            [task.title for task in memory.list_tasks(**filters)]
+    assert walk(sqlite, 9, status_filter="待办") == \
+        [task.id for task in sqlite.list_tasks("待办")]
+    sqlite.close()
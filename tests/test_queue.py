@@ -0,0 +1,83 @@
+"""工作队列：按优先级领取、租约到期收回，以及多线程领取不重复"""
+
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from task_manager import (MemoryTaskStorage, SQLiteTaskManager, TaskManager, TaskStatus,
+                          ThreadSafeTaskManager)
+
+def test_claims_follow_priority_then_age():
+    manager = TaskManager(storage=MemoryTaskStorage())
+    low = manager.add_task("低", priority="低")
+    high = manager.add_task("高", priority="高")
+    medium = manager.add_task("中")
+    order = [manager.claim_next("w").id for _ in range(3)]
+    assert order == [high.id, medium.id, low.id]
+    assert manager.claim_next("w") is None
+    assert high.status is TaskStatus.IN_PROGRESS and high.claimed_by == "w"
+
+def test_release_and_ownership():
+    manager = TaskManager(storage=MemoryTaskStorage())
+    task = manager.add_task("任务")
+    claimed = manager.claim_next("w1")
+    assert not manager.release_task(claimed.id, "w2")
+    assert manager.release_task(claimed.id, "w1", TaskStatus.TODO.value)
+    assert task.claimed_by is None
+    assert manager.claim_next("w2") is task
+
+@pytest.mark.parametrize('backend', ['memory', 'sqlite'])
+def test_recurring_task_waits_for_next_occurrence(tmp_path, backend):
+    manager = (TaskManager(storage=MemoryTaskStorage()) if backend == 'memory'
+               else SQLiteTaskManager(str(tmp_path / "tasks.db")))
+    due = datetime.now() + timedelta(seconds=0.3)
+    daily = manager.add_task("日报", priority="高", due_date_str=due.isoformat(),
+                             recurrence="daily")
+    other = manager.add_task("普通")
+    assert manager.claim_next("w").id == other.id
+    assert manager.claim_next("w") is None
+
+    time.sleep(0.4)
+    assert manager.claim_next("w").id == daily.id
+    assert manager.release_task(daily.id, "w")
+    daily = manager.get_task(daily.id)
+    assert daily.status is TaskStatus.TODO
+    assert daily.due_date == due + timedelta(days=1)
+    assert manager.claim_next("w") is None
+    manager.close()
+
+def test_expired_leases_are_requeued():
+    manager = TaskManager(storage=MemoryTaskStorage())
+    manager.add_tasks([{'title': f"任务{i}"} for i in range(10)])
+    for _ in range(10):
+        manager.claim_next("失联", lease=0.05)
+    time.sleep(0.1)
+    assert manager.requeue_expired() == 10
+    assert len(manager.list_tasks(TaskStatus.TODO.value)) == 10
+    assert not manager.renew_lease(manager.tasks[0].id, "失联")
+
+def test_concurrent_claims_are_unique():
+    manager = ThreadSafeTaskManager(storage=MemoryTaskStorage())
+    manager.add_tasks([{'title': f"任务{i}", 'priority': ["低", "中", "高"][i % 3]}
+                       for i in range(2000)])
+    claimed = []
+
+    def worker(name):
+        done = []
+        while True:
+            task = manager.claim_next(name)
+            if task is None:
+                break
+            done.append(task.id)
+            manager.release_task(task.id, name)
+        claimed.extend(done)
+
+    threads = [threading.Thread(target=worker, args=(f"w{i}",)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(claimed) == len(set(claimed)) == 2000
+    assert manager.get_statistics()['status_distribution'] == {TaskStatus.DONE.value: 2000}
@@ -0,0 +1,127 @@
+"""重复规则的解析与推算，以及重复任务堆展开出的即将到期任务"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from task_manager import (MemoryTaskStorage, TaskManager, TaskStatus, _datetime_to_micros,
+                          _micros_to_datetime, parse_recurrence)
+
+def occurrences(rule, start, count):
+    """从 start 起规则的前 count 次发生"""
+    rule = parse_recurrence(rule)
+    stamp, found = _datetime_to_micros(start), []
+    for _ in range(count):
+        stamp = rule.next_at_or_after(0, stamp)
+        found.append(_micros_to_datetime(stamp))
+        stamp += 1
+    return found
+
+def brute_force(rule, start, count):
+    """逐分钟检查cron的五个字段（日和周都有限制时满足其一即可）"""
+    minute, hour, day, month, weekday = rule.split()
+    fields = []
+    for field, low, high in ((minute, 0, 59), (hour, 0, 23), (day, 1, 31),
+                             (month, 1, 12), (weekday, 0, 7)):
+        values = set()
+        for part in field.split(','):
+            base, _, step = part.partition('/')
+            if base == '*':
+                first, last = low, high
+            elif '-' in base:
+                first, last = map(int, base.split('-'))
+            else:
+                first = int(base)
+                last = high if step else first
+            values.update(range(first, last + 1, int(step or 1)))
+        fields.append(values)
+    minutes, hours, days, months, weekdays = fields
+    weekdays = {value % 7 for value in weekdays}
+    times = [(h, m) for h in sorted(hours) for m in sorted(minutes)]
+    moment = start.replace(second=0, microsecond=0)
+    if moment < start:
+        moment += timedelta(minutes=1)
+    found = []
+    current = moment.date()
+    while len(found) < count:
+        day_ok = current.day in days
+        weekday_ok = (current.weekday() + 1) % 7 in weekdays
+        if day.startswith('*') or weekday.startswith('*'):
+            date_ok = day_ok and weekday_ok
+        else:
+            date_ok = day_ok or weekday_ok
+        if current.month in months and date_ok:
+            for h, m in times:
+                candidate = datetime(current.year, current.month, current.day, h, m)
+                if candidate >= moment and len(found) < count:
+                    found.append(candidate)
+        current += timedelta(days=1)
+    return found
+
+@pytest.mark.parametrize('rule', ["0 9 * * 1-5", "30 8 15 * *", "0 0 1 1,7 *",
+                                  "*/20 10-11 * * *", "0 12 13 * 5", "0 0 31 * *",
+                                  "0 0 29 2 *", "15 6 1-31/2 * *", "0 0 */2 * *",
+                                  "0 9 * * */2", "0 0 */10 * 1-5", "30 7 1-7 * */3",
+                                  "0 0 */5 * */2"])
+def test_cron_matches_brute_force(rule):
+    start = datetime(2024, 1, 30, 10, 7)
+    count = 3 if rule == "0 0 29 2 *" else 12
+    assert occurrences(rule, start, count) == brute_force(rule, start, count)
+
+def test_interval_rules():
+    anchor = _datetime_to_micros(datetime(2024, 1, 1, 9))
+    daily = parse_recurrence("daily")
+    assert _micros_to_datetime(daily.next_at_or_after(anchor, anchor + 1)) == \
+        datetime(2024, 1, 2, 9)
+    assert parse_recurrence("every 2 hours").step == 2 * 3600 * 10 ** 6
+
+@pytest.mark.parametrize('rule', ["", "0 9 * *", "61 * * * *", "0 0 31 2 *", "0 0 31 2 */2",
+                                  "every 0 days"])
+def test_invalid_rules(rule):
+    with pytest.raises(ValueError):
+        parse_recurrence(rule)
+
+def test_completing_occurrence_moves_due_date():
+    manager = TaskManager(storage=MemoryTaskStorage())
+    due = datetime.now() + timedelta(hours=1)
+    task = manager.add_task("日报", due_date_str=due.isoformat())
+    manager.update_task(task.id, recurrence="daily")
+    manager.update_task(task.id, status=TaskStatus.DONE.value)
+    assert task.status is TaskStatus.TODO
+    assert task.due_date == due + timedelta(days=1)
+
+def test_upcoming_expands_every_occurrence():
+    manager = TaskManager(storage=MemoryTaskStorage())
+    now = datetime.now()
+    rules = ["daily", "0 9 * * 1", "30 8 10 * *", "every 6 hours"]
+    for i in range(40):
+        task = manager.add_task(f"重复{i}", due_date_str=(now + timedelta(
+            minutes=37 * i + 5)).isoformat())
+        manager.update_task(task.id, recurrence=rules[i % len(rules)])
+    manager.add_task("普通", due_date_str=(now + timedelta(days=2)).isoformat())
+
+    def expected(start, days):
+        begin, end = _datetime_to_micros(start), _datetime_to_micros(start + timedelta(days=days))
+        found = set()
+        for task in manager.tasks:
+            if not task.recurrence:
+                if begin <= task.due_stamp <= end:
+                    found.add((task.id, task.due_stamp))
+                continue
+            rule = parse_recurrence(task.recurrence)
+            stamp = rule.next_at_or_after(task.due_stamp, begin)
+            while stamp <= end:
+                found.add((task.id, stamp))
+                stamp = rule.next_at_or_after(task.due_stamp, stamp + 1)
+        return found
+
+    for days in (1, 7, 30):
+        before = datetime.now()
+        upcoming = manager.get_upcoming_tasks(days)
+        after = datetime.now()
+        found = {(task.id, task.due_stamp) for task in upcoming}
+        # 查询期间时间在推移，结果介于以查询前后为起点的两个答案之间
+        low, high = expected(before, days), expected(after, days)
+        assert low & high <= found <= low | high
+        stamps = [task.due_stamp for task in upcoming]
+        assert stamps == sorted(stamps)
@@ -0,0 +1,56 @@
+"""提醒服务：到期提醒准时送达，任务修改后重新排期"""
+
+import time
+from datetime import datetime, timedelta
+
+from task_manager import MemoryTaskStorage, ReminderScheduler, TaskManager, TaskStatus
+
+def test_due_reminders_are_delivered_once():
+    manager = TaskManager(storage=MemoryTaskStorage())
+    now = datetime.now()
+    tasks = manager.add_tasks([{'title': f"任务{i}",
+                                'due_date': (now + timedelta(seconds=0.2 + i / 100)).isoformat()}
+                               for i in range(20)])
+    moved = manager.add_task("推迟", due_date_str=(now + timedelta(seconds=0.3)).isoformat())
+    done = manager.add_task("完成", due_date_str=(now + timedelta(seconds=0.3)).isoformat())
+    cancelled = manager.add_task("取消", due_date_str=(now + timedelta(seconds=0.3)).isoformat())
+    earlier = manager.add_task("早已取消", due_date_str=(now + timedelta(seconds=0.3)).isoformat())
+    manager.update_task(earlier.id, status=TaskStatus.CANCELLED.value)
+    delivered = []
+    scheduler = ReminderScheduler(manager, delivered.append)
+    scheduler.start()
+    try:
+        manager.update_task(moved.id, due_date=(now + timedelta(days=1)).isoformat())
+        manager.update_task(done.id, status=TaskStatus.DONE.value)
+        manager.update_task(cancelled.id, status=TaskStatus.CANCELLED.value)
+        time.sleep(1.0)
+    finally:
+        scheduler.stop()
+    assert sorted(reminder.task.id for reminder in delivered) == sorted(t.id for t in tasks)
+    assert all(reminder.kind == 'due' for reminder in delivered)
+
+def test_scheduler_on_lazy_file_backed_manager(tmp_path):
+    path = str(tmp_path / "tasks.json")
+    manager = TaskManager(path)
+    task = manager.add_task("到期", due_date_str=(datetime.now()
+                                                 + timedelta(seconds=0.3)).isoformat())
+    manager.close()
+
+    # 惰性加载的管理器在调度器第一次读取任务时才加载，加载时会再发出重新加载的通知
+    lazy = TaskManager(path, lazy=True)
+    delivered = []
+    scheduler = ReminderScheduler(lazy, delivered.append)
+    scheduler.start()
+    try:
+        time.sleep(0.6)
+    finally:
+        scheduler.stop()
+        lazy.close()
+    assert [reminder.task.id for reminder in delivered] == [task.id]
+
+def test_scheduler_on_lazy_manager_without_file(tmp_path):
+    manager = TaskManager(str(tmp_path / "tasks.json"), lazy=True)
+    scheduler = ReminderScheduler(manager, lambda reminder: None)
+    scheduler.start()
+    scheduler.stop()
+    manager.close()
@@ -0,0 +1,25 @@
+"""倒排索引搜索与线性扫描的结果一致"""
+
+import random
+
+from task_manager import MemoryTaskStorage, TaskManager
+
+WORDS = ["报告", "会议", "代码", "review", "deploy", "测试", "文档", "python", "数据库", "bug"]
+
+def test_indexed_search_matches_scan():
+    rng = random.Random(3)
+    indexed = TaskManager(storage=MemoryTaskStorage(), search_index=True)
+    for i in range(300):
+        indexed.add_task(f"{rng.choice(WORDS)}{rng.choice(WORDS)} {i}",
+                         f"描述 {rng.choice(WORDS)}", category=f"分类{i % 7}")
+    ids = [task.id for task in indexed.tasks]
+    for task_id in rng.sample(ids, 60):
+        indexed.update_task(task_id, title=f"{rng.choice(WORDS)} 改过")
+    for task_id in rng.sample(ids, 40):
+        indexed.delete_task(task_id)
+
+    scanned = TaskManager(storage=MemoryTaskStorage())
+    scanned.tasks = indexed.tasks
+    for keyword in WORDS + ["Review", "12", "分类3", "改过", "python数据库", "不存在"]:
+        assert {task.id for task in indexed.search_tasks(keyword)} == \
+            {task.id for task in scanned.search_tasks(keyword)}, keyword
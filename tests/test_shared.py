@@ -0,0 +1,59 @@
+"""多进程共享同一个任务文件：文件锁下的修改互不覆盖，其他进程的修改能被发现"""
+
+import contextlib
+import io
+import multiprocessing
+
+import pytest
+
+from task_manager import TaskManager, TaskStatus
+
+def add_and_update(path, worker, count):
+    """子进程：添加count个任务，并反复更新属于自己的种子任务"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        manager = TaskManager(path, fsync="never", shared=True)
+        seed = next(task for task in manager.tasks if task.title == f"种子{worker}")
+        for i in range(count):
+            manager.add_task(f"进程{worker}-{i}")
+            manager.update_task(seed.id, description=str(i))
+        manager.close()
+
+def test_processes_do_not_lose_changes(tmp_path):
+    path = str(tmp_path / "tasks.json")
+    processes, count = 4, 40
+    TaskManager(path).add_tasks([{'title': f"种子{worker}"} for worker in range(processes)])
+
+    workers = [multiprocessing.Process(target=add_and_update, args=(path, worker, count))
+               for worker in range(processes)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+        assert worker.exitcode == 0
+
+    result = TaskManager(path)
+    assert len(result.tasks) == processes + processes * count
+    assert len({task.id for task in result.tasks}) == len(result.tasks)
+    for task in result.tasks:
+        if task.title.startswith("种子"):
+            assert task.description == str(count - 1)
+
+def test_changes_from_other_managers_are_merged(tmp_path):
+    path = str(tmp_path / "tasks.json")
+    first = TaskManager(path, shared=True)
+    second = TaskManager(path, shared=True)
+    task = first.add_task("共享")
+    # 修改在文件锁下先合并其他进程的修改，second 能找到 first 刚添加的任务
+    assert second.update_task(task.id, status=TaskStatus.IN_PROGRESS.value)
+    first.delete_task(second.add_task("另一个").id)
+    assert first.get_task(task.id).status is TaskStatus.IN_PROGRESS
+
+    # 查询前调用 refresh 即可看到其他进程的修改；文件未变化时不重新读取
+    assert second.refresh()
+    assert not second.refresh()
+    assert [t.title for t in second.tasks] == ["共享"]
+    assert [t.title for t in second.list_tasks(TaskStatus.IN_PROGRESS.value)] == ["共享"]
+
+def test_shared_mode_rejects_journal(tmp_path):
+    with pytest.raises(ValueError):
+        TaskManager(str(tmp_path / "tasks.json"), shared=True, journal=True)
@@ -0,0 +1,90 @@
+"""增量维护的统计信息与逐个任务重新计算的结果一致"""
+
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from task_manager import (MemoryTaskStorage, SQLiteTaskManager, TaskManager,
+                          TaskPriority, TaskStatus)
+
+def recount(manager):
+    """遍历全部任务重新计算统计信息"""
+    now = datetime.now()
+    tasks = manager.tasks
+    status, priority, category = {}, {}, {}
+    for task in tasks:
+        status[task.status.value] = status.get(task.status.value, 0) + 1
+        priority[task.priority.value] = priority.get(task.priority.value, 0) + 1
+        category[task.category] = category.get(task.category, 0) + 1
+    return {
+        'total_tasks': len(tasks),
+        'status_distribution': status,
+        'priority_distribution': priority,
+        'category_distribution': category,
+        'overdue_tasks': sum(task.is_overdue(now) for task in tasks),
+    }
+
+def mutate(manager, count, rng):
+    """随机增、改、删，夹杂会回滚的批量修改"""
+    statuses = [status.value for status in TaskStatus]
+    priorities = [priority.value for priority in TaskPriority]
+    now = datetime.now()
+
+    def random_due():
+        # 截止时间离现在至少一小时，统计和重算之间不会有任务恰好变成过期
+        return (now + timedelta(days=rng.randint(-30, 30), hours=rng.randint(1, 23))).isoformat()
+
+    ids = [task.id for task in manager.tasks]
+    for _ in range(count):
+        action = rng.random()
+        if action < 0.3 or not ids:
+            ids.append(manager.add_task(f"任务{rng.randint(0, 999)}", "",
+                                        rng.choice(priorities), f"分类{rng.randint(0, 9)}",
+                                        random_due()).id)
+        elif action < 0.75:
+            field, value = rng.choice([('status', rng.choice(statuses)),
+                                       ('priority', rng.choice(priorities)),
+                                       ('category', f"分类{rng.randint(0, 9)}"),
+                                       ('due_date', random_due())])
+            manager.update_task(rng.choice(ids), **{field: value})
+        elif action < 0.9:
+            manager.delete_task(ids.pop(rng.randrange(len(ids))))
+        else:
+            with pytest.raises(ValueError):
+                manager.update_tasks({rng.choice(ids): {'status': TaskStatus.DONE.value},
+                                      'missing': {'status': TaskStatus.DONE.value}})
+
+@pytest.fixture(params=['memory', 'journal', 'sqlite'])
+def manager(request, tmp_path):
+    if request.param == 'memory':
+        manager = TaskManager(storage=MemoryTaskStorage())
+    elif request.param == 'journal':
+        manager = TaskManager(str(tmp_path / "tasks.json"), journal=True, compact_every=50)
+    else:
+        manager = SQLiteTaskManager(str(tmp_path / "tasks.db"))
+    yield manager
+    manager.close()
+
+def test_statistics_match_recount(manager):
+    mutate(manager, 600, random.Random(42))
+    stats = manager.get_statistics()
+    for key, value in recount(manager).items():
+        assert stats[key] == value, key
+    done = stats['status_distribution'].get(TaskStatus.DONE.value, 0)
+    assert stats['completion_rate'] == pytest.approx(done / stats['total_tasks'] * 100)
+
+def test_statistics_survive_reload(tmp_path):
+    path = str(tmp_path / "tasks.json")
+    manager = TaskManager(path, journal=True, compact_every=30)
+    mutate(manager, 300, random.Random(7))
+    expected = manager.get_statistics()
+    manager.close()
+    for lazy in (False, True):
+        reloaded = TaskManager(path, journal=True, lazy=lazy)
+        assert reloaded.get_statistics() == expected
+        reloaded.close()
+
+def test_empty_manager_statistics():
+    stats = TaskManager(storage=MemoryTaskStorage()).get_statistics()
+    assert stats['total_tasks'] == 0 and stats['completion_rate'] == 0
@@ -0,0 +1,276 @@
+"""各种存储格式的读写往返、延迟写入、惰性加载和导入导出"""
+
+import json
+import os
+import random
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from persistence import migrate_to_json_lines
+
+import task_storage
+from task_manager import (SUMMARY_MAX_DUE, BinaryTaskStorage, ColumnarTaskStore,
+                          JSONTaskStorage, MemoryTaskStorage, SQLiteTaskManager, TaskManager,
+                          TaskStatus, WriteBehindTaskStorage, _datetime_to_micros,
+                          load_snapshot, store_summary, summary_overdue)
+
+def sample_tasks():
+    manager = TaskManager(storage=MemoryTaskStorage())
+    now = datetime.now().replace(microsecond=0)
+    tasks = manager.add_tasks([
+        {'title': "写报告", 'description': "季度报告", 'priority': "高", 'category': "工作",
+         'due_date': (now + timedelta(days=2)).isoformat()},
+        {'title': "买菜", 'category': "生活"},
+        {'title': "例会", 'due_date': (now + timedelta(days=1)).isoformat()},
+        {'title': "带时区", 'due_date': "2030-01-01T09:00:00+08:00"},
+    ])
+    manager.update_task(tasks[1].id, status=TaskStatus.DONE.value)
+    manager.update_task(tasks[2].id, recurrence="0 9 * * 1-5")
+    manager.update_task(tasks[0].id, depends_on=[tasks[1].id])
+    manager.claim_next("工作者")
+    return manager.tasks
+
+@pytest.mark.parametrize('storage_class', [JSONTaskStorage, BinaryTaskStorage])
+def test_snapshot_round_trip(tmp_path, storage_class):
+    tasks = sample_tasks()
+    storage = storage_class(str(tmp_path / "tasks"), 'never')
+    storage.save(tasks)
+    loaded = storage.load()
+    assert [task.to_dict() for task in loaded] == [task.to_dict() for task in tasks]
+    assert [task.to_dict() for task in load_snapshot(storage.data_file)] == \
+        [task.to_dict() for task in tasks]
+
+def test_write_behind_keeps_changes_after_close(tmp_path):
+    path = str(tmp_path / "tasks.json")
+    manager = TaskManager(path, write_behind=0.2)
+    task = manager.add_task("任务")
+    for i in range(20):
+        manager.update_task(task.id, title=f"修改{i}")
+    manager.close()
+    assert TaskManager(path).get_task(task.id).title == "修改19"
+
+class FailingStorage(MemoryTaskStorage):
+    """写入时抛出异常，直到 broken 被清除"""
+
+    def __init__(self):
+        self.broken = True
+        self.written = {}
+
+    def record_many(self, changes, tasks):
+        if self.broken:
+            raise RuntimeError("写入失败")
+        for op, task in changes:
+            self.written[task.id] = task.title
+
+def test_write_behind_survives_writer_errors(capsys):
+    inner = FailingStorage()
+    storage = WriteBehindTaskStorage(inner, 0.01)
+    manager = TaskManager(storage=storage)
+    task = manager.add_task("任务")
+    deadline = time.monotonic() + 5
+    while "写入失败" not in capsys.readouterr().out:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    assert storage._writer.is_alive()
+    with pytest.raises(RuntimeError):
+        storage.flush()
+    manager.update_task(task.id, title="修改")
+    inner.broken = False
+    storage.close()
+    assert inner.written == {task.id: "修改"}
+
+@pytest.mark.parametrize('snapshot_format', ['json', 'binary'])
+def test_lazy_loading_answers_like_full_load(tmp_path, snapshot_format):
+    path = str(tmp_path / "tasks")
+    manager = TaskManager(path, snapshot_format=snapshot_format)
+    manager.add_tasks([{'title': f"任务{i}", 'category': f"分类{i % 3}"} for i in range(50)])
+    for task in manager.tasks[:20]:
+        manager.update_task(task.id, status=TaskStatus.IN_PROGRESS.value)
+    expected = manager.get_statistics()
+    todo = [task.id for task in manager.list_tasks(TaskStatus.TODO.value)]
+
+    lazy = TaskManager(path, snapshot_format=snapshot_format, lazy=True)
+    assert lazy.get_statistics() == expected
+    assert [task.id for task in lazy.list_tasks(TaskStatus.TODO.value, limit=10)] == todo[:10]
+    assert [task.id for task in lazy.list_tasks(TaskStatus.TODO.value)] == todo
+
+def test_lazy_statistics_with_unique_due_times(tmp_path):
+    path = str(tmp_path / "tasks.json")
+    manager = TaskManager(path)
+    now = datetime.now()
+    manager.add_tasks([{'title': f"任务{i}",
+                        'due_date': (now + timedelta(days=i % 7 - 3, seconds=i * 7)).isoformat()}
+                       for i in range(SUMMARY_MAX_DUE + 1000)])
+    with manager.batch():
+        for task in manager.tasks[::5]:
+            manager.update_task(task.id, status=TaskStatus.DONE.value)
+    expected = manager.get_statistics()
+
+    lazy = TaskManager(path, lazy=True)
+    assert lazy.get_statistics() == expected
+    assert not lazy._loaded
+
+@pytest.mark.parametrize('offset', [-2, -1, 0, 1, 2, 3, 8, 30])
+def test_due_summary_answers_like_a_scan(monkeypatch, offset):
+    monkeypatch.setattr(task_storage, 'SUMMARY_MAX_DUE', 40)
+    manager = TaskManager(storage=MemoryTaskStorage())
+    now = datetime.now()
+    rng = random.Random(offset)
+    manager.add_tasks([{'title': f"任务{i}",
+                        'due_date': (now + timedelta(minutes=rng.randrange(-3000, 20000))
+                                     ).isoformat()}
+                       for i in range(300)])
+    due = store_summary(manager.tasks)['due']
+    assert len(due['exact']) <= 40 and len(due['days']) <= 40
+    stamp = _datetime_to_micros(now + timedelta(days=offset))
+    overdue = summary_overdue(due, stamp)
+    # 当天和所有截止时间之后总能算出，其余时刻要么算对，要么交给整体加载
+    if offset in (0, 30):
+        assert overdue is not None
+    if overdue is not None:
+        assert overdue == sum(task.due_stamp < stamp for task in manager.tasks)
+
+@pytest.mark.parametrize('fmt', ['csv', 'jsonl'])
+def test_export_import_round_trip(tmp_path, fmt):
+    source = TaskManager(storage=MemoryTaskStorage())
+    tasks = sample_tasks()
+    source.tasks = tasks
+    path = str(tmp_path / f"tasks.{fmt}")
+    assert source.export_tasks(path) == len(tasks)
+
+    target = TaskManager(str(tmp_path / "imported.json"))
+    assert target.import_tasks(path) == len(tasks)
+    assert [task.to_dict() for task in target.tasks] == [task.to_dict() for task in tasks]
+
+def test_sqlite_round_trip(tmp_path):
+    source = TaskManager(storage=MemoryTaskStorage())
+    source.tasks = sample_tasks()
+    source.export_tasks(str(tmp_path / "tasks.jsonl"))
+    path = str(tmp_path / "tasks.db")
+    manager = SQLiteTaskManager(path)
+    manager.import_tasks(str(tmp_path / "tasks.jsonl"))
+    manager.close()
+
+    reloaded = SQLiteTaskManager(path)
+    assert [task.to_dict() for task in reloaded.tasks] == \
+        [task.to_dict() for task in source.tasks]
+
+def test_columnar_snapshot_matches_manager(tmp_path):
+    manager = TaskManager(storage=MemoryTaskStorage())
+    manager.tasks = sample_tasks()
+    path = str(tmp_path / "tasks.col")
+    ColumnarTaskStore.write(path, manager.tasks)
+    store = ColumnarTaskStore(path)
+    try:
+        assert store.get_statistics() == manager.get_statistics()
+        assert [row.id for row in store.search_tasks("报告")] == \
+            [task.id for task in manager.search_tasks("报告")]
+    finally:
+        store.close()
+
+def test_journal_skips_corrupt_records(tmp_path, capsys):
+    path = str(tmp_path / "tasks.json")
+    manager = TaskManager(path, journal=True)
+    kept = manager.add_task("保留")
+    removed = manager.add_task("删除")
+    manager.delete_task(removed.id)
+    manager.close()
+    with open(path + ".journal", 'a', encoding='utf-8') as f:
+        f.write('{"op":"upsert"}\n')                         # 缺少 task
+        f.write('{"op":"delete"}\n')                         # 缺少 id
+        f.write('{"task":{"id":"x","title":"x"}}\n')         # 缺少 op
+        f.write('{"op":"upsert","task":{"title":"无ID"}}\n')
+        f.write('{"op":"upsert","task":{"id":"y","title":"y","status":"坏"}}\n')
+        f.write('{"op":"upsert","task":"不是对象"}\n')
+        f.write('[1, 2]\n')
+        f.write('{"op":"rename","id":"z"}\n')
+        f.write('{"op":"upsert","task":{"id":"ok","title":"之后的记录"}}\n')
+        f.write('{"op":"ups')                                # 写了一半
+
+    reloaded = TaskManager(path, journal=True)
+    assert sorted(task.title for task in reloaded.tasks) == ["之后的记录", "保留"]
+    assert reloaded.get_task(kept.id) is not None
+    assert capsys.readouterr().out.count("跳过损坏的日志记录") == 9
+
+def test_sqlite_statistics_count_in_sql(tmp_path, monkeypatch):
+    manager = SQLiteTaskManager(str(tmp_path / "tasks.db"))
+    now = datetime.now()
+    manager.add_tasks([{'title': f"任务{i}",
+                        'due_date': (now + timedelta(days=i - 5, hours=1)).isoformat()}
+                       for i in range(10)])
+    manager.update_task(manager.tasks[0].id, status=TaskStatus.DONE.value)
+    # 统计只执行计数查询，不构造任务对象；也不会在每次操作前重新“加载”
+    monkeypatch.setattr(manager.storage, 'query', None)
+    monkeypatch.setattr(manager, 'load_tasks', None)
+    stats = manager.get_statistics()
+    assert stats['overdue_tasks'] == 4 and stats['total_tasks'] == 10
+    manager.add_task("再加一个")
+    assert manager.storage.count(overdue_at=now + timedelta(days=100)) == 9
+
+@pytest.mark.parametrize('journal', [False, True])
+def test_unreadable_file_is_never_overwritten(tmp_path, capsys, journal):
+    path = str(tmp_path / "tasks.bin")
+    manager = TaskManager(path, snapshot_format='binary', fsync='never')
+    manager.add_task("任务")
+    manager.close()
+    with open(path, 'rb') as f:
+        original = f.read()
+
+    # 二进制快照被当作JSON打开：加载失败，之后的保存不能冲掉原文件
+    manager = TaskManager(path, journal=journal, compact_every=1, fsync='never')
+    assert "加载任务数据失败" in capsys.readouterr().out
+    manager.add_task("新任务")
+    manager.close()
+    if not journal:
+        assert "保存任务数据失败" in capsys.readouterr().out
+    with open(path, 'rb') as f:
+        assert f.read() == original
+    assert [task.title for task in TaskManager(path, snapshot_format='binary').tasks] == ["任务"]
+
+def test_legacy_array_loads_without_rewrite(tmp_path):
+    path = str(tmp_path / "tasks.json")
+    records = [task.to_dict() for task in sample_tasks()]
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(records, f, ensure_ascii=False)
+    with open(path, 'rb') as f:
+        original = f.read()
+
+    assert [task.to_dict() for task in JSONTaskStorage(path).load()] == records
+    with open(path, 'rb') as f:
+        assert f.read() == original
+
+    assert migrate_to_json_lines(path)
+    with open(path + '.bak', 'rb') as f:
+        assert f.read() == original
+    assert [task.to_dict() for task in JSONTaskStorage(path).load()] == records
+    assert not migrate_to_json_lines(path)
+    assert os.path.exists(path + '.bak')
+
+def test_binary_snapshot_long_strings(tmp_path):
+    manager = TaskManager(storage=MemoryTaskStorage())
+    manager.add_task("长描述", "描" * 70000, category="类" * 30000)
+    task = manager.add_task("长规则")
+    manager.update_task(task.id, recurrence="0 9 * * " + ",".join(["1"] * 40000),
+                        depends_on=[manager.tasks[0].id])
+    storage = BinaryTaskStorage(str(tmp_path / "tasks.bin"), 'never')
+    storage.save(manager.tasks)
+    assert [t.to_dict() for t in storage.load()] == [t.to_dict() for t in manager.tasks]
+
+def test_binary_snapshot_reads_version_1(tmp_path, monkeypatch):
+    tasks = sample_tasks()
+    path = str(tmp_path / "tasks.bin")
+    version_1 = b'TASKBIN1'
+    monkeypatch.setattr(BinaryTaskStorage, 'MAGIC', version_1)
+    monkeypatch.setattr(BinaryTaskStorage, '_LENGTH', BinaryTaskStorage._FORMATS[version_1][0])
+    monkeypatch.setattr(BinaryTaskStorage, '_RECORD', BinaryTaskStorage._FORMATS[version_1][1])
+    BinaryTaskStorage(path, 'never').save(tasks)
+    monkeypatch.undo()
+
+    with open(path, 'rb') as f:
+        assert f.read(8) == version_1
+    assert [t.to_dict() for t in load_snapshot(path)] == [t.to_dict() for t in tasks]
+    BinaryTaskStorage(path, 'never').save(tasks)
+    with open(path, 'rb') as f:
+        assert f.read(8) == BinaryTaskStorage.MAGIC
@@ -0,0 +1,81 @@
+"""任务的增删改查和哈希索引"""
+
+import io
+import sys
+
+import pytest
+
+from task_manager import MemoryTaskStorage, TaskManager, TaskStatus, main
+
+@pytest.fixture
+def manager():
+    return TaskManager(storage=MemoryTaskStorage())
+
+def test_crud(manager):
+    task = manager.add_task("写代码", "描述", "高", "工作", "2030-01-01")
+    assert manager.get_task(task.id) is task
+    assert manager.update_task(task.id, status=TaskStatus.DONE.value, title="写完代码")
+    assert task.status is TaskStatus.DONE and task.title == "写完代码"
+    assert manager.delete_task(task.id)
+    assert manager.get_task(task.id) is None
+    assert not manager.update_task(task.id, title="不存在")
+    assert not manager.delete_task(task.id)
+
+@pytest.mark.parametrize('field', ['id', '_due_date', '_created_at', '_lease_until'])
+def test_update_rejects_id_and_internal_slots(manager, field):
+    task = manager.add_task("任务", category="工作", due_date_str="2030-01-01")
+    before = task.to_dict()
+    assert not manager.update_task(task.id, **{field: "x"})
+    with pytest.raises(ValueError):
+        manager.update_tasks({task.id: {'title': "改了", field: "x"}})
+    assert task.to_dict() == before
+    assert manager.get_task(task.id) is task
+    assert [t.id for t in manager.list_tasks(category_filter="工作")] == [task.id]
+
+def test_unknown_fields_are_ignored(manager):
+    task = manager.add_task("任务")
+    assert manager.update_task(task.id, colour="红")
+    assert task.title == "任务"
+
+@pytest.mark.parametrize('option', ["--write-behind=abc", "--write-behind=0", "--remind=zz",
+                                    "--remind=-1", "--remind=nan"])
+def test_invalid_numeric_options_print_usage(tmp_path, monkeypatch, capsys, option):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(sys, 'argv', ["task_manager.py", option])
+    main()
+    assert "无效的" + option.split('=')[0] in capsys.readouterr().out
+
+def test_batch_from_stdin_leaves_stdin_open(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    stdin = io.StringIO("add 写报告\n")
+    monkeypatch.setattr(sys, 'stdin', stdin)
+    monkeypatch.setattr(sys, 'argv', ["task_manager.py", "--batch", "-"])
+    main()
+    assert not stdin.closed
+    assert [task.title for task in TaskManager(str(tmp_path / "tasks.json")).tasks] == ["写报告"]
+
+@pytest.mark.parametrize('content', [None, '{"id": "1", "title"', '{"title": "缺少ID"}'])
+def test_convert_reports_unreadable_source(tmp_path, monkeypatch, capsys, content):
+    source = tmp_path / "tasks.json"
+    if content is not None:
+        source.write_text(content, encoding='utf-8')
+    monkeypatch.setattr(sys, 'argv', ["task_manager.py", "convert", str(source),
+                                      str(tmp_path / "tasks.bin")])
+    with pytest.raises(SystemExit) as exit_info:
+        main()
+    assert exit_info.value.code == 1
+    assert "转换失败" in capsys.readouterr().out
+    assert not (tmp_path / "tasks.bin").exists()
+
+@pytest.mark.parametrize('content', [None, '{"title": "缺少ID"}'])
+def test_columnar_reports_unreadable_source(tmp_path, monkeypatch, capsys, content):
+    source = tmp_path / "tasks.json"
+    if content is not None:
+        source.write_text(content, encoding='utf-8')
+    monkeypatch.setattr(sys, 'argv', ["task_manager.py", "columnar", str(source),
+                                      str(tmp_path / "tasks.col")])
+    with pytest.raises(SystemExit) as exit_info:
+        main()
+    assert exit_info.value.code == 1
+    assert "生成列式快照失败" in capsys.readouterr().out
+    assert not (tmp_path / "tasks.col").exists()
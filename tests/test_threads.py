@@ -0,0 +1,101 @@
+"""线程安全的任务管理器：多线程混合读写后索引与统计保持一致"""
+
+import random
+import threading
+import time
+
+import pytest
+
+from task_manager import (MemoryTaskStorage, ReadWriteLock, TaskManager, TaskStatus,
+                          ThreadSafeTaskManager)
+
+def run_threads(target, count):
+    errors = []
+
+    def guarded(seed):
+        try:
+            target(seed)
+        except Exception as e:  # 让断言失败时能看到线程里的异常
+            errors.append(e)
+
+    threads = [threading.Thread(target=guarded, args=(seed,)) for seed in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+
+def test_mixed_reads_and_writes_keep_indexes_consistent(tmp_path):
+    manager = ThreadSafeTaskManager(str(tmp_path / "tasks.json"), fsync="never")
+    manager.add_tasks([{'title': f"任务{i}", 'category': f"分类{i % 5}",
+                        'priority': ["低", "中", "高"][i % 3]} for i in range(300)])
+    ids = [task.id for task in manager.tasks]
+    statuses = [status.value for status in TaskStatus]
+
+    def worker(seed):
+        rng = random.Random(seed)
+        added = []  # 只删除本线程添加的任务
+        for i in range(400):
+            choice = rng.random()
+            if choice < 0.1:
+                added.extend(task.id for task in manager.add_tasks(
+                    [{'title': f"线程{seed}-{i}", 'category': "压力测试"}]))
+            elif choice < 0.15 and added:
+                manager.delete_tasks([added.pop()])
+            elif choice < 0.3:
+                manager.update_tasks({rng.choice(ids): {'status': rng.choice(statuses)}})
+            elif choice < 0.5:
+                manager.list_tasks(category_filter=f"分类{i % 5}", priority_filter="高")
+            elif choice < 0.7:
+                stats = manager.get_statistics()
+                assert sum(stats['status_distribution'].values()) == stats['total_tasks']
+            elif choice < 0.8:
+                manager.search_tasks("任务1")
+            else:
+                assert manager.get_task(rng.choice(ids)) is not None
+
+    run_threads(worker, 8)
+
+    tasks = manager.tasks
+    stats = manager.get_statistics()
+    assert stats['total_tasks'] == len(tasks)
+    for status in TaskStatus:
+        expected = [task.id for task in tasks if task.status is status]
+        assert [task.id for task in manager.list_tasks(status.value)] == expected
+        assert stats['status_distribution'].get(status.value, 0) == len(expected)
+    assert sum(stats['category_distribution'].values()) == len(tasks)
+
+    manager.close()
+    reloaded = TaskManager(str(tmp_path / "tasks.json"))
+    assert [task.to_dict() for task in reloaded.tasks] == [task.to_dict() for task in tasks]
+
+def test_batch_holds_write_lock():
+    manager = ThreadSafeTaskManager(storage=MemoryTaskStorage())
+    task = manager.add_task("任务")
+    seen = []
+
+    def reader():
+        seen.append(manager.get_task(task.id).title)
+
+    with manager.batch():
+        manager.update_task(task.id, title="批量中")
+        thread = threading.Thread(target=reader)
+        thread.start()
+        time.sleep(0.05)
+        assert seen == []  # 读者等待批量结束
+        manager.update_task(task.id, title="批量后")
+    thread.join()
+    assert seen == ["批量后"]
+
+def test_read_write_lock_rules():
+    lock = ReadWriteLock()
+    with lock.write():
+        with lock.write():  # 写锁可重入
+            with lock.read():
+                assert lock.writing()
+    with lock.read():
+        with pytest.raises(RuntimeError):
+            lock.acquire_write()
+    with lock.read(), lock.read():
+        assert lock.reading()
+    assert not lock.reading() and not lock.writing()